@@ -0,0 +1,35 @@
+"""Changed VendorPrice price to Numeric and added moq index
+
+Revision ID: 4b1f6a2d9c87
+Revises: 36c3342ece14
+Create Date: 2019-03-11 14:22:05.418206
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4b1f6a2d9c87'
+down_revision = '36c3342ece14'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.alter_column('VendorPrice', 'price',
+                    type_=sa.Numeric(18, 6, asdecimal=False),
+                    existing_type=sa.String(),
+                    existing_nullable=False,
+                    postgresql_using='price::numeric(18, 6)')
+    op.create_index('ix_vpno_moq', 'VendorPrice', ['vpno_id', 'moq'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_vpno_moq', table_name='VendorPrice')
+    op.alter_column('VendorPrice', 'price',
+                    type_=sa.String(),
+                    existing_type=sa.Numeric(18, 6, asdecimal=False),
+                    existing_nullable=False,
+                    postgresql_using='price::varchar')
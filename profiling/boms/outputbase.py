@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+boms.outputbase Benchmark
+-------------------------
+
+Benchmarks building, diffing and collapsing the wires of output BOMs,
+which index their lines by ident and by refdes, against the implementations
+scanning the lines they replaced, which are reproduced here.
+
+Each OBOM is diffed against a revision of itself with a tenth of its
+components changed, removed or added, and the pair is combined into a
+:class:`tendril.boms.outputbase.CompositeOutputBom` whose wires are then
+collapsed. The components are synthetic, so no projects are needed. The
+results of both implementations are checked to be the same before they
+are timed.
+"""
+
+import random
+import timeit
+
+from tendril.boms.outputbase import CompositeOutputBom
+from tendril.boms.outputbase import CompositeOutputBomLine
+from tendril.boms.outputbase import DeltaOutputBom
+from tendril.boms.outputbase import OutputBom
+from tendril.boms.outputbase import OutputBomLine
+from tendril.boms.outputbase import OutputElnBomDescriptor
+from tendril.conventions.electronics import fpiswire
+from tendril.conventions.electronics import parse_ident
+from tendril.entities.base import GenericEntityBase
+
+
+#: The numbers of components in each OBOM.
+NCOMPS = (100, 1000, 10000)
+
+#: The number of times each operation is timed.
+REPEATS = 3
+
+#: The (refdes prefix, ident format) of the kinds of components, with the
+#: value and, for wires, the length to be filled in.
+KINDS = [
+    ('R', 'RES SMD {0}E 0603'),
+    ('C', 'CAP CER SMD {0}pF 0603'),
+    ('U', 'IC SMD LM{0} SOIC-8'),
+    ('W', 'WIRE INSULATED {0}AWG {1}mm'),
+]
+
+
+def _get_ident(rng, kind, nvalues):
+    if kind == 'W':
+        return KINDS[-1][1].format(rng.choice((18, 22, 26)),
+                                   rng.randint(1, 20) * 10)
+    fmt = dict(KINDS)[kind]
+    return fmt.format(rng.randint(1, nvalues))
+
+
+def _get_components(ncomps, seed=0):
+    # Returns the (ident, refdes) of the components of an OBOM and of a
+    # revision of it.
+    rng = random.Random(seed)
+    nvalues = max(ncomps // 20, 1)
+    kinds = [x[0] for x in KINDS]
+    components = []
+    for idx in range(ncomps):
+        kind = rng.choice(kinds)
+        components.append((_get_ident(rng, kind, nvalues),
+                           '{0}{1}'.format(kind, idx)))
+    revision = []
+    for ident, refdes in components:
+        change = rng.random()
+        if change < 0.04:
+            continue
+        if change < 0.08:
+            ident = _get_ident(rng, refdes[0], nvalues)
+        revision.append((ident, refdes))
+    for idx in range(ncomps, ncomps + ncomps // 50):
+        kind = rng.choice(kinds)
+        revision.append((_get_ident(rng, kind, nvalues),
+                         '{0}{1}'.format(kind, idx)))
+    return components, revision
+
+
+class _ListOutputBom(OutputBom):
+    def find_by_ident(self, ident):
+        for line in self.lines:
+            if line.ident == ident:
+                return line
+        return None
+
+    def get_item_for_refdes(self, refdes):
+        for line in self.lines:
+            if refdes in line.refdeslist:
+                return GenericEntityBase(line.ident, refdes)
+
+    def insert_component(self, item):
+        line = self.find_by_ident(item.ident)
+        if line is None:
+            line = OutputBomLine(item, self)
+            self.lines.append(line)
+        line.add(item)
+
+
+class _ListCompositeOutputBom(CompositeOutputBom):
+    def _insert_line(self, line, i):
+        cline = self.find_by_ident(line.ident)
+        if cline is None:
+            cline = CompositeOutputBomLine(line, self.colcount, self)
+            self.lines.append(cline)
+        cline.add(line, i)
+
+    def find_by_ident(self, ident):
+        for cline in self.lines:
+            if cline.ident == ident:
+                return cline
+        return None
+
+    def collapse_wires(self):
+        # The original iterated over the lines it was removing from, and
+        # so skipped the line following each one it removed.
+        for line in list(self.lines):
+            device, value, footprint = parse_ident(line.ident)
+            if device is None:
+                continue
+            if fpiswire(device):
+                newident = device + ' ' + value
+                newline = self.find_by_ident(newident)
+                if newline is None:
+                    line.ident = newident
+                else:
+                    newline.merge_line(line)
+                    self.lines.remove(line)
+
+
+def _build(cls, name, components):
+    obom = cls(OutputElnBomDescriptor(name, None, name, None))
+    for ident, refdes in components:
+        obom.insert_component(GenericEntityBase(ident, refdes))
+    return obom
+
+
+def _list_delta(start_bom, end_bom):
+    rval = []
+    for original, target in ((start_bom, end_bom), (end_bom, start_bom)):
+        obom = _ListOutputBom(OutputElnBomDescriptor(None, None, None, None))
+        for titem in target.items:
+            oitem = original.get_item_for_refdes(titem.refdes)
+            if oitem is None or oitem.ident != titem.ident:
+                obom.insert_component(titem)
+        rval.append(obom)
+    return rval
+
+
+def _delta(start_bom, end_bom):
+    delta = DeltaOutputBom(start_bom, end_bom)
+    return [delta.additions_bom, delta.subtractions_bom]
+
+
+def _collapse(cls, boms):
+    cobom = cls(boms)
+    cobom.collapse_wires()
+    return cobom
+
+
+def _lines(bom):
+    if isinstance(bom, CompositeOutputBom):
+        return [(x.ident, x.columns) for x in bom.lines]
+    return [(x.ident, x.refdeslist) for x in bom.lines]
+
+
+def _run(name, func, ncomps):
+    elapsed = min(timeit.repeat(func, number=1, repeat=REPEATS))
+    print("{0:<30}{1:>8}{2:>12.1f}ms".format(name, ncomps, elapsed * 1e3))
+
+
+def main():
+    for ncomps in NCOMPS:
+        components, revision = _get_components(ncomps)
+        for label, obom_cls, cobom_cls, delta in (
+                ('list', _ListOutputBom, _ListCompositeOutputBom,
+                 _list_delta),
+                ('indexed', OutputBom, CompositeOutputBom, _delta)):
+            boms = [_build(obom_cls, 'start', components),
+                    _build(obom_cls, 'end', revision)]
+            if label == 'list':
+                expected = [_lines(x) for x in boms + delta(*boms)]
+                expected.append(_lines(_collapse(cobom_cls, boms)))
+            else:
+                assert [_lines(x) for x in boms + delta(*boms)] == \
+                    expected[:-1]
+                assert _lines(_collapse(cobom_cls, boms)) == expected[-1]
+            _run("Build, {0}".format(label),
+                 lambda: _build(obom_cls, 'end', revision), ncomps)
+            _run("Delta, {0}".format(label), lambda: delta(*boms), ncomps)
+            _run("Collapse wires, {0}".format(label),
+                 lambda: _collapse(cobom_cls, boms), ncomps)
+
+
+if __name__ == '__main__':
+    main()
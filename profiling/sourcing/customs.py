@@ -19,20 +19,40 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """
-Docstring for customs.py
+sourcing.customs Profiling
+--------------------------
+
+Profiles customs duty verification checklist generation, and benchmarks
+the throughput of HS classification by
+:class:`tendril.sourcing.customs.CustomsClassifier` against the section
+by section scan it replaced, which is reproduced here.
+
+The classification benchmark runs over the idents of the symbol library,
+each classified :data:`LOOKUPS` times as it would be for the duties of an
+invoice line, in invoices of the sizes in :data:`NLINES`. The results of
+both implementations are checked to be the same before they are timed.
 """
 
 
 import inspect
 import os
+import time
 
 from tendril.sourcing.vendors.digikey import DigiKeyInvoice
+from tendril.sourcing.customs import CustomsClassifier
+from tendril.gedaif import gsymlib
 from tendril.dox import customs
 from tendril.devtooling.profiler import do_profile
 
 SCRIPT_PATH = os.path.abspath(inspect.getfile(inspect.currentframe()))
 SCRIPT_FOLDER = os.path.normpath(os.path.join(SCRIPT_PATH, os.pardir))
 
+#: The numbers of invoice lines classified in each run.
+NLINES = (100, 1000, 10000)
+
+#: The number of times each line is classified, once for each duty.
+LOOKUPS = 7
+
 
 @do_profile(os.path.join(SCRIPT_FOLDER, 'customs'))
 def profile_customs_checklist(invoice, name):
@@ -43,9 +63,62 @@ def profile_customs_checklist(invoice, name):
     customs.generate_docs(invoice, register=False)
 
 
+def _scan_hs_from_ident(sections, ident):
+    for section in sections:
+        if section.idents is not None:
+            for sign in section.idents:
+                if sign in ident:
+                    return section
+    rsign = ''
+    rsec = None
+    for section in sections:
+        if section.folders is not None:
+            for sign in section.folders:
+                if sign in gsymlib.get_symbol_folder(ident, True):
+                    if rsign in sign:
+                        rsec = section
+                        rsign = sign
+    return rsec
+
+
+def _get_lines(nlines):
+    idents = sorted(gsymlib.gsymlib_idents)
+    return [idents[x % len(idents)] for x in range(nlines)]
+
+
+def _run(name, func, lines):
+    start = time.time()
+    for ident in lines:
+        for _ in range(LOOKUPS):
+            func(ident)
+    elapsed = time.time() - start
+    print("{0:<30}{1:>8}{2:>12.1f}ms{3:>12.0f}/s".format(
+        name, len(lines), elapsed * 1e3, len(lines) / elapsed
+    ))
+
+
+def benchmark_classifier():
+    """
+    Benchmarks the throughput of HS classification of invoice lines.
+    """
+    classifier = CustomsClassifier()
+    sections = classifier._sections
+    for nlines in NLINES:
+        lines = _get_lines(nlines)
+        for ident in set(lines):
+            assert _scan_hs_from_ident(sections, ident) is \
+                classifier.hs_from_ident(ident)
+        _run("Section scan",
+             lambda x: _scan_hs_from_ident(sections, x), lines)
+        classifier.clear_cache()
+        _run("CustomsClassifier, cold", classifier.hs_from_ident, lines)
+        _run("CustomsClassifier, warm", classifier.hs_from_ident, lines)
+
+
 def main():
     """
     """
+    benchmark_classifier()
     invoices = [(DigiKeyInvoice(), 'digikey')]
     profilers = [profile_customs_checklist]
     for profiler in profilers:
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+sourcing.vendors.mouser Benchmark
+---------------------------------
+
+Benchmarks Mouser part lookups one part number per request against the
+batched lookups of :meth:`VendorMouser.lookup_vpnos`.
+
+The benchmark runs against a local stand-in for the Mouser SOAP API, which
+serves a minimal WSDL and answers ``SearchByPartNumber`` requests with
+canned envelopes after a fixed :data:`LATENCY`, so no API key or network
+access is needed and the API's rate limits are not a concern.
+"""
+
+import re
+import time
+import uuid
+import threading
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from tendril.sourcing.vendors.mouser import VendorMouser
+
+
+#: The simulated round trip time of each request, in seconds.
+LATENCY = 0.1
+
+#: The number of part numbers looked up in each run.
+NPARTS = 100
+
+_NS = 'http://api.mouser.com/service'
+
+WSDL = """<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+    xmlns:soap12="http://schemas.xmlsoap.org/wsdl/soap12/"
+    xmlns:s="http://www.w3.org/2001/XMLSchema"
+    xmlns:tns="{ns}" targetNamespace="{ns}">
+  <wsdl:types>
+    <s:schema elementFormDefault="qualified" targetNamespace="{ns}">
+      <s:element name="SearchByPartNumber">
+        <s:complexType><s:sequence>
+          <s:element minOccurs="0" name="mouserPartNumber" type="s:string"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="SearchByPartNumberResponse">
+        <s:complexType><s:sequence>
+          <s:element minOccurs="0" name="SearchByPartNumberResult"
+                     type="tns:ResultParts"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:complexType name="ResultParts"><s:sequence>
+        <s:element name="NumberOfResult" type="s:int"/>
+        <s:element minOccurs="0" name="Parts" type="tns:ArrayOfMouserPart"/>
+      </s:sequence></s:complexType>
+      <s:complexType name="ArrayOfMouserPart"><s:sequence>
+        <s:element minOccurs="0" maxOccurs="unbounded" name="MouserPart"
+                   type="tns:MouserPart"/>
+      </s:sequence></s:complexType>
+      <s:complexType name="MouserPart"><s:sequence>
+        <s:element minOccurs="0" name="Availability" type="s:string"/>
+        <s:element minOccurs="0" name="DataSheetUrl" type="s:string"/>
+        <s:element minOccurs="0" name="Description" type="s:string"/>
+        <s:element minOccurs="0" name="Category" type="s:string"/>
+        <s:element minOccurs="0" name="Manufacturer" type="s:string"/>
+        <s:element minOccurs="0" name="ManufacturerPartNumber"
+                   type="s:string"/>
+        <s:element minOccurs="0" name="Min" type="s:string"/>
+        <s:element minOccurs="0" name="Mult" type="s:string"/>
+        <s:element minOccurs="0" name="MouserPartNumber" type="s:string"/>
+        <s:element minOccurs="0" name="PriceBreaks"
+                   type="tns:ArrayOfPricebreaks"/>
+        <s:element minOccurs="0" name="ProductDetailUrl" type="s:string"/>
+      </s:sequence></s:complexType>
+      <s:complexType name="ArrayOfPricebreaks"><s:sequence>
+        <s:element minOccurs="0" maxOccurs="unbounded" name="Pricebreaks"
+                   type="tns:Pricebreaks"/>
+      </s:sequence></s:complexType>
+      <s:complexType name="Pricebreaks"><s:sequence>
+        <s:element name="Quantity" type="s:int"/>
+        <s:element minOccurs="0" name="Price" type="s:string"/>
+        <s:element minOccurs="0" name="Currency" type="s:string"/>
+      </s:sequence></s:complexType>
+    </s:schema>
+  </wsdl:types>
+  <wsdl:message name="SearchByPartNumberSoapIn">
+    <wsdl:part name="parameters" element="tns:SearchByPartNumber"/>
+  </wsdl:message>
+  <wsdl:message name="SearchByPartNumberSoapOut">
+    <wsdl:part name="parameters" element="tns:SearchByPartNumberResponse"/>
+  </wsdl:message>
+  <wsdl:portType name="SearchAPISoap">
+    <wsdl:operation name="SearchByPartNumber">
+      <wsdl:input message="tns:SearchByPartNumberSoapIn"/>
+      <wsdl:output message="tns:SearchByPartNumberSoapOut"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="SearchAPISoap12" type="tns:SearchAPISoap">
+    <soap12:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="SearchByPartNumber">
+      <soap12:operation soapAction="{ns}/SearchByPartNumber"
+                        style="document"/>
+      <wsdl:input><soap12:body use="literal"/></wsdl:input>
+      <wsdl:output><soap12:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="SearchAPI">
+    <wsdl:port name="SearchAPISoap12" binding="tns:SearchAPISoap12">
+      <soap12:address location="{url}/service/searchapi.asmx"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+"""
+
+ENVELOPE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+<soap:Body><SearchByPartNumberResponse xmlns="{ns}">
+<SearchByPartNumberResult><NumberOfResult>{n}</NumberOfResult>
+<Parts>{parts}</Parts></SearchByPartNumberResult>
+</SearchByPartNumberResponse></soap:Body></soap:Envelope>
+"""
+
+PART = """<MouserPart><Availability>862 In Stock</Availability>
+<DataSheetUrl>http://www.mouser.com/ds/2/443/{pno}.pdf</DataSheetUrl>
+<Description>Ethernet ICs HI PERF ENET CONTR TCP/IP+MAC+PHY</Description>
+<Category>Ethernet ICs</Category><Manufacturer>WIZnet</Manufacturer>
+<ManufacturerPartNumber>{pno}</ManufacturerPartNumber>
+<Min>1</Min><Mult>1</Mult><MouserPartNumber>{pno}</MouserPartNumber>
+<PriceBreaks>
+<Pricebreaks><Quantity>1</Quantity><Price>$5.65</Price>
+<Currency>USD</Currency></Pricebreaks>
+<Pricebreaks><Quantity>50</Quantity><Price>$5.30</Price>
+<Currency>USD</Currency></Pricebreaks>
+</PriceBreaks>
+<ProductDetailUrl>http://www.mouser.com/ProductDetail/{pno}</ProductDetailUrl>
+</MouserPart>"""
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def _respond(self, body, content_type):
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(WSDL.format(ns=_NS, url=self.server.url), 'text/xml')
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests += 1
+        time.sleep(LATENCY)
+        pnos = re.search(r'<mouserPartNumber>(.*)</mouserPartNumber>',
+                         request.decode('utf-8')).group(1).split('|')
+        self._respond(
+            ENVELOPE.format(ns=_NS, n=len(pnos),
+                            parts=''.join(PART.format(pno=x) for x in pnos)),
+            'text/xml; charset=utf-8'
+        )
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _BenchVendor(VendorMouser):
+    _rate_limit = None
+
+
+def _get_vendor(url, max_connections):
+    vendor = _BenchVendor(name='mouser-bench', dname='Mouser Benchmark',
+                          pclass='electronics', mappath=None,
+                          currency_code='USD', currency_symbol='US$',
+                          apikey='benchmark', max_connections=max_connections)
+    vendor._api_endpoint = url + '/service/searchapi.asmx?WSDL'
+    return vendor
+
+
+def _vpnos():
+    # Fresh part numbers for every run, so that the SOAP response cache
+    # doesn't come into play.
+    prefix = uuid.uuid4().hex[:8]
+    return ['{0}-{1}'.format(prefix, x) for x in range(NPARTS)]
+
+
+def _run(server, name, func):
+    server.requests = 0
+    start = time.time()
+    result = func()
+    elapsed = time.time() - start
+    print("{0:<40}{1:>8.3f}s{2:>8} requests".format(name, elapsed,
+                                                    server.requests))
+    return result
+
+
+def main():
+    server = _Server(('127.0.0.1', 0), _Handler)
+    server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        vendor = _get_vendor(server.url, 1)
+        _run(server, "Warm client (WSDL)", lambda: vendor.api_client)
+
+        def _serial():
+            return [vendor.lookup_vpnos([x]) for x in _vpnos()]
+        _run(server, "One part per request", _serial)
+        _run(server, "Batched, 1 connection",
+             lambda: vendor.lookup_vpnos(_vpnos()))
+        for max_connections in (2, 4):
+            pvendor = _get_vendor(server.url, max_connections)
+            _run(server, "Batched, {0} connections".format(max_connections),
+                 lambda: pvendor.lookup_vpnos(_vpnos()))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+sourcing.vendors Search Result Filtering Benchmark
+--------------------------------------------------
+
+Benchmarks the search result processing pipeline of
+:class:`tendril.sourcing.vendors.VendorBase` (deduplication followed by
+filtering), which works over the list of search results, against a
+columnar implementation, which is reproduced here.
+
+The columnar implementation transposes the search results into part
+number, manufacturer part number, package and stocking columns once, and
+runs each filter as a selection over the columns. It was tried in place of
+the list filters and dropped, as it was slower at every size measured
+here. This benchmark is kept so that the comparison can be repeated.
+
+The search results are synthetic, with duplicated part numbers, parts
+without packages and a mix of stocked and non-stocked parts, so no vendor
+access is needed. The results of both implementations are checked to be
+the same before they are timed.
+"""
+
+import random
+import timeit
+from itertools import compress
+from itertools import repeat
+from operator import and_
+from operator import eq
+from operator import not_
+
+from six.moves import map
+from six.moves import zip
+
+from tendril.sourcing.vendors.vendorbase import SearchPart
+from tendril.sourcing.vendors.vendorbase import SearchResult
+from tendril.sourcing.vendors.vendorbase import VendorBase
+
+
+#: The numbers of search results in each run.
+NPARTS = (20, 200, 2000)
+
+#: The number of times the pipeline is run for each timing.
+REPEATS = 200
+
+PACKAGES = ['0402', '0603', '0805', '1206', 'SOIC-8', 'SOT-23', 'QFN-32']
+
+#: The (value, footprint) targets for each filtering strategy exercised.
+TARGETS = [
+    ('Exact match', 'MP-3', ['0603', '0805']),
+    ('Footprint', 'MP-X', ['0603', '0805']),
+    ('Unfiltered', 'MP-X', None),
+]
+
+
+def _get_parts(nparts, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for idx in range(nparts):
+        pno = 'VP-{0}'.format(rng.randint(0, int(nparts * 0.8)))
+        mfgpno = 'MP-{0}'.format(idx % 17)
+        package = rng.choice(PACKAGES) if rng.random() > 0.05 else None
+        parts.append(SearchPart(pno, mfgpno, package, rng.random() > 0.7,
+                                None, None, None))
+    return parts
+
+
+class _ColumnarResults(object):
+    def __init__(self, parts):
+        self.parts = list(parts)
+        if self.parts:
+            columns = list(zip(*self.parts))
+            self.pnos, self.mfgpnos, self.packages = columns[:3]
+            self.stocked = list(map(not_, columns[3]))
+        else:
+            self.pnos = self.mfgpnos = self.packages = ()
+            self.stocked = []
+
+    def deduplicated(self):
+        pnos = self.pnos
+        if len(set(pnos)) == len(pnos):
+            return self
+        # Of the duplicates, the first is kept.
+        first = dict(zip(reversed(pnos), range(len(pnos) - 1, -1, -1)))
+        keep = sorted(first.values())
+        return _ColumnarResults([self.parts[i] for i in keep])
+
+    def select(self, mask, strategy, ns_suffix='_ALLOW_NS'):
+        pnos = list(compress(self.pnos, map(and_, mask, self.stocked)))
+        if not pnos:
+            strategy += ns_suffix
+            pnos = list(compress(self.pnos, mask))
+        return SearchResult(True, pnos, strategy)
+
+    def unfiltered(self):
+        return self.select([True] * len(self.pnos), 'UNFILTERED')
+
+    def exact_match_package(self, value):
+        try:
+            package = self.packages[self.mfgpnos.index(value)]
+        except ValueError:
+            return SearchResult(False, None, None)
+        return SearchResult(True, package, 'EXACT_MATCH_FFP')
+
+    def consensus_package(self):
+        cpackage = self.packages[0]
+        if cpackage is not None and \
+                self.packages.count(cpackage) == len(self.packages):
+            return SearchResult(True, cpackage, 'CONSENSUS_FP_MATCH')
+        return SearchResult(False, None, None)
+
+    def bycpackage(self, cpackage, strategy):
+        return self.select(list(map(eq, self.packages, repeat(cpackage))),
+                           strategy)
+
+    def byfootprint(self, footprint):
+        packages = set(self.packages)
+        if isinstance(footprint, list):
+            matched = packages.intersection(footprint)
+            suffix = '_ALLOW_NS'
+        else:
+            matched = set(x for x in packages if footprint in x)
+            suffix = ' ALLOW NS'
+        return self.select(list(map(matched.__contains__, self.packages)),
+                           'NAIVE_FP_MATCH', suffix)
+
+
+def _columnar_process(parts, value, footprint):
+    results = _ColumnarResults(parts).deduplicated()
+    if results.packages[0] is None or footprint is None:
+        return results.unfiltered()
+    sr = results.exact_match_package(value)
+    if sr.success is False:
+        sr = results.consensus_package()
+        if sr.success is False:
+            return results.byfootprint(footprint)
+    sr = results.bycpackage(sr.parts, sr.strategy)
+    return SearchResult(True, sr.parts or None, sr.strategy)
+
+
+def _run(name, func, nparts):
+    elapsed = min(timeit.repeat(func, number=REPEATS, repeat=5)) / REPEATS
+    print("{0:<40}{1:>8}{2:>12.1f}us".format(name, nparts, elapsed * 1e6))
+
+
+def main():
+    # The filtering pipeline doesn't touch any vendor state.
+    vendor = VendorBase.__new__(VendorBase)
+    for nparts in NPARTS:
+        parts = _get_parts(nparts)
+        for name, value, footprint in TARGETS:
+            assert _columnar_process(parts, value, footprint) == \
+                vendor._process_results(parts, value, footprint)
+            _run("{0}, list".format(name),
+                 lambda: vendor._process_results(parts, value, footprint),
+                 nparts)
+            _run("{0}, columnar".format(name),
+                 lambda: _columnar_process(parts, value, footprint), nparts)
+
+
+if __name__ == '__main__':
+    main()
@@ -55,7 +55,10 @@ install_requirements = [
     'appenlight-client',
     'pyhull',
     'cachetools',   # sourcing.vendors.VendorBase._partcache
+    'futures; python_version < "3.0"',  # concurrent.futures backport
     'jsonpickle',   # tendril-server-prefab interfaces
+    'lxml',         # sourcing.vendors.digikey page parsing
+    'numpy',        # sourcing.vendors.pricing
     'pika',
     'SQLAlchemy',
     'sqlalchemy_utils',
@@ -108,6 +111,7 @@ script_entry_points = [
     'tendril-genvmap = tendril.scripts.genvmaps:main',
     'tendril-genvmapaudit = tendril.scripts.genvmapaudits:main',
     'tendril-genpcbpricing = tendril.scripts.genpcbpricing:main',
+    'tendril-sourcingworker = tendril.scripts.sourcingworker:main',
     'tendril-gsymlib = tendril.scripts.gsymlib:main',
     'tendril-validate = tendril.scripts.validate:main',
 ]
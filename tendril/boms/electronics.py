@@ -44,13 +44,22 @@ Module Members:
 
 import copy
 import os
+import threading
 import warnings
 
+from six.moves import cPickle as pickle
+from six.moves import copyreg
+from cachetools import LRUCache
+
 from tendril.conventions.electronics import fpiswire
 from tendril.conventions.electronics import ident_transform
 from tendril.gedaif.gsymlib import jb_harmonize
 from tendril.gedaif.bomparser import MotifAwareBomParser
+from tendril.gedaif.bomparser import get_folder_sources
+from tendril.gedaif.bomparser import hash_sources
 from tendril.gedaif.conffile import ConfigsFile
+from tendril.fileio import write_file_atomic
+from tendril.config import INSTANCE_CACHE
 from tendril.config.legacy import EDA_HARMONIZE_IDENTS
 
 from tendril.entities.base import EntityBase
@@ -78,6 +87,19 @@ from tendril.utils import log
 logger = log.get_logger(__name__, log.DEFAULT)
 
 
+#: The folder BOMs imported by :func:`import_pcb` are cached in, pickled.
+#: Set to ``None`` to disable the on-disk cache.
+ELNBOM_CACHE_FOLDER = os.path.join(INSTANCE_CACHE, 'boms', 'electronics')
+
+#: The number of pickled BOMs held in memory by :func:`import_pcb`, in
+#: front of the on-disk cache.
+ELNBOM_CACHE_SIZE = 32
+
+#: The version of the cached BOM format. Cached BOMs of other versions are
+#: ignored.
+ELNBOM_CACHE_VERSION = 2
+
+
 class EntityElnComp(EntityBase):
     """Object containing a single electronic component.
 
@@ -520,19 +542,122 @@ class EntityElnBom(EntityBomBase):
         return rval
 
 
-def import_pcb(cardfolder):
+_elnbom_cache = LRUCache(maxsize=ELNBOM_CACHE_SIZE)
+_elnbom_cache_lock = threading.Lock()
+
+
+def _restore_error_collector(errors):
+    collector = ErrorCollector()
+    for etype, state in errors:
+        e = etype.__new__(etype)
+        e.__dict__.update(state)
+        collector.add(e)
+    return collector
+
+
+def _reduce_error_collector(collector):
+    # Validation errors can't be unpickled by themselves, as they are
+    # recreated from their arguments, which they don't keep. Collectors
+    # pickle them by their type and attributes instead.
+    return (_restore_error_collector,
+            ([(type(e), e.__dict__) for e in collector.errors], ))
+
+
+copyreg.pickle(ErrorCollector, _reduce_error_collector)
+
+
+def _get_elnbom_cache_key(cardfolder):
+    # The imported BOM depends on the contents of the project's schematic
+    # folder (its configs file, project file, sheets and attribs file), the
+    # library symbols its sheets use, the version of the configs file
+    # schema it is read with, and where the project is.
+    schfolder = os.path.join(cardfolder, 'schematic')
+    if not os.path.isdir(schfolder):
+        schfolder = cardfolder
+    params = [
+        'EntityElnBom', 'version={0}'.format(ELNBOM_CACHE_VERSION),
+        'cardfolder={0}'.format(cardfolder),
+        'schema={0}:{1}-{2}'.format(ConfigsFile.schema_name,
+                                    ConfigsFile.schema_version_min,
+                                    ConfigsFile.schema_version_max),
+        'harmonize={0}'.format(EDA_HARMONIZE_IDENTS),
+    ]
+    return hash_sources(params, get_folder_sources(schfolder))
+
+
+def _get_cached_elnbom(key):
+    with _elnbom_cache_lock:
+        data = _elnbom_cache.get(key)
+    if data is None and ELNBOM_CACHE_FOLDER is not None:
+        path = os.path.join(ELNBOM_CACHE_FOLDER, key + '.pickle')
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return None
+        with _elnbom_cache_lock:
+            _elnbom_cache[key] = data
+    if data is None:
+        return None
+    try:
+        return pickle.loads(data)
+    except Exception:
+        logger.warning("Unable to read cached BOM : " + key)
+        with _elnbom_cache_lock:
+            _elnbom_cache.pop(key, None)
+        return None
+
+
+def _cache_elnbom(key, pcbbom):
+    try:
+        data = pickle.dumps(pcbbom, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        logger.warning("Unable to cache BOM for : " +
+                       pcbbom.configurations.projectfolder)
+        return
+    with _elnbom_cache_lock:
+        _elnbom_cache[key] = data
+    if ELNBOM_CACHE_FOLDER is not None:
+        path = os.path.join(ELNBOM_CACHE_FOLDER, key + '.pickle')
+        try:
+            write_file_atomic(path, lambda f: f.write(data), mode='wb')
+        except (IOError, OSError):
+            logger.warning("Unable to cache BOM : " + path)
+
+
+def clear_import_cache():
+    """
+    Clears the in-memory tier of the :func:`import_pcb` cache. The
+    on-disk tier is keyed by the content of the projects, and does not
+    need to be cleared when they change.
+    """
+    with _elnbom_cache_lock:
+        _elnbom_cache.clear()
+
+
+def import_pcb(cardfolder, use_cached=True):
     """Import PCB and return a populated EntityBom
 
     Accept cardfolder as an argument and return a populated EntityBOM.
     The cardfolder should be the path to a PCB folder, containing the
     file structure described in ``somewhere``.
 
+    Imported BOMs are cached, pickled, in memory and in
+    :data:`ELNBOM_CACHE_FOLDER`, keyed by a hash of the content of the
+    project's schematic folder and the library symbols it uses. Each call
+    returns a BOM of its own, unpickled from the cache if possible, which
+    the caller is free to modify.
+
     .. seealso::
         - ``gedaif.projfile.GedaProjectFile``
         - ``gEDA Project Folder Structure``
 
     :param cardfolder: PCB folder (containing schematic, pcb, gerber)
     :type cardfolder: str
+    :param use_cached: Whether cached BOMs, and cached BOM files, may be
+                       used. If ``False``, the BOM is imported afresh and
+                       the caches updated.
+    :type use_cached: bool
     :return: Populated EntityBom
     :rtype: EntityBom
 
@@ -543,10 +668,21 @@ def import_pcb(cardfolder):
 
     """
     cardfolder = os.path.abspath(cardfolder)
+    try:
+        key = _get_elnbom_cache_key(cardfolder)
+    except (IOError, OSError):
+        # Not a project. Left to ConfigsFile to report.
+        key = None
+    if use_cached and key is not None:
+        pcbbom = _get_cached_elnbom(key)
+        if pcbbom is not None:
+            return pcbbom
     pcbbom = None
     configfile = ConfigsFile(cardfolder)
     if configfile.rawconfig is not None:
-        pcbbom = EntityElnBom(configfile)
+        pcbbom = EntityElnBom(configfile, use_cached=use_cached)
+        if key is not None:
+            _cache_elnbom(key, pcbbom)
     return pcbbom
 
 
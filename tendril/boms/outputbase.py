@@ -86,10 +86,19 @@ class OutputBomLine(SourceableBomLineMixin):
         self._refdeslist = value
 
     def add(self, comp):
+        """
+        Add a component to the line.
+
+        :param comp: The component to add
+        :type comp: :class:`tendril.entities.base.EntityBase`
+        :return: True if the component's refdes was added to the line,
+                 False if it was not because the component is not filled.
+
+        """
         assert isinstance(comp, EntityBase)
         if hasattr(comp, 'fillstatus'):
             if comp.fillstatus == "DNP":
-                return
+                return False
             if comp.fillstatus == "CONF":
                 # TODO
                 # logger.warning("Configurable Component "
@@ -97,6 +106,7 @@ class OutputBomLine(SourceableBomLineMixin):
                 pass
         if comp.ident == self.ident:
             self.refdeslist.append(comp.refdes)
+            return True
         else:
             logger.error("Ident Mismatch")
             raise Exception
@@ -160,6 +170,9 @@ class OutputBom(CostableBom):
         )
         self.sourcing_policy = SourcingIdentPolicy(self._validation_context)
         self.validation_errors = ErrorCollector()
+        # Lines by ident, and by each refdes they contain.
+        self._ident_index = {}
+        self._refdes_index = {}
 
     @property
     def ident(self):
@@ -175,16 +188,31 @@ class OutputBom(CostableBom):
             line.refdeslist.sort()
 
     def find_by_ident(self, ident):
-        for line in self.lines:
-            assert isinstance(line, OutputBomLine)
-            if line.ident == ident:
-                return line
-        return None
+        """
+        Find the line in the OBOM for the given ident.
+
+        :param ident: The ident to find in the OBOM
+        :rtype: :class:`OutputBomLine`
+
+        """
+        return self._ident_index.get(ident)
 
     def get_item_for_refdes(self, refdes):
-        for line in self.lines:
-            if refdes in line.refdeslist:
-                return GenericEntityBase(line.ident, refdes)
+        """
+        Get the component with the given refdes from the OBOM.
+
+        If the refdes is in more than one line, as the placeholder refdes
+        of OBOMs created from listings is, the component is from the line
+        the refdes was first inserted into.
+
+        :param refdes: The refdes of the component
+        :rtype: :class:`tendril.entities.base.GenericEntityBase`
+
+        """
+        line = self._refdes_index.get(refdes)
+        if line is None:
+            return None
+        return GenericEntityBase(line.ident, refdes)
 
     def insert_component(self, item):
         assert isinstance(item, EntityBase)
@@ -192,7 +220,9 @@ class OutputBom(CostableBom):
         if line is None:
             line = OutputBomLine(item, self)
             self.lines.append(line)
-        line.add(item)
+            self._ident_index[line.ident] = line
+        if line.add(item):
+            self._refdes_index.setdefault(item.refdes, line)
 
     def multiply(self, factor, composite=False):
         if composite is True:
@@ -312,6 +342,7 @@ class CompositeOutputBom(CostableBom):
         )
         self.sourcing_policy = SourcingIdentPolicy(self._validation_context)
         self.validation_errors = ErrorCollector()
+        self._ident_index = {}
 
         i = 0
         for bom in bom_list:
@@ -362,6 +393,7 @@ class CompositeOutputBom(CostableBom):
         if cline is None:
             cline = CompositeOutputBomLine(line, self.colcount, self)
             self.lines.append(cline)
+            self._ident_index[cline.ident] = cline
         cline.add(line, i)
 
     def find_by_ident(self, ident):
@@ -372,11 +404,7 @@ class CompositeOutputBom(CostableBom):
         :rtype: :class:`CompositeOutputBomLine`
 
         """
-        for cline in self.lines:
-            assert isinstance(cline, CompositeOutputBomLine)
-            if cline.ident == ident:
-                return cline
-        return None
+        return self._ident_index.get(ident)
 
     def sort_by_ident(self):
         self.lines.sort(key=lambda x: x.ident, reverse=False)
@@ -393,18 +421,26 @@ class CompositeOutputBom(CostableBom):
             writer.writerow([line.ident] + columns + [line.quantity])
 
     def collapse_wires(self):
+        """
+        Merge the lines for lengths of the same wire into a single line
+        for the wire, whose ident has no length.
+        """
+        lines = []
         for line in self.lines:
             device, value, footprint = parse_ident(line.ident)
-            if device is None:
-                continue
-            if fpiswire(device):
+            if device is not None and fpiswire(device):
                 newident = device + ' ' + value
                 newline = self.find_by_ident(newident)
                 if newline is None:
+                    del self._ident_index[line.ident]
                     line.ident = newident
-                else:
+                    self._ident_index[newident] = line
+                elif newline is not line:
                     newline.merge_line(line)
-                    self.lines.remove(line)
+                    del self._ident_index[line.ident]
+                    continue
+            lines.append(line)
+        self.lines[:] = lines
 
 
 class DeltaOutputBom(object):
@@ -22,10 +22,14 @@
 Docstring for mq
 """
 
+import time
 import pika
 import atexit
 import threading
+from collections import OrderedDict
 from contextlib import contextmanager
+import six
+from six.moves import queue
 
 from tendril.config.legacy import MQ_SERVER
 from tendril.config.legacy import MQ_SERVER_PORT
@@ -47,14 +51,18 @@ class MQServerNotConfigured(MQServerUnavailable):
     pass
 
 
-@contextmanager
-def mq_connection():
+def _mq_connect():
     if not MQ_SERVER:
         raise MQServerNotConfigured
-    connection = pika.BlockingConnection(
+    return pika.BlockingConnection(
         pika.ConnectionParameters(MQ_SERVER, MQ_SERVER_PORT,
                                   heartbeat_interval=1200)
     )
+
+
+@contextmanager
+def mq_connection():
+    connection = _mq_connect()
     try:
         yield connection
     except:
@@ -63,8 +71,7 @@ def mq_connection():
         connection.close()
 
 
-def mq_publish(channel, key, message):
-    channel.queue_declare(queue=key, durable=True)
+def _mq_basic_publish(channel, key, message):
     channel.basic_publish(exchange='',
                           routing_key=key,
                           body=message,
@@ -73,6 +80,326 @@ def mq_publish(channel, key, message):
                           ))
 
 
+def mq_publish(channel, key, message):
+    channel.queue_declare(queue=key, durable=True)
+    _mq_basic_publish(channel, key, message)
+
+
+#: The maximum number of messages committed to the server together by
+#: a :class:`MQPublisher`.
+MQ_PUBLISH_BATCH_SIZE = 100
+
+#: The time, in seconds, a :class:`MQPublisher` waits for more messages
+#: to arrive before committing a partial batch.
+MQ_PUBLISH_LINGER = 0.05
+
+#: The time, in seconds, within which repeated messages with the same
+#: coalescing key are dropped by a :class:`MQPublisher`.
+MQ_PUBLISH_COALESCE_WINDOW = 600
+
+#: The time, in seconds, for which a :class:`MQPublisher` drops messages
+#: after failing to reach the server, before trying to connect again.
+MQ_PUBLISH_RETRY_INTERVAL = 30
+
+#: The time, in seconds, an idle :class:`MQPublisher` waits between
+#: servicing its connection's heartbeats.
+MQ_PUBLISH_IDLE_INTERVAL = 30
+
+
+class MQPublisher(object):
+    """
+    A long lived publisher of persistent messages to named queues, which
+    can be used from any number of threads.
+
+    :meth:`publish` only queues the message and returns. A single
+    publishing thread owns the connection to the server, which it opens
+    when the first message is published and keeps open thereafter. It
+    collects queued messages into batches of up to ``batch_size``,
+    waiting ``linger`` seconds for a batch to fill, and publishes each
+    batch within a transaction, so that the server confirms the whole
+    batch with a single round trip. Each queue is only declared once per
+    connection.
+
+    Messages published with a ``coalesce`` key are dropped if a message
+    with the same queue and key was published in the last
+    ``coalesce_window`` seconds, so that repeated requests for the same
+    thing result in a single message. If that message is then dropped
+    itself, the key is released, and the next message with it goes out.
+
+    If the server can't be reached, the batch is dropped and so are any
+    messages published within the next ``retry_interval`` seconds, as
+    with the one-shot :func:`mq_publish`, the messages this is used for
+    are expendable. Broken connections are reopened once before giving
+    up on a batch.
+
+    :param connect: A callable returning a new
+                    :class:`pika.BlockingConnection`, or something that
+                    behaves like one. Defaults to a connection to the
+                    configured ``MQ_SERVER``.
+
+    """
+    def __init__(self, connect=None, batch_size=MQ_PUBLISH_BATCH_SIZE,
+                 linger=MQ_PUBLISH_LINGER,
+                 coalesce_window=MQ_PUBLISH_COALESCE_WINDOW,
+                 retry_interval=MQ_PUBLISH_RETRY_INTERVAL,
+                 idle_interval=MQ_PUBLISH_IDLE_INTERVAL):
+        self._connect = connect or _mq_connect
+        self._batch_size = batch_size
+        self._linger = linger
+        self._coalesce_window = coalesce_window
+        self._retry_interval = retry_interval
+        self._idle_interval = idle_interval
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+        self._pending = 0
+        self._recent = OrderedDict()
+
+        self._connection = None
+        self._channel = None
+        self._declared = set()
+        self._unavailable_until = 0
+
+        self._published = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._latency_total = 0
+        self._latency_max = 0
+
+    def publish(self, key, message, coalesce=None):
+        """
+        Queues ``message`` to be published to the queue named ``key``.
+
+        :param coalesce: A hashable key identifying what the message is
+                         about, if repeated messages about the same thing
+                         should be coalesced.
+        :return: ``False`` if the message was coalesced into an earlier
+                 one, ``True`` otherwise.
+        """
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                raise MQServerUnavailable("Publisher is closed.")
+            if coalesce is not None:
+                coalesce = (key, coalesce)
+                # Entries are in the order they were added, so the expired
+                # ones are at the front.
+                horizon = now - self._coalesce_window
+                while self._recent:
+                    ckey, ctime = next(six.iteritems(self._recent))
+                    if ctime > horizon:
+                        break
+                    del self._recent[ckey]
+                if coalesce in self._recent:
+                    self._coalesced += 1
+                    return False
+                self._recent[coalesce] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._pending += 1
+            # Queued within the lock, so nothing is queued after close.
+            self._queue.put((key, message, now, coalesce))
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Waits for all the messages queued so far to be published or
+        dropped, for up to ``timeout`` seconds. Returns ``True`` if they
+        were.
+        """
+        deadline = timeout is not None and time.time() + timeout
+        with self._lock:
+            while self._pending:
+                if deadline is False:
+                    self._done.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Publishes any queued messages and closes the connection. Messages
+        can't be published once the publisher is closed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    @property
+    def stats(self):
+        """
+        A dictionary of publishing statistics :
+
+        - ``published`` and ``failed``, the number of messages published
+          and dropped on failing to reach the server.
+        - ``coalesced``, the number of messages dropped as duplicates.
+        - ``batches``, the number of batches published.
+        - ``latency_mean`` and ``latency_max``, in seconds, from
+          :meth:`publish` being called to the server confirming the
+          message.
+
+        """
+        with self._lock:
+            return {
+                'published': self._published,
+                'failed': self._failed,
+                'coalesced': self._coalesced,
+                'batches': self._batches,
+                'latency_mean': (self._latency_total / self._published
+                                 if self._published else 0),
+                'latency_max': self._latency_max,
+            }
+
+    def _get_channel(self):
+        if self._channel is None:
+            connection = self._connect()
+            try:
+                channel = connection.channel()
+                channel.tx_select()
+            except Exception:
+                self._close_connection(connection)
+                raise
+            self._connection = connection
+            self._channel = channel
+            self._declared = set()
+        return self._channel
+
+    @staticmethod
+    def _close_connection(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _reset(self):
+        if self._connection is not None:
+            self._close_connection(self._connection)
+        self._connection = None
+        self._channel = None
+
+    def _publish_batch(self, batch):
+        channel = self._get_channel()
+        for key, message, _, _ in batch:
+            if key not in self._declared:
+                channel.queue_declare(queue=key, durable=True)
+                self._declared.add(key)
+            _mq_basic_publish(channel, key, message)
+        channel.tx_commit()
+
+    def _process_batch(self, batch):
+        success = False
+        if time.time() >= self._unavailable_until:
+            # A connection which has been idle for too long may have been
+            # dropped by the server, so one reconnection is attempted
+            # before the batch is given up on.
+            for attempt in range(2):
+                try:
+                    self._publish_batch(batch)
+                    success = True
+                    break
+                except Exception as e:
+                    # Whatever the failure, the publishing thread has to
+                    # carry on, or the messages queued behind the batch
+                    # would never be accounted for.
+                    self._reset()
+                    error = e
+                    if isinstance(e, MQServerNotConfigured):
+                        break
+            if not success:
+                logger.warning("Could not publish {0} messages : {1} {2}"
+                               "".format(len(batch), type(error).__name__,
+                                         error.args))
+                self._unavailable_until = time.time() + self._retry_interval
+        now = time.time()
+        with self._lock:
+            if success:
+                self._batches += 1
+                self._published += len(batch)
+                for _, _, queued, _ in batch:
+                    latency = now - queued
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+            else:
+                self._failed += len(batch)
+                # The messages never went out, so nothing should be held
+                # back as a duplicate of them. A key re-recorded since,
+                # after its window expired, belongs to a later message.
+                for _, _, queued, coalesce in batch:
+                    if self._recent.get(coalesce) == queued:
+                        del self._recent[coalesce]
+            self._pending -= len(batch)
+            self._done.notify_all()
+
+    def _heartbeat(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.process_data_events(0)
+        except (pika.exceptions.AMQPError, EnvironmentError):
+            self._reset()
+
+    def _run(self):
+        closing = False
+        try:
+            while not closing:
+                try:
+                    item = self._queue.get(timeout=self._idle_interval)
+                except queue.Empty:
+                    self._heartbeat()
+                    continue
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.time() + self._linger
+                while len(batch) < self._batch_size:
+                    try:
+                        item = self._queue.get(
+                            timeout=max(deadline - time.time(), 0)
+                        )
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                self._process_batch(batch)
+        finally:
+            self._reset()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """
+    Returns the shared :class:`MQPublisher` for the configured
+    ``MQ_SERVER``, which is created when first needed and closed at exit.
+    """
+    global _publisher
+    if not MQ_SERVER:
+        raise MQServerNotConfigured
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = MQPublisher()
+            atexit.register(_publisher.close, MQ_PUBLISH_RETRY_INTERVAL)
+        return _publisher
+
+
 def mq_subscribe(channel, exchange, callback):
     logger.debug("Subscribing to channel : {0}".format(exchange))
     result = channel.queue_declare(exclusive=True)
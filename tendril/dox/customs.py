@@ -744,34 +744,20 @@ def gen_verification_checklist(invoice, target_folder, serialno):
     pb = TendrilProgressBar(max=len(invoice.hssections))
     print("Collating Section Summaries...")
     for section in invoice.hssections:
+        totals = invoice.getsection_totals(section)
         secsum = {'section': section,
                   'code': section.code,
                   'name': section.name,
-                  'idxs': invoice.getsection_idxs(hssection=section),
-                  'assessablevalue':
-                  invoice.getsection_assessabletotal(hssection=section),
-                  'qty': invoice.getsection_qty(hssection=section),
-                  'bcd':
-                  sum([x.bcd.value for x in
-                       invoice.getsection_lines(hssection=section)]),
-                  'cvd':
-                  sum([x.cvd.value for x in
-                       invoice.getsection_lines(hssection=section)]),
-                  'acvd':
-                  sum([x.acvd.value for x in
-                       invoice.getsection_lines(hssection=section)]),
-                  'cec':
-                  sum([x.cec.value for x in
-                       invoice.getsection_lines(hssection=section)]),
-                  'cshec':
-                  sum([x.cshec.value for x in
-                       invoice.getsection_lines(hssection=section)]),
-                  'cvdec':
-                  sum([x.cvdec.value for x in
-                       invoice.getsection_lines(hssection=section)]),
-                  'cvdshec':
-                  sum([x.cvdshec.value for x in
-                       invoice.getsection_lines(hssection=section)]),
+                  'idxs': [x.idx for x in totals['lines']],
+                  'assessablevalue': totals['assessabletotal'],
+                  'qty': totals['qty'],
+                  'bcd': totals['bcd'],
+                  'cvd': totals['cvd'],
+                  'acvd': totals['acvd'],
+                  'cec': totals['cec'],
+                  'cshec': totals['cshec'],
+                  'cvdec': totals['cvdec'],
+                  'cvdshec': totals['cvdshec'],
                   }
         summary.append(secsum)
         pb.next(note=section.code + ' ' + section.name)
@@ -288,7 +288,8 @@ class PCBPrototype(EDAProjectPrototype):
             try:
                 ident = 'PCB ' + self.ident
                 vsi = get_sourcing_information(ident, iqty,
-                                               allvendors=True)
+                                               allvendors=True,
+                                               parallel=True)
             except SourcingException:
                 vsi = []
             self._indicative_sourcing_info = vsi
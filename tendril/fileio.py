@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+File Writing Helpers (:mod:`tendril.fileio`)
+============================================
+
+Helpers for writing files which are shared between processes, such as
+the entries of the caches in the instance cache folder, so that readers
+never see a partially written file.
+
+"""
+
+import os
+import json
+import tempfile
+
+
+def write_file_atomic(path, write, mode='w'):
+    """
+    Writes a file at ``path`` by calling ``write`` with the file object,
+    creating the containing folder if needed. The file is written to a
+    temporary file in the same folder and then moved into place, so
+    concurrent readers never see a partially written file.
+    """
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            if not os.path.isdir(folder):
+                raise
+    fd, tpath = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        try:
+            os.rename(tpath, path)
+        except OSError:
+            # Windows does not allow renaming over an existing file.
+            os.remove(path)
+            os.rename(tpath, path)
+    except BaseException:
+        # Including interruptions, which would otherwise leave the
+        # temporary file behind.
+        if os.path.exists(tpath):
+            os.remove(tpath)
+        raise
+
+
+def write_json_atomic(path, obj):
+    """
+    Writes ``obj`` as JSON to the file at ``path``, atomically (see
+    :func:`write_file_atomic`).
+    """
+    write_file_atomic(path, lambda f: json.dump(obj, f))
@@ -66,7 +66,7 @@ def render_search_results():
         try:
             vsi = get_sourcing_information(
                 ident, qty, avendors=vl, allvendors=True,
-                get_all=form.get_all.data
+                get_all=form.get_all.data, parallel=True
             )
         except SourcingException:
             vsi = []
@@ -20,9 +20,13 @@ gEDA BOM Parser Module (:mod:`tendril.gedaif.bomparser`)
 """
 
 import subprocess
+import multiprocessing
 import csv
 import os
 import shutil
+import hashlib
+import tempfile
+from concurrent import futures
 
 from tendril.conventions.motifs import create_motif_object
 from tendril.conventions.electronics import ident_transform
@@ -36,8 +40,11 @@ from tendril.validation.columns import ColumnsRequiredPolicy
 
 import projfile
 
+from tendril.fileio import write_file_atomic
+
 from tendril.config import INSTANCE_CACHE
 from tendril.config import PROJECTS_ROOT
+from tendril.config import GEDA_SYMLIB_ROOT
 from tendril.utils import fsutils
 from tendril.utils import log
 logger = log.get_logger(__name__, level=log.WARNING)
@@ -45,6 +52,151 @@ logger = log.get_logger(__name__, level=log.WARNING)
 
 FNULL = open(os.devnull, 'w')
 
+#: The folder holding generated BOM files, named by the hash of everything
+#: they are generated from. It is shared by all the processes using the
+#: instance, and by all copies of a project.
+BOM_CACHE_FOLDER = os.path.join(INSTANCE_CACHE, 'gedaproject', 'boms')
+
+#: The folder holding the netlists of individual schematic sheets, named
+#: by the hash of everything they are generated from, from which BOM files
+#: are assembled.
+SHEET_CACHE_FOLDER = os.path.join(BOM_CACHE_FOLDER, 'sheets')
+
+#: The default maximum number of ``gnetlist`` processes run concurrently,
+#: one for each schematic sheet, when generating a BOM file.
+GNETLIST_MAX_WORKERS = multiprocessing.cpu_count()
+
+
+class GnetlistError(Exception):
+    """
+    Raised when ``gnetlist`` fails to produce a netlist for one or more
+    of the schematic sheets of a project. ``failures`` is a list of
+    (schematic file, exit status, output) tuples, one for each failed
+    sheet.
+    """
+    def __init__(self, projectfolder, failures):
+        self.projectfolder = projectfolder
+        self.failures = failures
+        super(GnetlistError, self).__init__(
+            "gnetlist failed for {0} : {1}".format(
+                projectfolder, ', '.join(
+                    "{0} ({1})".format(schfile, returncode)
+                    for schfile, returncode, _ in failures
+                )
+            )
+        )
+
+
+def _create_shared_folder(folder):
+    if not os.path.exists(folder):
+        try:
+            os.makedirs(folder)
+            os.chmod(folder, 0o777)
+        except OSError:
+            if not os.path.isdir(folder):
+                raise
+
+
+def hash_sources(params, sources):
+    """
+    Returns a hash of the given parameter strings, and of the names and
+    contents of the given (name, path) sources, with a path of ``None``
+    for any source which doesn't exist. Modification times and the
+    locations of the sources don't figure in it.
+    """
+    sha = hashlib.sha1()
+    for param in params:
+        sha.update('\n{0}:{1}'.format(len(param), param))
+    for name, path in sources:
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                content = f.read()
+            sha.update('\n{0}:{1}:{2}:'.format(len(name), name,
+                                               len(content)))
+            sha.update(content)
+        else:
+            sha.update('\n{0}:{1}:-'.format(len(name), name))
+    return sha.hexdigest()
+
+
+def _copy_file_atomic(src, dst):
+    with open(src, 'rb') as f:
+        write_file_atomic(dst, lambda x: shutil.copyfileobj(f, x),
+                          mode='wb')
+    os.chmod(dst, 0o666)
+
+
+_symbol_paths = None
+_missing_symbols = set()
+
+
+def _get_symbol_paths(symbols):
+    # Maps symbol file names to their paths in the gEDA symbol library.
+    # The library is walked once, and again only if symbols include one
+    # which has been added or moved since and wasn't missing then as well.
+    # Symbols from outside the library, such as gEDA's own, are missing.
+    global _symbol_paths
+    if _symbol_paths is None or any(
+            not os.path.exists(_symbol_paths.get(x, '')) and
+            x not in _missing_symbols for x in symbols):
+        paths = {}
+        for root, dirs, files in os.walk(GEDA_SYMLIB_ROOT):
+            dirs.sort()
+            for f in sorted(files):
+                if f.endswith('.sym') and f not in paths:
+                    paths[f] = os.path.join(root, f)
+        _symbol_paths = paths
+        _missing_symbols.update(x for x in symbols if x not in paths)
+    return _symbol_paths
+
+
+def _get_schematic_symbols(schpath):
+    # Returns the names of the library symbols used by the components of
+    # the schematic, from the 'C x y selectable angle mirror basename'
+    # lines. Embedded symbols are part of the schematic itself.
+    symbols = set()
+    with open(schpath, 'r') as f:
+        for line in f:
+            if line.startswith('C '):
+                fields = line.split()
+                if len(fields) >= 7 and \
+                        not fields[6].startswith('EMBEDDED'):
+                    symbols.add(fields[6])
+    return symbols
+
+
+def get_folder_sources(folder):
+    """
+    Returns a list of (name, path) tuples, for use with
+    :func:`hash_sources`, of the files in ``folder`` and of the library
+    symbols used by the schematics among them.
+    """
+    rval = []
+    symbols = set()
+    for f in sorted(os.listdir(folder)):
+        path = os.path.join(folder, f)
+        if not os.path.isfile(path):
+            continue
+        rval.append((f, path))
+        if f.endswith('.sch'):
+            symbols.update(_get_schematic_symbols(path))
+    symbol_paths = _get_symbol_paths(symbols)
+    for symbol in sorted(symbols):
+        rval.append(('symbols/' + symbol, symbol_paths.get(symbol)))
+    return rval
+
+
+def _run_gnetlist(cmd, schpath, soutpath):
+    # Any netlist left over from a previous run is removed first, so that
+    # it isn't mistaken for the output of a failed run.
+    if os.path.exists(soutpath):
+        os.remove(soutpath)
+    process = subprocess.Popen(cmd + ['-o', soutpath, schpath],
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    output = process.communicate()[0]
+    return process.returncode, output
+
 
 class BomLine(object):
 
@@ -59,6 +211,9 @@ class BomLine(object):
         return self.data.__repr__()
 
     def __getattr__(self, item):
+        if item == 'data':
+            # data isn't set yet while the line is being unpickled.
+            raise AttributeError(item)
         if item in self.data.keys():
             return self.data[item]
         elif item == 'ident':
@@ -84,6 +239,7 @@ class CachedBomParser(object):
         self.line_gen = None
         self._use_cached = use_cached
         self._generator_args = kwargs
+        self._temp_folder_path = None
 
     @property
     def _source_folder(self):
@@ -95,40 +251,90 @@ class CachedBomParser(object):
 
     @property
     def _temp_folder(self):
-        return os.path.join(fsutils.TEMPDIR, self._namebase, self._basefolder)
+        # Each parser works in a folder of its own, so that concurrent
+        # builds of the same project don't interfere with each other.
+        if self._temp_folder_path is None:
+            folder = os.path.join(fsutils.TEMPDIR, self._namebase)
+            if not os.path.exists(folder):
+                try:
+                    os.makedirs(folder)
+                except OSError:
+                    if not os.path.isdir(folder):
+                        raise
+            self._temp_folder_path = tempfile.mkdtemp(
+                prefix=self._basefolder + '.', dir=folder
+            )
+        return self._temp_folder_path
 
     @property
     def _temp_bom_path(self):
         return os.path.join(self._temp_folder, "tempbom.net")
 
-    @property
-    def _cache_folder(self):
-        return os.path.join(INSTANCE_CACHE, 'gedaproject', self._namebase)
-
-    @property
-    def _cached_bom_path(self):
-        return os.path.join(self._cache_folder, 'bom.net')
+    def _get_cache_params(self):
+        """
+        Returns a list of strings describing the parameters, other than
+        the sources, which the generated BOM file depends on. By default,
+        these are all the arguments to :meth:`generate_bom_file`.
+        """
+        return ['{0}={1}'.format(k, v)
+                for k, v in sorted(self._generator_args.items())]
+
+    def _get_cache_sources(self):
+        """
+        Returns a list of (name, path) tuples of the files the generated
+        BOM file depends on, with a path of ``None`` for any which don't
+        exist. By default, these are all the files in the source folder.
+        """
+        rval = []
+        for root, dirs, files in os.walk(self._source_folder):
+            dirs.sort()
+            for f in sorted(files):
+                path = os.path.join(root, f)
+                rval.append((os.path.relpath(path, self._source_folder),
+                             path))
+        return rval
+
+    def _get_cache_key(self):
+        return hash_sources(
+            [type(self).__name__] + self._get_cache_params(),
+            self._get_cache_sources()
+        )
 
     def generate_bom_file(self, outfile, **kwargs):
         raise NotImplementedError
 
     def get_bom_file(self):
-        if not os.path.exists(self._cache_folder):
-            os.makedirs(self._cache_folder)
-            os.chmod(self._cache_folder, 0o777)
-
-        bom_mtime = fsutils.get_file_mtime(self._cached_bom_path)
-        source_mtime = fsutils.get_folder_mtime(self._source_folder)
-
-        if self._use_cached is True and bom_mtime is not None \
-                and source_mtime < bom_mtime:
-            return open(self._cached_bom_path, 'r')
-        else:
-            self.generate_bom_file(self._temp_bom_path,
-                                   **self._generator_args)
-            shutil.copy(self._temp_bom_path, self._cached_bom_path)
-            os.chmod(self._cached_bom_path, 0o666)
-            return open(self._cached_bom_path, 'r')
+        """
+        Returns the BOM file for the project, opened for reading.
+
+        Generated BOM files are kept in :data:`BOM_CACHE_FOLDER`, keyed by
+        a hash of their sources and generation parameters (see
+        :meth:`_get_cache_sources` and :meth:`_get_cache_params`), and
+        reused unless ``use_cached`` was ``False``. Entries are written
+        atomically, so concurrent processes can share them. The temporary
+        folder the BOM file is generated in is removed once it has been
+        cached, or if generating it fails.
+        """
+        _create_shared_folder(BOM_CACHE_FOLDER)
+        cache_path = os.path.join(BOM_CACHE_FOLDER,
+                                  self._get_cache_key() + '.net')
+
+        if self._use_cached is not True or not os.path.exists(cache_path):
+            try:
+                self.generate_bom_file(self._temp_bom_path,
+                                       **self._generator_args)
+                _copy_file_atomic(self._temp_bom_path, cache_path)
+            finally:
+                # Nothing in it is needed once the BOM file is cached, and
+                # a failed generation would otherwise leave it behind, as
+                # cleanup is only reached by reading the BOM.
+                self._remove_temp_folder()
+        return open(cache_path, 'r')
+
+    def _remove_temp_folder(self):
+        if self._temp_folder_path is not None:
+            shutil.rmtree(self._temp_folder_path, ignore_errors=True)
+            self._temp_folder_path = None
 
     def get_lines(self):
         raise NotImplementedError
@@ -142,10 +348,12 @@ class GedaBomParser(CachedBomParser):
     _basefolder = 'schematic'
     _expected_columns = ()
 
-    def __init__(self, projectfolder, use_cached=True, backend=None):
+    def __init__(self, projectfolder, use_cached=True, backend=None,
+                 workers=None):
         super(GedaBomParser, self).__init__(projectfolder,
                                             use_cached=use_cached,
-                                            backend=backend)
+                                            backend=backend,
+                                            workers=workers)
         self._gpf = projfile.GedaProjectFile(self.projectfolder)
         self._column_policy = ColumnsRequiredPolicy(self._validation_context,
                                                     self._expected_columns)
@@ -175,13 +383,114 @@ class GedaBomParser(CachedBomParser):
         raise IOError("Attribs file not found for {0}"
                       "".format(self.projectfolder))
 
-    def generate_bom_file(self, outpath, backend=None):
+    def _netlist_sheets(self, cmd, sheets, workers):
+        # Runs gnetlist for each of the (schematic, output) paths in
+        # sheets, up to workers at a time, and returns the results in the
+        # same order as the sheets.
+        workers = min(workers, len(sheets))
+        if workers <= 1:
+            return [_run_gnetlist(cmd, schpath, soutpath)
+                    for schpath, soutpath in sheets]
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            jobs = [executor.submit(_run_gnetlist, cmd, schpath, soutpath)
+                    for schpath, soutpath in sheets]
+            return [job.result() for job in jobs]
+
+    def _get_cache_params(self):
+        # The number of workers doesn't change the BOM file.
+        return ['backend={0}'.format(self._generator_args.get('backend'))]
+
+    def _get_cache_sources(self):
+        # The schematic sheets, the attribs file, and the library symbols
+        # the sheets use, which provide the default attributes of their
+        # components.
+        rval = []
+        symbols = set()
+        for schpath in self._gpf.schpaths:
+            rval.append((os.path.split(schpath)[1], schpath))
+            symbols.update(_get_schematic_symbols(schpath))
+        rval.append(('attribs', self._get_attribs_file()))
+        symbol_paths = _get_symbol_paths(symbols)
+        for symbol in sorted(symbols):
+            rval.append(('symbols/' + symbol, symbol_paths.get(symbol)))
+        return rval
+
+    def _get_sheet_cache_path(self, schpath, symbols, symbol_paths,
+                              attribs, backend):
+        # The netlist of a sheet depends on the sheet, the attribs file,
+        # the library symbols it uses and the backend, but not on the
+        # name of the sheet, which is only added when they're combined.
+        sources = [('sheet', schpath), ('attribs', attribs)]
+        sources.extend(('symbols/' + x, symbol_paths.get(x))
+                       for x in sorted(symbols))
+        key = hash_sources(['gnetlist', 'backend={0}'.format(backend)],
+                           sources)
+        return os.path.join(SHEET_CACHE_FOLDER, key + '.net')
+
+    def generate_bom_file(self, outpath, backend=None, workers=None):
+        """
+        Generates the BOM file for the project at ``outpath``, using the
+        given ``gnetlist`` backend.
+
+        ``gnetlist`` is run separately for each schematic sheet, with up
+        to ``workers`` (by default, :data:`GNETLIST_MAX_WORKERS`) sheets
+        being netlisted at once. The netlists of the sheets are kept in
+        :data:`SHEET_CACHE_FOLDER`, keyed by a hash of the sheet and of
+        what else its netlist depends on, so only sheets which have
+        changed are netlisted again unless ``use_cached`` was ``False``.
+
+        The netlists of the sheets are combined in the order of the sheets
+        in the project file. If any of the sheets fail to produce a
+        netlist, a :class:`GnetlistError` listing all of them is raised.
+        """
+        if workers is None:
+            workers = GNETLIST_MAX_WORKERS
         self._get_temp_schematic()
+        attribs = self._get_attribs_file()
         cmd = ["gnetlist",
                '-g', backend,
-               '-Oattrib_file=' + self._get_attribs_file()
+               '-Oattrib_file=' + attribs
                ]
         outdir, outfile = os.path.split(outpath)
+        sheet_symbols = [_get_schematic_symbols(x) for x in self.schpaths]
+        symbol_paths = _get_symbol_paths(set().union(*sheet_symbols))
+        _create_shared_folder(SHEET_CACHE_FOLDER)
+        sheets = []
+        pending = []
+        for schpath, symbols in zip(self.schpaths, sheet_symbols):
+            cache_path = self._get_sheet_cache_path(
+                schpath, symbols, symbol_paths, attribs, backend
+            )
+            if self._use_cached is True and os.path.exists(cache_path):
+                sheets.append((schpath, cache_path))
+                continue
+            schfile = os.path.split(schpath)[1]
+            soutpath = os.path.join(outdir, '.'.join([schfile, outfile]))
+            sheets.append((schpath, soutpath))
+            pending.append((schpath, soutpath, cache_path))
+        logger.info("Netlisting {0} of {1} sheets for {2}".format(
+            len(pending), len(sheets), self.projectfolder
+        ))
+
+        failures = []
+        results = self._netlist_sheets(cmd, [x[:2] for x in pending],
+                                       workers)
+        for (schpath, soutpath, cache_path), (returncode, output) in \
+                zip(pending, results):
+            schfile = os.path.split(schpath)[1]
+            if not os.path.exists(soutpath):
+                logger.error("gnetlist failed for {0} with exit status "
+                             "{1} :\n{2}".format(schfile, returncode, output))
+                failures.append((schfile, returncode, output))
+            elif returncode != 0:
+                # Not cached, so that the problem is reported again.
+                logger.warning("gnetlist exited with status {0} for {1} :"
+                               "\n{2}".format(returncode, schfile, output))
+            else:
+                _copy_file_atomic(soutpath, cache_path)
+        if failures:
+            raise GnetlistError(self.projectfolder, failures)
+
         idx_refdes = None
         idx_schfile = None
         intermediate_outpath = os.path.join(outdir, 'int.' + outfile)
@@ -190,13 +499,8 @@ class GedaBomParser(CachedBomParser):
             header_written = False
             found_refdes = set()
             additional_schfiles = {}
-            for schpath in self.schpaths:
+            for schpath, soutpath in sheets:
                 schfile = os.path.split(schpath)[1]
-                soutpath = os.path.join(outdir, '.'.join([schfile, outfile]))
-                scmd = cmd + ['-o', soutpath, schpath]
-                subprocess.call(scmd,
-                                stdout=FNULL,
-                                stderr=subprocess.STDOUT,)
                 with open(soutpath, 'rb') as sf:
                     sr = csv.reader(sf, delimiter='\t')
                     if not header_written:
@@ -249,10 +553,7 @@ class GedaBomParser(CachedBomParser):
 
     def cleanup(self):
         self.bom_reader.close()
-        if os.path.exists(self._temp_bom_path):
-            os.remove(self._temp_bom_path)
-        for tschpath in self.schpaths:
-            os.remove(tschpath)
+        self._remove_temp_folder()
 
 
 class MotifAwareBomParser(GedaBomParser):
@@ -35,6 +35,7 @@ with tendril.
    tendril.scripts.order
    tendril.scripts.production
    tendril.scripts.runtest
+   tendril.scripts.sourcingworker
    tendril.scripts.validate
    tendril.scripts.makelabels
    tendril.scripts.testresult
@@ -25,6 +25,9 @@ recognized projects based on the criteria specified by the command parameters.
     The parameters used for obtaining the PCB pricing and the quantity range
     are determined by the content of the project's ``configs.yaml`` file.
 
+Once done, the CSIL pricing model used to estimate the pricing of PCBs
+which don't have any is fitted again to all the available PCB pricing.
+
 .. warning::
     This script retrieves pricing information from the PCB vendor. It will
     take quite some time to execute.
@@ -164,6 +167,8 @@ def main():
                             logger.info("Will check " + target)
                     except NoGedaProjectError:
                         logger.error("No gEDA Project found at " + target)
+    if not args.dry_run and (args.all or len(args.projfolders)):
+        csil.fit_pricing_model()
 
 
 if __name__ == '__main__':
@@ -62,14 +62,26 @@ def _get_parser():
         help="Don't regenerate mapfile for idents which exist, "
              "even if it is stale."
     )
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=1, metavar='N',
+        help="Search for up to N idents concurrently, subject to the "
+             "vendor's rate limit."
+    )
+    parser.add_argument(
+        '--restart', action='store_true', default=False,
+        help="Ignore the checkpoint left by an interrupted run and "
+             "start over."
+    )
     return parser
 
 
-def run(vobj=None, force=False, lazy=False):
+def run(vobj=None, force=False, lazy=False, jobs=1, restart=False):
     """
     Generates vendor maps for the provided vendor.
 
     :param vobj: Vendor to generate the map for, or None for all.
+    :param jobs: Number of idents to search for concurrently.
+    :param restart: Whether to ignore checkpoints left by interrupted runs.
 
     """
     from tendril.sourcing.map import gen_vendor_mapfile
@@ -85,9 +97,9 @@ def run(vobj=None, force=False, lazy=False):
 
     if not vobj:
         for v in vendor_list:
-            gen_vendor_mapfile(v, maxage)
+            gen_vendor_mapfile(v, maxage, workers=jobs, resume=not restart)
     else:
-        gen_vendor_mapfile(vobj, maxage)
+        gen_vendor_mapfile(vobj, maxage, workers=jobs, resume=not restart)
 
 
 def main():
@@ -97,7 +109,8 @@ def main():
     parser = _get_parser()
     args = parser.parse_args()
     if args.all:
-        run(force=args.force, lazy=args.lazy)
+        run(force=args.force, lazy=args.lazy,
+            jobs=args.jobs, restart=args.restart)
         return
 
     if not args.vendor_name:
@@ -116,7 +129,7 @@ def main():
             print("  {0:<20} {1}".format(v._name, v.name))
         return
 
-    run(v, args.force, args.lazy)
+    run(v, args.force, args.lazy, args.jobs, args.restart)
 
 
 if __name__ == '__main__':
@@ -63,6 +63,7 @@ if __name__ == '__main__':
     PRIORITIZE = False
     PRELIMINARY = False
     IMMEDIATE_EARMARKS = []
+    REBALANCE = 'heuristic'
 
     if 'preshort' in data.keys():
         LOAD_PRESHORT = data['preshort']
@@ -81,6 +82,8 @@ if __name__ == '__main__':
         IMMEDIATE_EARMARKS = data['immediate']
     if 'preliminary' in data.keys():
         PRELIMINARY = data['preliminary']
+    if 'rebalance' in data.keys():
+        REBALANCE = data['rebalance']
 
     # Define base transforms for external data
     base_tf_0 = tendril.inventory.electronics.inventory_locations[0]._reader.tf  # noqa
@@ -243,6 +246,7 @@ if __name__ == '__main__':
 
     unsourced = []
     deferred = []
+    order_lines = []
     nlines = len(cobom.lines)
     pb = TendrilProgressBar(max=nlines)
 
@@ -365,9 +369,12 @@ if __name__ == '__main__':
                     )
                     shortage = 0
         if shortage > 0:
-            result = tendril.sourcing.electronics.order.add(line.ident, line.quantity, shortage, orderref)  # noqa
-            if result is False:
-                unsourced.append((line.ident, shortage))
+            order_lines.append((line.ident, line.quantity, shortage))
+
+    results = tendril.sourcing.electronics.order.add_many(order_lines, orderref)  # noqa
+    for (ident, _, shortage), result in zip(order_lines, results):
+        if result is False:
+            unsourced.append((ident, shortage))
 
     if len(unsourced) > 0:
         logger.warning("Unable to source the following components: ")
@@ -379,7 +386,7 @@ if __name__ == '__main__':
             logger.warning("{0:<40}{1:>5}".format(elem[0], elem[1]))
 
     tendril.sourcing.electronics.order.collapse()
-    tendril.sourcing.electronics.order.rebalance()
+    tendril.sourcing.electronics.order.rebalance(mode=REBALANCE)
     tendril.sourcing.electronics.order.generate_orders(orders_path)
     tendril.sourcing.electronics.order.dump_to_file(os.path.join(orderfolder, 'shortage.csv'), include_others=True)  # noqa
     tendril.inventory.electronics.export_reservations(reservations_path)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+tendril-sourcingworker
+======================
+
+This script runs the sourcing refresh worker, which consumes the refresh
+requests published when stale vendor part information or vendor maps are
+encountered, and refreshes them from the vendors.
+
+The worker runs until interrupted, or, with ``--idle-exit``, until there
+have been no requests for the given time, which is useful when it is run
+periodically instead of as a service.
+
+.. warning::
+    This script retrieves information from vendors. It needs the message
+    queue server (``MQ_SERVER``) to be configured.
+
+.. seealso::
+    :mod:`tendril.sourcing.worker`
+
+.. rubric:: Script Usage
+
+.. argparse::
+    :module: tendril.scripts.sourcingworker
+    :func: _get_parser
+    :prog: tendril-sourcingworker
+    :nodefault:
+
+"""
+
+import argparse
+from .helpers import add_base_options
+
+from tendril.sourcing import worker
+
+
+def _get_parser():
+    """
+    Constructs the CLI argument parser for the tendril-sourcingworker
+    script.
+    """
+    parser = argparse.ArgumentParser(
+        description='Refresh stale sourcing information from vendors.',
+        prog='tendril-sourcingworker'
+    )
+    add_base_options(parser)
+    parser.add_argument(
+        '--batch-size', '-b', type=int, default=worker.REFRESH_BATCH_SIZE,
+        metavar='N',
+        help='Refresh up to N parts or maps from a vendor together.'
+    )
+    parser.add_argument(
+        '--prefetch', '-p', type=int,
+        default=worker.REFRESH_PREFETCH_COUNT, metavar='N',
+        help='Hold up to N unprocessed requests, to be ordered by priority.'
+    )
+    parser.add_argument(
+        '--idle-exit', type=float, default=None, metavar='SECONDS',
+        help='Exit once there have been no requests for SECONDS.'
+    )
+    parser.add_argument(
+        '--stats-interval', type=float,
+        default=worker.REFRESH_STATS_INTERVAL, metavar='SECONDS',
+        help='Log throughput statistics every SECONDS.'
+    )
+    return parser
+
+
+def main():
+    """
+    The tendril-sourcingworker script entry point.
+    """
+    parser = _get_parser()
+    args = parser.parse_args()
+
+    from tendril.sourcing.electronics import vendor_list
+    rworker = worker.RefreshWorker(vendor_list, batch_size=args.batch_size,
+                                   prefetch_count=args.prefetch,
+                                   stats_interval=args.stats_interval)
+    try:
+        rworker.run(idle_exit=args.idle_exit)
+    except KeyboardInterrupt:
+        pass
+
+    stats = rworker.stats
+    print("Refreshed {0} parts and {1} maps, {2} failed, {3} merged, "
+          "{4} discarded.".format(stats['vpinfo'], stats['vpmap'],
+                                  stats['failed'], stats['merged'],
+                                  stats['discarded']))
+    for name, count in sorted(stats['vendors'].items()):
+        print("  {0:<20} {1}".format(name, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -121,10 +121,73 @@ class CustomsSection(object):
         return "{0:<15} {1}".format(self._code, self.name)
 
 
+class _PatternAutomaton(object):
+    # An Aho-Corasick automaton over a set of substring patterns, each with
+    # an associated value, which finds the values of all the patterns
+    # occurring in a string in a single pass over it.
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern, value in patterns:
+            node = 0
+            for char in pattern:
+                nnode = self._goto[node].get(char)
+                if nnode is None:
+                    nnode = len(self._goto)
+                    self._goto[node][char] = nnode
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nnode
+            self._out[node].append(value)
+        # Breadth first, so that the failure links of shallower nodes are
+        # in place before they are needed. Each node also outputs the
+        # values of the node its failure link points to.
+        pending = list(self._goto[0].values())
+        while pending:
+            npending = []
+            for node in pending:
+                for char, child in self._goto[node].items():
+                    fail = self._fail[node]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    fail = self._goto[fail].get(char, 0)
+                    self._fail[child] = fail
+                    self._out[child] = self._out[child] + self._out[fail]
+                    npending.append(child)
+            pending = npending
+
+    def find(self, text):
+        """
+        Returns the set of values of all the patterns occurring in text.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        rval = set(out[0])
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                rval.update(out[node])
+        return rval
+
+
 class CustomsClassifier(object):
+    """
+    Classifies idents into the HS sections of ``hs_codes.yaml``. The match
+    rules of all the sections are compiled into one automaton each for
+    idents and symbol folders when loaded, and classifications are
+    memoized.
+    """
     def __init__(self):
         self._sections = []
         self._load_sections()
+        self._compile()
+        self._ident_cache = {}
+        self._folder_cache = {}
+        self._folders = {}
 
     def _load_sections(self):
         hs_codes_file = os.path.join(CUSTOMSDEFAULTS_FOLDER, 'hs_codes.yaml')
@@ -133,25 +196,71 @@ class CustomsClassifier(object):
             for section, sectiondict in data['sections'].iteritems():
                 self._sections.append(CustomsSection(section, sectiondict))
 
-    def hs_from_ident(self, ident):
-        for section in self._sections:
-            if section.idents is not None:
-                for sign in section.idents:
-                    if sign in ident:
-                        return section
+    def _compile(self):
+        # Matches are identified by (section index, pattern index), which
+        # orders them the same way the sections and patterns are listed.
+        self._ident_patterns = _PatternAutomaton(
+            (sign, (sidx, pidx))
+            for sidx, section in enumerate(self._sections)
+            for pidx, sign in enumerate(section.idents or [])
+        )
+        self._folder_patterns = _PatternAutomaton(
+            (sign, (sidx, pidx))
+            for sidx, section in enumerate(self._sections)
+            for pidx, sign in enumerate(section.folders or [])
+        )
+
+    def clear_cache(self):
+        """
+        Clears the memoized classifications, for use if the symbol
+        library has changed.
+        """
+        self._ident_cache = {}
+        self._folder_cache = {}
+        self._folders = {}
+
+    def _get_folder(self, ident):
+        try:
+            return self._folders[ident]
+        except KeyError:
+            folder = gsymlib.get_symbol_folder(ident, True)
+            self._folders[ident] = folder
+            return folder
+
+    def _hs_from_folder(self, folder):
+        try:
+            return self._folder_cache[folder]
+        except KeyError:
+            pass
         rsign = ''
         rsec = None
-        for section in self._sections:
-            if section.folders is not None:
-                for sign in section.folders:
-                    if sign in gsymlib.get_symbol_folder(ident, True):
-                        if rsign in sign:
-                            rsec = section
-                            rsign = sign
+        for sidx, pidx in sorted(self._folder_patterns.find(folder)):
+            sign = self._sections[sidx].folders[pidx]
+            if rsign in sign:
+                rsec = self._sections[sidx]
+                rsign = sign
+        self._folder_cache[folder] = rsec
         return rsec
 
+    def hs_from_ident(self, ident):
+        try:
+            return self._ident_cache[ident]
+        except KeyError:
+            pass
+        matches = self._ident_patterns.find(ident)
+        if matches:
+            rval = self._sections[min(matches)[0]]
+        else:
+            rval = self._hs_from_folder(self._get_folder(ident))
+        self._ident_cache[ident] = rval
+        return rval
+
 hs_classifier = CustomsClassifier()
 
+#: The duty components levied on each line, in the order they are totalled
+#: into the duty payable.
+DUTY_COMPONENTS = ('bcd', 'cvd', 'cec', 'cshec', 'cvdec', 'cvdshec', 'acvd')
+
 
 class CustomsInvoice(VendorInvoice):
     def __init__(self, vendor, inv_yaml, working_folder=None):
@@ -174,6 +283,7 @@ class CustomsInvoice(VendorInvoice):
             inv_data = yaml.load(f)
             self._data.update(inv_data)
         self._linetype = CustomsInvoiceLine
+        self.invalidate()
         vendor.currency = currency.CurrencyDefinition(
             vendor.currency.code, vendor.currency.symbol,
             exchval=self._data['exchrate']
@@ -184,6 +294,7 @@ class CustomsInvoice(VendorInvoice):
 
         self.freight = 0
         self.insurance_pc = 0
+        self.handling_pc = None
         self._includes_freight = False
         self._added_insurance = False
         self._process_other_costs()
@@ -291,80 +402,141 @@ class CustomsInvoice(VendorInvoice):
     def _acquire_lines(self):
         raise NotImplementedError
 
-    @property
-    def hssections(self):
-        rval = []
+    def add_line(self, line):
+        """
+        Adds a line to the invoice, discarding the cached totals.
+        """
+        self._lines.append(line)
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Discards the cached totals of the invoice. The totals are computed
+        when first needed and reused thereafter, so this must be called if
+        the lines of the invoice, or the freight, insurance or handling
+        applied over them, are changed other than by :meth:`add_line`.
+        """
+        self._extendedtotal = None
+        self._totals = None
+
+    @property
+    def extendedtotal(self):
+        if self._extendedtotal is None:
+            self._extendedtotal = super(CustomsInvoice, self).extendedtotal
+        return self._extendedtotal
+
+    def _get_totals(self):
+        # Classifies every line and accumulates the per-section and the
+        # invoice totals together, in a single pass over the lines.
+        if self._totals is not None:
+            return self._totals
+        sections = {}
+        unclassified = []
+        assessabletotal = 0
+        duties = dict.fromkeys(DUTY_COMPONENTS, 0)
         for line in self._lines:
-            if line.hs_section is None:
+            assessableprice = line.assessableprice
+            assessabletotal += assessableprice
+            hs_section = line.hs_section
+            if hs_section is None:
+                unclassified.append(line)
                 continue
-            if line.hs_section not in rval:
-                rval.append(line.hs_section)
-        return sorted(rval, key=lambda x: x.code)
+            if hs_section not in sections:
+                sections[hs_section] = {'lines': [], 'qty': 0,
+                                        'assessabletotal': 0}
+                sections[hs_section].update(
+                    dict.fromkeys(DUTY_COMPONENTS, 0)
+                )
+            stotals = sections[hs_section]
+            stotals['lines'].append(line)
+            stotals['qty'] += line.qty
+            stotals['assessabletotal'] += assessableprice
+            lduties = line.duty_values
+            for duty in DUTY_COMPONENTS:
+                stotals[duty] += lduties[duty]
+                duties[duty] += lduties[duty]
+        self._totals = {
+            'sections': sections,
+            'hssections': sorted(sections.keys(), key=lambda x: x.code),
+            'unclassified': unclassified,
+            'assessabletotal': assessabletotal,
+            # Duties are not defined for unclassified lines, and so
+            # neither are they for an invoice containing any.
+            'duties': duties if not unclassified else None,
+        }
+        return self._totals
+
+    @property
+    def hssections(self):
+        return list(self._get_totals()['hssections'])
+
+    def getsection_totals(self, hssection):
+        """
+        Returns a dict containing the ``lines`` classified into the given
+        section, their total ``qty``, ``assessabletotal``, and the total of
+        each of the :data:`DUTY_COMPONENTS`.
+        """
+        try:
+            return self._get_totals()['sections'][hssection]
+        except KeyError:
+            rval = {'lines': [], 'qty': 0, 'assessabletotal': 0}
+            rval.update(dict.fromkeys(DUTY_COMPONENTS, 0))
+            return rval
 
     def getsection_lines(self, hssection):
-        rval = []
-        for line in self._lines:
-            if line.hs_section == hssection:
-                rval.append(line)
-        return rval
+        return list(self.getsection_totals(hssection)['lines'])
 
     def getsection_idxs(self, hssection):
-        rval = []
-        for line in self.getsection_lines(hssection):
-            rval.append(line.idx)
-        return rval
+        return [x.idx for x in self.getsection_totals(hssection)['lines']]
 
     def getsection_qty(self, hssection):
-        rval = 0
-        for line in self.getsection_lines(hssection):
-            rval += line.qty
-        return rval
+        return self.getsection_totals(hssection)['qty']
 
     def getsection_assessabletotal(self, hssection):
-        rval = 0
-        for line in self.getsection_lines(hssection):
-            rval += line.assessableprice
-        return rval
+        return self.getsection_totals(hssection)['assessabletotal']
 
     @property
     def unclassified(self):
-        rval = []
-        for line in self._lines:
-            if line.hs_section is None:
-                rval.append(line)
-        return rval
+        return list(self._get_totals()['unclassified'])
 
     @property
     def assessabletotal(self):
-        return sum([x.assessableprice for x in self._lines])
+        return self._get_totals()['assessabletotal']
+
+    def _get_duty_total(self, duty):
+        duties = self._get_totals()['duties']
+        if duties is None:
+            raise AttributeError("Duties are not defined for invoices with "
+                                 "unclassified lines")
+        return duties[duty]
 
     @property
     def bcd(self):
-        return sum([x.bcd.value for x in self.lines])
+        return self._get_duty_total('bcd')
 
     @property
     def cvd(self):
-        return sum([x.cvd.value for x in self.lines])
+        return self._get_duty_total('cvd')
 
     @property
     def cec(self):
-        return sum([x.cec.value for x in self.lines])
+        return self._get_duty_total('cec')
 
     @property
     def cshec(self):
-        return sum([x.cshec.value for x in self.lines])
+        return self._get_duty_total('cshec')
 
     @property
     def cvdec(self):
-        return sum([x.cvdec.value for x in self.lines])
+        return self._get_duty_total('cvdec')
 
     @property
     def cvdshec(self):
-        return sum([x.cvdshec.value for x in self.lines])
+        return self._get_duty_total('cvdshec')
 
     @property
     def acvd(self):
-        return sum([x.acvd.value for x in self.lines])
+        return self._get_duty_total('acvd')
 
     @property
     def dutypayable(self):
@@ -405,9 +577,10 @@ class CustomsInvoiceLine(VendorInvoiceLine):
 
     @property
     def dutypayable(self):
-        return self.bcd.value + self.cvd.value + self.cec.value + \
-            self.cshec.value + self.cvdec.value + self.cvdshec.value + \
-            self.acvd.value
+        duties = self.duty_values
+        return duties['bcd'] + duties['cvd'] + duties['cec'] + \
+            duties['cshec'] + duties['cvdec'] + duties['cvdshec'] + \
+            duties['acvd']
 
     @property
     def idx(self):
@@ -424,39 +597,58 @@ class CustomsInvoiceLine(VendorInvoiceLine):
             logger.warning("Could not classify : " + self.ident)
         return hs_section
 
+    @property
+    def duty_values(self):
+        """
+        A dict containing the value of each of the :data:`DUTY_COMPONENTS`
+        levied on the line, computed together since each depends on those
+        before it.
+        """
+        hs_section = self.hs_section
+        assessableprice = self.assessableprice
+        bcd = assessableprice * hs_section.bcd / 100.0
+        cvd = (assessableprice + bcd) * hs_section.cvd / 100.0
+        cvdec = cvd * hs_section.cvdec / 100.0
+        cvdshec = cvd * hs_section.cvdshec / 100.0
+        cec = (bcd + cvd + cvdec + cvdshec) * hs_section.cec / 100.0
+        cshec = (bcd + cvd + cvdec + cvdshec) * hs_section.cshec / 100.0
+        acvd = (assessableprice + bcd + cvd + cec + cshec + cvdec + cvdshec) * hs_section.acvd / 100.0  # noqa
+        return {'bcd': bcd, 'cvd': cvd, 'cec': cec, 'cshec': cshec,
+                'cvdec': cvdec, 'cvdshec': cvdshec, 'acvd': acvd}
+
     @property
     def bcd(self):
         return DutyComponent(
             "BCD", self.hs_section.bcd, self.hs_section.bcd_notif,
-            self.assessableprice * self.hs_section.bcd / 100.0
+            self.duty_values['bcd']
         )
 
     @property
     def cvd(self):
         return DutyComponent(
             "CVD", self.hs_section.cvd, self.hs_section.cvd_notif,
-            (self.assessableprice + self.bcd.value) * self.hs_section.cvd / 100.0  # noqa
+            self.duty_values['cvd']
         )
 
     @property
     def cec(self):
         return DutyComponent(
             "C EC", self.hs_section.cec, self.hs_section.cec_notif,
-            (self.bcd.value + self.cvd.value + self.cvdec.value + self.cvdshec.value) * self.hs_section.cec / 100.0  # noqa
+            self.duty_values['cec']
         )
 
     @property
     def cshec(self):
         return DutyComponent(
             "C SHEC", self.hs_section.cshec, self.hs_section.cshec_notif,
-            (self.bcd.value + self.cvd.value + self.cvdec.value + self.cvdshec.value) * self.hs_section.cshec / 100.0  # noqa
+            self.duty_values['cshec']
         )
 
     @property
     def cvdec(self):
         return DutyComponent(
             "CVD EC", self.hs_section.cvdec, self.hs_section.cvdec_notif,
-            self.cvd.value * self.hs_section.cvdec / 100.0
+            self.duty_values['cvdec']
         )
 
     @property
@@ -464,14 +656,14 @@ class CustomsInvoiceLine(VendorInvoiceLine):
         return DutyComponent(
             "CVD SHEC", self.hs_section.cvdshec,
             self.hs_section.cvdshec_notif,
-            self.cvd.value * self.hs_section.cvdshec / 100.0
+            self.duty_values['cvdshec']
         )
 
     @property
     def acvd(self):
         return DutyComponent(
             "SAD", self.hs_section.acvd, self.hs_section.acvd_notif,
-            (self.assessableprice + self.bcd.value + self.cvd.value + self.cec.value + self.cshec.value + self.cvdec.value + self.cvdshec.value) * self.hs_section.acvd / 100.0  # noqa
+            self.duty_values['acvd']
         )
 
     @property
@@ -25,6 +25,11 @@ import arrow
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import exists
+from sqlalchemy.sql import and_
+from sqlalchemy.sql import func
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import subqueryload
 
 from .model import SourcingVendor
 from .model import VendorElnPartDetail
@@ -32,6 +37,7 @@ from .model import VendorPartDetail
 from .model import VendorPartMap
 from .model import VendorPartNumber
 from .model import VendorPrice
+from .model import PRICE_SCALE
 from tendril.utils import log
 from tendril.config.legacy import VENDORS_DATA
 from tendril.utils.db import get_session
@@ -128,6 +134,37 @@ def get_vpno_obj(vendor=None, ident=None, vpno=None,
     return q.one()
 
 
+#: The maximum number of idents included in a single ``IN`` clause by
+#: the bulk getters.
+BULK_QUERY_CHUNKSIZE = 500
+
+
+@with_db
+def get_vpno_objs(vendor=None, idents=None, session=None):
+    """
+    Bulk counterpart of :func:`get_vpno_obj`. Returns all the
+    :class:`VendorPartNumber` instances mapped to any of the given idents
+    for the vendor, along with their maps, details and prices, using a
+    small, fixed number of queries per chunk of idents instead of one set
+    of queries per part.
+    """
+    vendor = _get_vendor(vendor=vendor, session=session)
+    idents = sorted(set(_get_ident(ident=x, session=session)
+                        for x in idents))
+    rval = []
+    for idx in range(0, len(idents), BULK_QUERY_CHUNKSIZE):
+        chunk = idents[idx:idx + BULK_QUERY_CHUNKSIZE]
+        q = session.query(VendorPartNumber).join(VendorPartMap)
+        q = q.filter(VendorPartMap.vendor_id == vendor.id)
+        q = q.filter(VendorPartMap.ident.in_(chunk))
+        q = q.options(contains_eager(VendorPartNumber.vpmap),
+                      joinedload(VendorPartNumber.detail),
+                      joinedload(VendorPartNumber.detail_eln),
+                      subqueryload(VendorPartNumber.prices))
+        rval.extend(q.all())
+    return rval
+
+
 # Vendor Part Setters
 @with_db
 def populate_vpart_detail(vpno=None, vpart=None, session=None):
@@ -188,7 +225,10 @@ def populate_vpart_prices(vpno=None, vpart=None, session=None):
     assert isinstance(vpno, VendorPartNumber)
     from tendril.sourcing.vendors.vendorbase import VendorPartBase
     assert isinstance(vpart, VendorPartBase)
-    tprices = [(x.moq, str(x.unit_price.source_value), x.oqmultiple)
+    # Prices are compared at the precision they are stored at, so that
+    # unchanged prices are not needlessly replaced.
+    tprices = [(x.moq, round(float(x.unit_price.source_value), PRICE_SCALE),
+                x.oqmultiple)
                for x in vpart.prices]
 
     prices_removal = []
@@ -207,7 +247,7 @@ def populate_vpart_prices(vpno=None, vpart=None, session=None):
         vpno.prices.append(
             VendorPrice(
                 moq=price[0],
-                price=str(price[1]),
+                price=price[1],
                 oqmultiple=price[2],
             )
         )
@@ -216,6 +256,55 @@ def populate_vpart_prices(vpno=None, vpart=None, session=None):
     session.flush()
 
 
+# Vendor Price Getters
+@with_db
+def get_price_break(vendor=None, ident=None, vpno=None, qty=None,
+                    session=None):
+    """
+    Returns the price break applicable when ordering ``qty`` of the vendor
+    part number, as a ``(moq, price, oqmultiple)`` row, or ``None`` if
+    ``qty`` is less than the smallest moq of the part. The price is the
+    unit price in the vendor's currency.
+    """
+    vpno = _get_vpno_obj(vendor=vendor, ident=ident, vpno=vpno,
+                         session=session)
+    q = session.query(VendorPrice.moq, VendorPrice.price,
+                      VendorPrice.oqmultiple)
+    q = q.filter(VendorPrice.vpno_id == vpno.id)
+    q = q.filter(VendorPrice.moq <= qty)
+    q = q.order_by(VendorPrice.moq.desc())
+    return q.first()
+
+
+@with_db
+def get_price_breaks(vendor=None, ident=None, qty=None, session=None):
+    """
+    Returns the price breaks applicable when ordering ``qty`` of each of
+    the vendor part numbers mapped to the ident, as a list of
+    ``(vpno, moq, price, oqmultiple)`` rows ordered by unit price, cheapest
+    first. Part numbers which cannot be ordered in ``qty`` are excluded.
+
+    Note that prices are unit prices in the vendor's currency, and do not
+    include any additional price components applied by the vendor object.
+    """
+    map_obj = get_map(vendor=vendor, ident=ident, session=session)
+
+    sq = session.query(VendorPrice.vpno_id.label('vpno_id'),
+                       func.max(VendorPrice.moq).label('moq'))
+    sq = sq.join(VendorPartNumber)
+    sq = sq.filter(VendorPartNumber.vpmap_id == map_obj.id)
+    sq = sq.filter(VendorPrice.moq <= qty)
+    sq = sq.group_by(VendorPrice.vpno_id).subquery()
+
+    q = session.query(VendorPartNumber.vpno, VendorPrice.moq,
+                      VendorPrice.price, VendorPrice.oqmultiple)
+    q = q.join(VendorPrice, VendorPrice.vpno_id == VendorPartNumber.id)
+    q = q.join(sq, and_(VendorPrice.vpno_id == sq.c.vpno_id,
+                        VendorPrice.moq == sq.c.moq))
+    q = q.order_by(VendorPrice.price, VendorPartNumber.vpno)
+    return q.all()
+
+
 # Vendor Map Getters
 @with_db
 def get_map(vendor=None, ident=None, create=True, session=None):
@@ -238,6 +327,28 @@ def get_map(vendor=None, ident=None, create=True, session=None):
         raise
 
 
+@with_db
+def get_maps(vendor=None, idents=None, session=None):
+    """
+    Bulk counterpart of :func:`get_map`. Returns the existing
+    :class:`VendorPartMap` instances for any of the given idents for the
+    vendor, along with their vendor part numbers. Maps are not created
+    for idents which don't have one.
+    """
+    vendor = _get_vendor(vendor=vendor, session=session)
+    idents = sorted(set(_get_ident(ident=x, session=session)
+                        for x in idents))
+    rval = []
+    for idx in range(0, len(idents), BULK_QUERY_CHUNKSIZE):
+        chunk = idents[idx:idx + BULK_QUERY_CHUNKSIZE]
+        q = session.query(VendorPartMap)
+        q = q.filter(VendorPartMap.vendor_id == vendor.id)
+        q = q.filter(VendorPartMap.ident.in_(chunk))
+        q = q.options(subqueryload(VendorPartMap.vpnos))
+        rval.extend(q.all())
+    return rval
+
+
 @with_db
 def get_strategy(vendor=None, ident=None,  session=None):
     map_obj = get_map(vendor=vendor, ident=ident, session=session)
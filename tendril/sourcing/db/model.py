@@ -25,6 +25,7 @@ from sqlalchemy.orm import synonym
 
 from sqlalchemy import UniqueConstraint
 from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Numeric
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import backref
 
@@ -36,6 +37,13 @@ from tendril.utils import log
 logger = log.get_logger(__name__, log.DEFAULT)
 
 
+#: Total number of digits stored for vendor prices.
+PRICE_PRECISION = 18
+
+#: Number of digits after the decimal point stored for vendor prices.
+PRICE_SCALE = 6
+
+
 class SourcingVendor(BaseMixin, DeclBase):
     name = Column(String, nullable=False, unique=True)
     dname = Column(String, nullable=True, unique=False)
@@ -176,7 +184,8 @@ class VendorElnPartDetail(DeclBase, BaseMixin):
 
 class VendorPrice(DeclBase, BaseMixin, TimestampMixin):
     moq = Column(Integer, unique=False, nullable=False)
-    price = Column(String, unique=False, nullable=False)
+    price = Column(Numeric(PRICE_PRECISION, PRICE_SCALE, asdecimal=False),
+                   unique=False, nullable=False)
     oqmultiple = Column(Integer, unique=False, nullable=False)
 
     # Relationships
@@ -187,3 +196,8 @@ class VendorPrice(DeclBase, BaseMixin, TimestampMixin):
         backref=backref('prices', cascade='all, delete-orphan'),
         lazy='joined',
     )
+
+    # Constraints
+    __table_args__ = (
+        Index('ix_vpno_moq', 'vpno_id', 'moq'),
+    )
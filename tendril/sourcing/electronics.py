@@ -20,7 +20,10 @@ Electronics Sourcing module documentation (:mod:`sourcing.electronics`)
 """
 
 import copy
+import time
 import importlib
+from collections import deque
+from concurrent import futures
 
 from tendril.config.legacy import VENDORS_DATA
 from tendril.utils import log
@@ -61,27 +64,180 @@ def get_eff_acq_price(vsinfo):
     return vsinfo.oqty * vsinfo.effprice.unit_price.native_value
 
 
-def get_sourcing_information(ident, qty, avendors=vendor_list,
-                             allvendors=False, get_all=False):
-    sources = []
-    ident = ident.strip()
+#: The maximum number of vendors queried concurrently by
+#: :func:`get_sourcing_information` when run with ``parallel=True``.
+SOURCING_MAX_WORKERS = 8
+
+#: The default time, in seconds, any single vendor is given to return
+#: sourcing information when run with ``parallel=True``, counted from when
+#: it starts to work on the ident. Vendors which do not respond in time are
+#: skipped (and logged) for that ident.
+SOURCING_VENDOR_TIMEOUT = 120
+
+#: The interval, in seconds, at which vendors which are yet to start on an
+#: ident are checked on when run with ``parallel=True``.
+SOURCING_POLL_INTERVAL = 1
+
+_sourcing_executor = None
+
+
+def _get_sourcing_executor():
+    global _sourcing_executor
+    if _sourcing_executor is None:
+        _sourcing_executor = futures.ThreadPoolExecutor(
+            max_workers=SOURCING_MAX_WORKERS
+        )
+    return _sourcing_executor
+
+
+def _get_vendor_results(ident, qty, vendors, get_all):
+    for vendor in vendors:
+        yield vendor, vendor.get_optimal_pricing(ident, qty, get_all=get_all)
+
+
+class _VendorJob(object):
+    # A vendor sourcing an ident on the sourcing executor. The time the job
+    # starts running is recorded, so that jobs still queued behind others
+    # aren't mistaken for vendors which aren't responding.
+    def __init__(self, vendor, ident, qty, get_all):
+        self.vendor = vendor
+        self.started = None
+        self.future = _get_sourcing_executor().submit(
+            self._run, ident, qty, get_all
+        )
+
+    def _run(self, ident, qty, get_all):
+        self.started = time.time()
+        return self.vendor.get_optimal_pricing(ident, qty, get_all=get_all)
+
+    def cancel(self):
+        return self.future.cancel()
+
 
+def _submit_vendor_jobs(ident, qty, vendors, get_all):
+    return [_VendorJob(vendor, ident, qty, get_all) for vendor in vendors]
+
+
+def _wait_vendor_results(ident, jobs, timeout):
+    # Returns the results of the vendors which responded within timeout
+    # seconds of starting, and the vendors which did not. Results are
+    # returned in the order of the vendor list, irrespective of the order
+    # in which the vendors respond, so that the merge below (including
+    # tie-breaking between equally priced sources) is identical to that of
+    # the serial path.
+    pending = set(job.future for job in jobs if not job.future.done())
+    timed_out = []
+    while pending:
+        if timeout is None:
+            futures.wait(pending)
+            break
+        now = time.time()
+        wait = SOURCING_POLL_INTERVAL
+        for job in jobs:
+            if job.future not in pending or job.started is None or \
+                    job.future.done():
+                continue
+            remaining = job.started + timeout - now
+            if remaining <= 0:
+                # A running job can't be cancelled, and is left to finish
+                # in the background.
+                pending.discard(job.future)
+                timed_out.append(job.vendor)
+                logger.warning("Timed out waiting for {0} to source {1}"
+                               "".format(job.vendor.name, ident))
+            else:
+                wait = min(wait, remaining)
+        if pending:
+            pending = futures.wait(pending, timeout=wait,
+                                   return_when=futures.FIRST_COMPLETED)[1]
+    results = [(job.vendor, job.future.result()) for job in jobs
+               if job.vendor not in timed_out]
+    return results, timed_out
+
+
+def _get_vendor_results_parallel(ident, qty, vendors, get_all, timeout):
+    jobs = _submit_vendor_jobs(ident, qty, vendors, get_all)
+    return _wait_vendor_results(ident, jobs, timeout)[0]
+
+
+def _count_outstanding(window):
+    return sum(not job.future.done() for _, jobs in window for job in jobs)
+
+
+def _iter_vendor_results_parallel(requests, lvendors, get_all, timeout):
+    # Yields the vendor results for each request in turn. Requests are only
+    # submitted ahead of the one being waited for while fewer jobs than
+    # there are workers are outstanding, so that abandoning the results
+    # leaves little work queued. A vendor which times out is skipped for
+    # the rest of the requests, so that it can't tie up all the workers.
+    window = deque()
+    skipped = []
+    lrequests = iter(zip(requests, lvendors))
+    try:
+        while True:
+            while not window or \
+                    _count_outstanding(window) < SOURCING_MAX_WORKERS:
+                try:
+                    (ident, qty), vendors = next(lrequests)
+                except StopIteration:
+                    break
+                vendors = [x for x in vendors if x not in skipped]
+                window.append(
+                    (ident, _submit_vendor_jobs(ident, qty, vendors, get_all))
+                )
+            if not window:
+                return
+            ident, jobs = window.popleft()
+            results, timed_out = _wait_vendor_results(ident, jobs, timeout)
+            for vendor in timed_out:
+                if vendor in skipped:
+                    continue
+                logger.warning("Skipping {0} for the remaining requests"
+                               "".format(vendor.name))
+                skipped.append(vendor)
+                for _, ljobs in window:
+                    ljobs[:] = [x for x in ljobs
+                                if x.vendor is not vendor or not x.cancel()]
+            yield results
+    finally:
+        for _, jobs in window:
+            for job in jobs:
+                job.cancel()
+        running = [job.future for _, jobs in window for job in jobs
+                   if not job.future.cancelled()]
+        if running:
+            # Jobs which have started use the prefetched vendor maps, so
+            # they are given the chance to finish before those go away.
+            futures.wait(running, timeout=timeout)
+
+
+def _get_pclass(ident):
     if ident.startswith('PCB'):
-        pclass = 'electronics_pcb'
+        return 'electronics_pcb'
     else:
-        pclass = 'electronics'
+        return 'electronics'
 
-    for vendor in avendors:
-        if vendor.pclass == pclass:
-            vsinfo = vendor.get_optimal_pricing(ident, qty, get_all=get_all)
-            if not get_all:
-                if vsinfo.vpart is not None:
-                    sources.append(vsinfo)
-            else:
-                sources.extend(vsinfo)
+
+def _get_vendors(ident, avendors):
+    pclass = _get_pclass(ident)
+    return [x for x in avendors if x.pclass == pclass]
+
+
+def _merge_sources(results, get_all):
+    sources = []
+    for vendor, vsinfo in results:
+        if not get_all:
+            if vsinfo.vpart is not None:
+                sources.append(vsinfo)
+        else:
+            sources.extend(vsinfo)
+    return sources
+
+
+def _select_sources(sources, allvendors):
     if len(sources) == 0:
         raise SourcingException
-    if get_all is False and allvendors is False:
+    if allvendors is False:
         selsource = sources[0]
         for vsinfo in sources:
             if get_eff_acq_price(vsinfo) < get_eff_acq_price(selsource):
@@ -91,6 +247,127 @@ def get_sourcing_information(ident, qty, avendors=vendor_list,
         return sorted(sources, key=lambda x: get_eff_acq_price(x))
 
 
+def get_sourcing_information(ident, qty, avendors=vendor_list,
+                             allvendors=False, get_all=False,
+                             parallel=False, timeout=SOURCING_VENDOR_TIMEOUT):
+    """
+    Obtain sourcing information for the given ident at the specified
+    quantity from the vendors in ``avendors`` which handle the ident's
+    product class.
+
+    If ``parallel`` is ``True``, the vendors are queried concurrently
+    from a bounded thread pool (see :data:`SOURCING_MAX_WORKERS`), and
+    the time taken is governed by the slowest vendor rather than the
+    sum of all of them. Vendors which do not return within ``timeout``
+    seconds of starting on the ident are skipped. The results are merged
+    in the same order and with the same tie-breaking as the serial path.
+
+    :raises: :class:`SourcingException` if no source could be found.
+    """
+    ident = ident.strip()
+
+    vendors = _get_vendors(ident, avendors)
+    if parallel and len(vendors) > 1:
+        results = _get_vendor_results_parallel(ident, qty, vendors,
+                                               get_all, timeout)
+    else:
+        results = _get_vendor_results(ident, qty, vendors, get_all)
+
+    return _select_sources(_merge_sources(results, get_all),
+                           allvendors or get_all)
+
+
+def prefetch_vendors(idents, avendors=vendor_list, parallel=False):
+    """
+    Groups the given idents by product class, and has each vendor in
+    ``avendors`` prefetch its maps and parts for the idents of its product
+    class (see :meth:`VendorBase.prefetch`). If ``parallel`` is ``True``,
+    the vendors are prefetched concurrently.
+
+    The prefetched maps should be released using
+    :func:`clear_prefetched_vendors` once done.
+    """
+    pclasses = {}
+    for ident in idents:
+        ident = ident.strip()
+        pclasses.setdefault(_get_pclass(ident), set()).add(ident)
+    jobs = [(vendor, sorted(pclasses[vendor.pclass])) for vendor in avendors
+            if vendor.pclass in pclasses]
+
+    def _prefetch(vendor, vidents):
+        try:
+            count = vendor.prefetch(vidents)
+            logger.debug("Prefetched {0} parts from {1}"
+                         "".format(count, vendor.name))
+        except Exception as e:
+            # Prefetching is only an optimization. Anything which fails
+            # here will be retrieved individually while sourcing.
+            logger.warning("Unable to prefetch from {0} : {1}"
+                           "".format(vendor.name, e))
+
+    if parallel and len(jobs) > 1:
+        executor = _get_sourcing_executor()
+        for job in [executor.submit(_prefetch, *x) for x in jobs]:
+            job.result()
+    else:
+        for vendor, vidents in jobs:
+            _prefetch(vendor, vidents)
+
+
+def clear_prefetched_vendors(avendors=vendor_list):
+    for vendor in avendors:
+        vendor.clear_prefetched()
+
+
+def get_sourcing_information_many(requests, avendors=vendor_list,
+                                  allvendors=False, get_all=False,
+                                  parallel=False, prefetch=True,
+                                  timeout=SOURCING_VENDOR_TIMEOUT):
+    """
+    Obtain sourcing information for each of the ``(ident, qty)`` pairs
+    in ``requests``. Yields, in the same order, what
+    :func:`get_sourcing_information` would return for each of them, or
+    ``None`` if no source could be found.
+
+    If ``prefetch`` is ``True``, the vendor maps and parts for all the
+    idents are first loaded in bulk (see :func:`prefetch_vendors`). If
+    ``parallel`` is ``True``, the vendors are queried concurrently from
+    the bounded thread pool used by :func:`get_sourcing_information`,
+    for the request being waited for and as many following requests as
+    keep the pool busy. A vendor which does not return within ``timeout``
+    seconds of starting on a request is skipped for it, and for all the
+    requests after it. Results are merged in the same order and with the
+    same tie-breaking as the serial path.
+    """
+    requests = [(ident.strip(), qty) for ident, qty in requests]
+    if prefetch:
+        prefetch_vendors([x[0] for x in requests], avendors,
+                         parallel=parallel)
+    try:
+        lvendors = [_get_vendors(ident, avendors) for ident, _ in requests]
+        if parallel:
+            lresults = _iter_vendor_results_parallel(requests, lvendors,
+                                                     get_all, timeout)
+        else:
+            lresults = (_get_vendor_results(ident, qty, vendors, get_all)
+                        for (ident, qty), vendors in zip(requests, lvendors))
+
+        try:
+            for results in lresults:
+                try:
+                    yield _select_sources(_merge_sources(results, get_all),
+                                          allvendors or get_all)
+                except SourcingException:
+                    yield None
+        finally:
+            # Cancels any vendor jobs still outstanding, before the maps
+            # they use are released.
+            lresults.close()
+    finally:
+        if prefetch:
+            clear_prefetched_vendors(avendors)
+
+
 def get_vendor_by_name(name):
     for vendor in vendor_list:
         if vendor._name == name:
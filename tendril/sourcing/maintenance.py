@@ -20,33 +20,45 @@
 
 """
 Docstring for maintenance
+
+Requests published here are consumed by the sourcing refresh worker, see
+:mod:`tendril.sourcing.worker`.
 """
 
 
 import json
-from tendril.connectors.mq import mq_publish
-from tendril.connectors.mq import mq_connection
+from tendril.connectors.mq import get_publisher
 from tendril.connectors.mq import MQServerUnavailable
 
 
+#: The queue vendor part information refresh requests are published to.
+VPINFO_QUEUE = 'maintenance_vendor_vpinfo'
+
+#: The queue vendor map refresh requests are published to.
+VPMAP_QUEUE = 'maintenance_vendor_vpmap'
+
+
+# Refresh requests are published through the shared long lived publisher,
+# and repeated requests for the same vendor part or map are coalesced, so
+# a costing run over a stale database doesn't open a connection or send a
+# message for every stale part it comes across.
+
 def update_vpinfo(vendor, ident, vpno):
     try:
-        with mq_connection() as connection:
-            channel = connection.channel()
-            message = json.dumps({'vendor': vendor,
-                                  'ident': ident,
-                                  'vpno': vpno})
-            mq_publish(channel, 'maintenance_vendor_vpinfo', message)
+        message = json.dumps({'vendor': vendor,
+                              'ident': ident,
+                              'vpno': vpno})
+        get_publisher().publish(VPINFO_QUEUE, message,
+                                coalesce=(vendor, vpno))
     except MQServerUnavailable:
         return
 
 
 def update_vpmap(vendor, ident):
     try:
-        with mq_connection() as connection:
-            channel = connection.channel()
-            message = json.dumps({'vendor': vendor,
-                                  'ident': ident})
-            mq_publish(channel, 'maintenance_vendor_vpmap', message)
+        message = json.dumps({'vendor': vendor,
+                              'ident': ident})
+        get_publisher().publish(VPMAP_QUEUE, message,
+                                coalesce=(vendor, ident))
     except MQServerUnavailable:
         return
@@ -24,14 +24,19 @@ Docstring for map
 
 import csv
 import os
+import sys
+import time
+import hashlib
 
 import six
+from concurrent import futures
 from future.utils import iteritems
 
 from tendril.sourcing.vendors.vendorbase import VendorElnPartBase
 from tendril.sourcing.vendors.vendorbase import VendorPartRetrievalError
 from tendril.entityhub import projects
 from tendril.gedaif import gsymlib
+from tendril.config import INSTANCE_CACHE
 from tendril.config.legacy import VENDOR_MAP_AUDIT_FOLDER
 from tendril.utils import fsutils
 from tendril.utils import log
@@ -43,31 +48,203 @@ from .electronics import vendor_list
 logger = log.get_logger(__name__, log.INFO)
 
 
-def gen_mapfile(vendor, idents, maxage=-1):
-    pb = TendrilProgressBar(max=len(idents))
-    vendor_obj = controller.get_vendor(name=vendor.cname)
+#: The default number of idents searched concurrently by
+#: :func:`gen_mapfile` in parallel mode.
+GENVMAP_MAX_WORKERS = 4
+
+#: The number of idents whose search results are written to the database
+#: (and to the checkpoint) together by :func:`gen_mapfile`.
+GENVMAP_BATCH_SIZE = 25
+
+
+#: The time, in seconds, after which the checkpoint of an interrupted
+#: :func:`gen_mapfile` run is no longer resumed from.
+GENVMAP_CHECKPOINT_MAXAGE = 86400
+
+
+class MapCheckpoint(object):
+    """
+    Records the idents whose maps have been written to the database during
+    a (possibly interrupted) vendor map generation run, so that a
+    subsequent run can resume where the previous one stopped.
+
+    The checkpoint records the run it belongs to, identified by ``run``,
+    and when that run started. A checkpoint left by a different run, or
+    one older than :data:`GENVMAP_CHECKPOINT_MAXAGE`, is discarded rather
+    than resumed from.
+    """
+    def __init__(self, vendor, run):
+        self._path = os.path.join(INSTANCE_CACHE, 'sourcing', 'genvmap',
+                                  vendor.cname + '.checkpoint')
+        self._run = run
+        self._done = set()
+        if os.path.exists(self._path):
+            with open(self._path, 'r') as f:
+                header = f.readline().split()
+                lines = [x.strip() for x in f if x.strip()]
+            if self._is_resumable(header):
+                self._done = set(lines)
+            else:
+                logger.info("Discarding the stale map generation "
+                            "checkpoint for {0}".format(vendor.name))
+                self.clear()
+
+    def _is_resumable(self, header):
+        try:
+            run, started = header[0], float(header[1])
+        except (IndexError, ValueError):
+            return False
+        return run == self._run and \
+            time.time() - started < GENVMAP_CHECKPOINT_MAXAGE
+
+    def __contains__(self, ident):
+        return ident in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def add(self, idents):
+        folder = os.path.dirname(self._path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        new = not os.path.exists(self._path)
+        with open(self._path, 'a') as f:
+            if new:
+                f.write('{0} {1}\n'.format(self._run, time.time()))
+            for ident in idents:
+                f.write(ident + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._done.update(idents)
+
+    def clear(self):
+        self._done = set()
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+
+def _get_run_fingerprint(idents, maxage):
+    # Identifies a map generation run by what it would search for.
+    sha = hashlib.sha1()
+    sha.update('maxage={0}'.format(maxage).encode('utf-8'))
     for ident in idents:
-        pb.next(note=ident)
-        vpnos, strategy = vendor.search_vpnos(ident)
-        if vpnos is not None:
-            # pb.writeln("Found: {0}\n".format(ident))
-            avpnos = vpnos
-        else:
-            if strategy not in ['NODEVICE', 'NOVALUE',
-                                'NOT_IMPL']:
-                pb.writeln("Not Found: {0:40}::{1}\n".format(ident, strategy))
-            avpnos = []
-        with get_session() as session:
-            # pb.writeln("{0:25} {1}\n".format(ident, avpnos))
+        sha.update('\n{0}'.format(ident).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def _write_map_batch(vendor_obj, batch, checkpoint):
+    with get_session() as session:
+        for ident, strategy, avpnos in batch:
             controller.set_strategy(vendor=vendor_obj, ident=ident,
                                     strategy=strategy, session=session)
             controller.set_amap_vpnos(vendor=vendor_obj, ident=ident,
                                       vpnos=avpnos, session=session)
+    checkpoint.add([x[0] for x in batch])
+
+
+def _search_vpnos(vendor, ident):
+    return ident, vendor.search_vpnos(ident)
+
+
+def _search_results(vendor, idents):
+    for ident in idents:
+        yield _search_vpnos(vendor, ident)
+
+
+def _search_results_parallel(vendor, idents, workers):
+    executor = futures.ThreadPoolExecutor(max_workers=workers)
+    jobs = [executor.submit(_search_vpnos, vendor, ident)
+            for ident in idents]
+    try:
+        for job in futures.as_completed(jobs):
+            yield job.result()
+    finally:
+        for job in jobs:
+            job.cancel()
+        executor.shutdown(wait=True)
+
+
+def gen_mapfile(vendor, idents, maxage=-1, workers=1,
+                batch_size=GENVMAP_BATCH_SIZE, resume=True):
+    """
+    Searches the vendor for each of the given idents and writes the
+    results into the vendor's map in the database.
+
+    If ``workers`` is greater than 1, the searches are run concurrently
+    from a pool of that many threads. The requests they make to the vendor
+    remain subject to the vendor's :attr:`VendorBase.rate_limiter`.
+    Vendors with bulk search enabled
+    (see :attr:`VendorBase.bulk_search`) are instead searched using
+    :meth:`VendorBase.search_vpnos_many`, and ``workers`` is ignored.
+
+    Results are written to the database in batches of ``batch_size``
+    idents, and each written batch is recorded in a
+    :class:`MapCheckpoint`. Unless ``resume`` is ``False``, idents
+    recorded by an earlier interrupted run over the same idents and
+    ``maxage`` are skipped, provided it was started within
+    :data:`GENVMAP_CHECKPOINT_MAXAGE`. The checkpoint is removed once the
+    run completes.
+    """
+    checkpoint = MapCheckpoint(vendor, _get_run_fingerprint(idents, maxage))
+    if resume:
+        pending = [x for x in idents if x not in checkpoint]
+        if len(pending) < len(idents):
+            logger.info("Resuming map generation for {0}, skipping {1} "
+                        "idents already done".format(
+                            vendor.name, len(idents) - len(pending)))
+    else:
+        checkpoint.clear()
+        pending = idents
+
+    pb = TendrilProgressBar(max=len(pending))
+    vendor_obj = controller.get_vendor(name=vendor.cname)
+    if vendor.bulk_search:
+        results = vendor.search_vpnos_many(pending)
+    elif workers > 1:
+        results = _search_results_parallel(vendor, pending, workers)
+    else:
+        results = _search_results(vendor, pending)
+
+    batch = []
+    try:
+        for ident, (vpnos, strategy) in results:
+            pb.next(note=ident)
+            if vpnos is not None:
+                # pb.writeln("Found: {0}\n".format(ident))
+                avpnos = vpnos
+            else:
+                if strategy not in ['NODEVICE', 'NOVALUE',
+                                    'NOT_IMPL']:
+                    pb.writeln("Not Found: {0:40}::{1}\n"
+                               "".format(ident, strategy))
+                avpnos = []
+            batch.append((ident, strategy, avpnos))
+            if len(batch) >= batch_size:
+                # The batch is taken before it is written, so that a batch
+                # whose write fails isn't written again below.
+                full, batch = batch, []
+                _write_map_batch(vendor_obj, full, checkpoint)
+    except BaseException:
+        # Whatever has been retrieved is kept, even if the run is
+        # interrupted, so that it need not be retrieved again on resume.
+        # The error which interrupted the run is the one raised, even if
+        # this fails as well.
+        exc_info = sys.exc_info()
+        if batch:
+            try:
+                _write_map_batch(vendor_obj, batch, checkpoint)
+            except Exception as e:
+                logger.error("Could not write {0} idents of the {1} map : "
+                             "{2}".format(len(batch), vendor.name, e))
+        six.reraise(*exc_info)
+    if batch:
+        _write_map_batch(vendor_obj, batch, checkpoint)
     pb.finish()
+    checkpoint.clear()
     vendor.map._dump_mapfile()
 
 
-def gen_vendor_mapfile(vendor_obj, maxage=-1):
+def gen_vendor_mapfile(vendor_obj, maxage=-1, workers=1, resume=True):
     """
 
     :type vendor_obj: sourcing.vendors.VendorBase
@@ -86,7 +263,8 @@ def gen_vendor_mapfile(vendor_obj, maxage=-1):
             if symbol.ident.strip() != "":
                 idents.append(symbol.ident)
 
-        gen_mapfile(vendor_obj, idents, maxage)
+        gen_mapfile(vendor_obj, idents, maxage,
+                    workers=workers, resume=resume)
         logger.info("Done Generating Electronics Vendor Map : " +
                     vendor_obj.name)
 
@@ -97,7 +275,8 @@ def gen_vendor_mapfile(vendor_obj, maxage=-1):
         for pcb, folder in iteritems(pcblib):
             idents.append(pcb)
 
-        gen_mapfile(vendor_obj, idents, maxage)
+        gen_mapfile(vendor_obj, idents, maxage,
+                    workers=workers, resume=resume)
         logger.info("Done Generating PCB Vendor Map File : " + vendor_obj.name)
     else:
         logger.warning('Vendor pclass is not recognized. Not generating map.')
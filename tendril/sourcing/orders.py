@@ -25,6 +25,9 @@ import os
 
 from tendril.gedaif import gsymlib
 from tendril.inventory import guidelines
+from tendril.utils.terminal import TendrilProgressBar
+
+from .consolidation import solve_consolidation
 
 
 from tendril.utils import log
@@ -32,30 +35,42 @@ logger = log.get_logger(__name__, log.DEFAULT)
 
 
 class CompositeOrderElem(object):
-    def __init__(self, order, ident, rqty, shortage):
+    def __init__(self, order, ident, rqty, shortage, fetch=True):
         self._order = order
         self._ident = ident
         self._rqty = rqty
         self._resqty = rqty - shortage
         self._shortage = shortage
+        self._sources = None
+        self._selsource = None
+        if fetch is False:
+            # Sources are to be provided by the caller using set_sources().
+            return
         # TODO
         # Have a module level order instance here instead of leaving it to
         # sourcing.electronics, and get rid of this circular import problem.
         from tendril.sourcing import electronics
         try:
-            self._sources = electronics.get_sourcing_information(  # noqa
+            sources = electronics.get_sourcing_information(  # noqa
                 self.ident, self.gl_compl_qty,
                 avendors=self._order._allowed_vendors,
-                allvendors=True
+                allvendors=True, parallel=True
             )
-            self._selsource = self._sources[0]
-            for vsinfo in self._sources:
-                if self.get_eff_acq_price(vsinfo) < \
-                        self.get_eff_acq_price(self._selsource):
-                    self._selsource = vsinfo
         except electronics.SourcingException:  # noqa
+            sources = None
+        self.set_sources(sources)
+
+    def set_sources(self, sources):
+        if not sources:
             self._sources = None
             self._selsource = None
+            return
+        self._sources = sources
+        self._selsource = self._sources[0]
+        for vsinfo in self._sources:
+            if self.get_eff_acq_price(vsinfo) < \
+                    self.get_eff_acq_price(self._selsource):
+                self._selsource = vsinfo
 
     def get_eff_acq_price(self, source):
         return (self._shortage + (source.oqty - self._shortage)/2) * \
@@ -97,6 +112,12 @@ class CompositeOrderElem(object):
     def selsource(self):
         return self._selsource
 
+    @selsource.setter
+    def selsource(self, value):
+        if value not in self._sources:
+            raise ValueError("Not a source for {0}".format(self.ident))
+        self._selsource = value
+
     # vobj, vpart, oqty, nbprice, ubprice, effprice
     @property
     def sorted_other_sources(self):
@@ -187,6 +208,44 @@ class CompositeOrder(object):
         self._lines.append(CompositeOrderElem(self, ident, rqty, shortage))
         return self._lines[-1].is_sourceable
 
+    def add_many(self, lines, orderref=None, pb_class=None):
+        """
+        Adds all of the given ``(ident, rqty, shortage)`` lines to the
+        order. The result is the same as calling :meth:`add` for each of
+        them, but the vendor maps and parts for all the lines are
+        prefetched in bulk and the vendors are queried for all the lines
+        concurrently.
+
+        :return: A list of whether each of the lines is sourceable.
+        """
+        if self._orderref is not None and self._orderref != orderref:
+            logger.warning("Overwriting order reference to " +
+                           orderref + " from " + self._orderref)
+        self._orderref = orderref
+        from tendril.sourcing import electronics
+
+        if pb_class is None:
+            pb_class = TendrilProgressBar
+
+        nlines = [CompositeOrderElem(self, ident, rqty, shortage, fetch=False)
+                  for ident, rqty, shortage in lines]
+        if not nlines:
+            return []
+        logger.info("Prefetching Sourcing Information for {0} Lines"
+                    "".format(len(nlines)))
+        results = electronics.get_sourcing_information_many(
+            [(x.ident, x.gl_compl_qty) for x in nlines],
+            avendors=self._allowed_vendors, allvendors=True,
+            parallel=True, prefetch=True
+        )
+        pb = pb_class(max=len(nlines))
+        for line, sources in zip(nlines, results):
+            line.set_sources(sources)
+            pb.next(note=line.ident)
+        pb.finish()
+        self._lines.extend(nlines)
+        return [x.is_sourceable for x in nlines]
+
     def _get_headers(self, row):
         rval = []
         if row == 0:
@@ -283,7 +342,68 @@ class CompositeOrder(object):
         for vendor in self._allowed_vendors:
             vendor.finalize_order(path)
 
-    def rebalance(self):
+    def rebalance(self, mode='heuristic'):
+        """
+        Rebalances the order, trading off the base order costs of the
+        vendors against the excess incurred by sourcing lines from other
+        than their cheapest source.
+
+        :param mode: ``heuristic`` to only identify the vendors worth
+                     accepting, leaving the selected sources unchanged.
+                     ``auto``, ``exact`` or ``fast`` to solve for the
+                     optimal sources using the corresponding method of
+                     :func:`tendril.sourcing.consolidation.solve_consolidation`
+                     and reassign the lines accordingly.
+        """
+        if mode == 'heuristic':
+            return self._rebalance_heuristic()
+        return self._rebalance_solver(method=mode)
+
+    def _rebalance_solver(self, method='auto'):
+        logger.info("Attempting to Rebalance Order using the "
+                    "{0} solver".format(method))
+        lines = [x for x in self._lines if x.is_sourceable]
+        vendors = {}
+        options = []
+        costs = []
+        for line in lines:
+            loptions = {}
+            lcosts = {}
+            for vsinfo in line.sources:
+                vname = vsinfo[0].name
+                vendors[vname] = vsinfo[0]
+                cost = line.get_eff_acq_price(vsinfo)
+                if vname not in lcosts or cost < lcosts[vname]:
+                    loptions[vname] = vsinfo
+                    lcosts[vname] = cost
+            options.append(loptions)
+            costs.append(lcosts)
+        fixed_costs = {k: v.order_baseprice.native_value
+                       for k, v in vendors.items()}
+
+        def _total_cost(selected):
+            used = set(x[0].name for x in selected)
+            return sum(fixed_costs[x] for x in used) + \
+                sum(line.get_eff_acq_price(x)
+                    for line, x in zip(lines, selected))
+
+        initial = _total_cost([x.selsource for x in lines])
+        result = solve_consolidation(fixed_costs, costs, method=method)
+        for line, loptions, vname in zip(lines, options, result.assignment):
+            if vname != line.selsource[0].name:
+                logger.debug("Moving {0} from {1} to {2}".format(
+                    line.ident, line.selsource[0].name, vname
+                ))
+                line.selsource = loptions[vname]
+        for vname in sorted(result.facilities):
+            logger.info("Accepting Vendor : " + vname)
+        if not result.optimal:
+            logger.info("Rebalanced order is not proven optimal")
+        logger.info("Finished Rebalance : Estimated Cost {0:.2f}, down from "
+                    "{1:.2f}".format(result.cost, initial))
+        return result
+
+    def _rebalance_heuristic(self):
         logger.info("Attempting to Rebalance Order")
         shadowlines = copy.copy(self._lines)
         accepted_vendors = []
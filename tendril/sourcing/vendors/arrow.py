@@ -68,6 +68,20 @@ error rate for component types commonly used within the instance.
 .. seealso::
     :func:`VendorMouser._get_device_catstrings`
 
+.. rubric:: Bulk Search
+
+Search for the Arrow part numbers for many idents at once :
+
+>>> for ident, (vpnos, strategy) in arrow.dvobj.search_vpnos_many(idents):
+...     print ident, vpnos
+
+The values of the idents are searched for in batches of
+:data:`ARROW_LIST_BATCH_SIZE` using the API's ``search/list`` method, which
+only matches complete manufacturer part numbers. Values it does not find
+are then searched for individually, as :meth:`VendorArrow.search_vpnos`
+does. This is what is used when generating the Arrow vendor map, and for
+idents not yet in the map when sourcing in bulk.
+
 Tweaks and improvements to the search process are welcome as pull requests
 to the tendril github repository, though their inclusion will be predicated
 on them causing minimal breakage to what already exists.
@@ -168,6 +182,7 @@ content is NOT present when the part has been reconstructed from the database.
 
 """
 
+import json
 import traceback
 
 from tendril.conventions.electronics import check_for_std_val
@@ -189,6 +204,11 @@ from tendril.utils import log
 logger = log.get_logger(__name__, log.DEFAULT)
 
 
+#: The maximum number of part numbers sent in each ``search/list`` request
+#: by :meth:`VendorArrow.search_vpnos_many`.
+ARROW_LIST_BATCH_SIZE = 20
+
+
 class ArrowElnPart(VendorElnPartBase):
     def __init__(self, vpno, **kwargs):
         super(ArrowElnPart, self).__init__(vpno, **kwargs)
@@ -264,6 +284,7 @@ class VendorArrow(VendorBase):
     ]
 
     _type = 'Arrow REST API v3'
+    _rate_limit = 1
 
     _url_base = 'http://www.arrow.com/'
     _api_endpoint = 'http://api.arrow.com/itemservice/v3/en'
@@ -286,10 +307,12 @@ class VendorArrow(VendorBase):
         self._api_login = apilogin
         self._sourcecd = sourcecd
         self._session = www.get_session()
+        self._api_params = {'login': self._api_login,
+                            'apikey': self._api_key}
 
     @property
     def _api_common_params(self):
-        return {'login': self._api_login, 'apikey': self._api_key}
+        return dict(self._api_params)
 
     @property
     def sourcecd(self):
@@ -318,12 +341,19 @@ class VendorArrow(VendorBase):
                     rv = mb
         return rv
 
+    def _api_get(self, path, params, error):
+        ep = self._api_endpoint + path
+        self._rate_limiter.acquire()
+        r = self._session.get(ep, params=params).json()['itemserviceresult']
+        if not r['transactionArea'][0]['response']['success']:
+            raise LookupError(error)
+        return r
+
     def _api_search_token(self, token, rows=25, start=None, mfrcd=None):
         """
         Search for (paginated) items using a search token
         `search/token`
         """
-        ep = self._api_endpoint + '/search/token?'
         params = self._api_common_params
         params['search_token'] = token
         params['rows'] = rows
@@ -331,9 +361,8 @@ class VendorArrow(VendorBase):
             params['mfrCd'] = mfrcd
         if start:
             params['start'] = start
-        r = self._session.get(ep, params=params).json()['itemserviceresult']
-        if not r['transactionArea'][0]['response']['success']:
-            raise LookupError("Error searching for token")
+        r = self._api_get('/search/token?', params,
+                          "Error searching for token")
         nresults = r['transactionArea'][0]['responseSequence']['totalItems']
         return nresults, r['data'][0]['PartList']
 
@@ -350,20 +379,29 @@ class VendorArrow(VendorBase):
         """
         Search for multiple items at once
         `search/list`
+
+        Returns a dictionary of the ``PartList`` returned for each of the
+        requested part numbers. Part numbers for which nothing was found
+        are not included.
         """
-        ep = self._api_endpoint + '/search/list?'
-        raise NotImplementedError
+        request = self._api_common_params
+        request['parts'] = [{'partNum': x} for x in parts]
+        r = self._api_get('/search/list?',
+                          {'req': json.dumps({'request': request})},
+                          "Error searching for list")
+        rval = {}
+        for result in r['data'][0]['resultList']:
+            if result.get('PartList'):
+                rval[result['requestedPartNum']] = result['PartList']
+        return rval
 
     def api_lookup_manufacturer(self):
         """
         Map of manufacturers and corresponding codes
         `lookup/manufacturer`
         """
-        ep = self._api_endpoint + '/lookup/manufacturer?'
-        params = self._api_common_params
-        r = self._session.get(ep, params=params).json()['itemserviceresult']
-        if not r['transactionArea'][0]['response']['success']:
-            raise LookupError("Error retrieving manufacturer lookup")
+        r = self._api_get('/lookup/manufacturer?', self._api_common_params,
+                          "Error retrieving manufacturer lookup")
         mfrs = r['data'][0]['manufacturers']
         return {x['mfrCd']: x['mfrName'] for x in mfrs}
 
@@ -376,7 +414,9 @@ class VendorArrow(VendorBase):
     def search_vpnos(self, ident):
         if ident in self._ident_blacklist:
             return None, 'BLACKLIST'
-        parts, strategy = self._search_vpnos(ident)
+        return self._commit_search(ident, *self._search_vpnos(ident))
+
+    def _commit_search(self, ident, parts, strategy):
         if parts is None:
             return None, strategy
         pnos = [x.pno for x in parts]
@@ -402,7 +442,74 @@ class VendorArrow(VendorBase):
 
         return pnos, strategy
 
-    def _search_vpnos(self, ident):
+    def _get_list_search_value(self, ident):
+        # The value to be searched for using search/list, or None if the
+        # ident is not searched for by value.
+        if ident in self._ident_blacklist:
+            return None
+        device, value, footprint = parse_ident(ident)
+        if device not in self._devices or check_for_std_val(ident):
+            return None
+        return value
+
+    def _search_values(self, values):
+        # Searches for all the values using search/list, falling back to a
+        # token search for values which aren't found as part numbers. The
+        # list search only returns parts whose part numbers match the value,
+        # so values it finds get fewer candidates than a token search.
+        results = {}
+        for i in range(0, len(values), ARROW_LIST_BATCH_SIZE):
+            chunk = values[i:i + ARROW_LIST_BATCH_SIZE]
+            try:
+                results.update(self.api_search_list(chunk))
+            except LookupError:
+                logger.warning("Arrow list search failed for : "
+                               "{0}".format(', '.join(chunk)))
+        for value in values:
+            if value in results:
+                continue
+            try:
+                results[value] = self.api_search_token(token=value)
+            except LookupError:
+                results[value] = []
+        return results
+
+    def search_vpnos_many(self, idents):
+        """
+        Searches for the vendor part numbers for each of the given idents,
+        yielding ``(ident, (vpnos, strategy))`` tuples.
+
+        The values of up to :data:`ARROW_LIST_BATCH_SIZE` idents are
+        searched for in a single ``search/list`` request, and each distinct
+        value is searched for only once. Values which are not found by the
+        list search are searched for by token, as :meth:`search_vpnos`
+        does.
+
+        This does not always give the same results as :meth:`search_vpnos`.
+        ``search/list`` only returns the parts whose part numbers match the
+        value, while the token search used by :meth:`search_vpnos` also
+        returns other parts matching it. The idents whose values the list
+        search finds are therefore mapped to the part number matches
+        alone, a narrower set of part numbers than :meth:`search_vpnos`
+        would map them to. This is therefore only used for generating maps
+        and prefetching if ``bulk_search`` is enabled in the vendor's
+        configuration.
+        """
+        for i in range(0, len(idents), ARROW_LIST_BATCH_SIZE):
+            chunk = idents[i:i + ARROW_LIST_BATCH_SIZE]
+            values = dict((x, self._get_list_search_value(x)) for x in chunk)
+            results = self._search_values(
+                sorted(set(x for x in values.values() if x))
+            )
+            for ident in chunk:
+                if values[ident] is None:
+                    yield ident, self.search_vpnos(ident)
+                    continue
+                yield ident, self._commit_search(
+                    ident, *self._search_vpnos(ident, results[values[ident]])
+                )
+
+    def _search_vpnos(self, ident, rparts=None):
         device, value, footprint = parse_ident(ident)
         if device not in self._devices:
             return None, 'NODEVICE'
@@ -413,7 +520,8 @@ class VendorArrow(VendorBase):
                 except NotImplementedError:
                     return None, 'NOT_IMPL'
             if device in self._devices:
-                return self._get_search_vpnos(device, value, footprint)
+                return self._get_search_vpnos(device, value, footprint,
+                                              rparts=rparts)
             else:
                 return None, 'FILTER_NODEVICE'
         except (KeyboardInterrupt, SystemExit):
@@ -444,12 +552,15 @@ class VendorArrow(VendorBase):
     def _filter_results_by_category(self, parts, device):
         raise NotImplementedError
 
-    def _get_search_vpnos(self, device, value, footprint):
-        try:
-            r = self.api_search_token(token=value)
-            nresults = len(r)
-        except LookupError:
-            return None, 'NORESULTS'
+    def _get_search_vpnos(self, device, value, footprint, rparts=None):
+        if rparts is not None:
+            r = rparts
+        else:
+            try:
+                r = self.api_search_token(token=value)
+            except LookupError:
+                return None, 'NORESULTS'
+        nresults = len(r)
         if not nresults:
             return None, 'NORESULTS'
         parts = [self._process_response_part(x) for x in r]
@@ -17,15 +17,44 @@
 """
 CSIL Vendor Module (:mod:`tendril.sourcing.csil`)
 =================================================
+
+PCB pricing is obtained from the CSIL (pcbpower) website, and stored in each
+PCB's ``pcb/sourcing.yaml`` by :func:`generate_pcb_pricing`.
+
+Pricing is obtained by posting the website's pricing form directly using
+:class:`CSILPricingClient`, with the quantities requested concurrently (see
+:func:`get_csil_prices_direct`). If that fails, for instance because the
+website's forms have changed, the slower browser automation based
+:func:`get_csil_prices` is used instead.
+
+The parsed contents of the ``pcb/sourcing.yaml`` files are cached in memory
+(see :func:`get_pcb_sourcing`), and are only re-read when the file changes.
+
+PCBs which do not yet have pricing are priced using a
+:class:`CSILPricingModel` fitted to the pricing of all the PCBs which do
+(see :func:`estimate_pcb_sourcing`). Prices obtained this way are marked as
+:attr:`VendorPrice.estimated`, and are not written to the database. If the
+model cannot price a PCB accurately enough and the vendor is configured
+with ``live_pricing``, the PCB's pricing is generated from the website
+instead.
 """
 
 import time
+import math
+import json
 import locale
 import os
+import threading
+from collections import namedtuple
 from collections import OrderedDict
 from future.utils import viewitems
 
+import numpy
+import requests
 import splinter
+from bs4 import BeautifulSoup
+from concurrent import futures
+from six.moves.urllib.parse import urljoin
 
 import selenium.common.exceptions
 from .vendorbase import VendorBase
@@ -34,9 +63,11 @@ from .vendorbase import VendorPartBase
 from .vendorbase import SourcingInfo
 from .vendorbase import VendorPartRetrievalError
 
+from tendril.fileio import write_json_atomic
 from tendril.utils import fsutils
 from tendril.utils.terminal import TendrilProgressBar
 
+from tendril.config import INSTANCE_CACHE
 from tendril.config.legacy import VENDORS_DATA
 from tendril.config.legacy import FIREFOX_PROFILE_PATH
 
@@ -67,6 +98,38 @@ get_credentials()
 
 locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
 
+#: The delivery term codes of the CSIL pricing form, by delivery time in
+#: working days.
+CSIL_DELIVERY_CODES = {
+    # 3: '3#333',
+    # 5: '5#334',
+    7: '7#529',
+    10: '10#1452',
+    12: '12#7271',
+    15: '15#1453',
+    18: '18#7272',
+    21: '21#7273'
+}
+
+#: The layer count codes of the CSIL pricing form.
+CSIL_LAYERS_CODES = {
+    1: '2180',
+    2: '2181',
+    4: '2183',
+    6: '2184',
+}
+
+#: The delivery times for which prices are requested. The pricing form
+#: also returns the prices for the next two delivery times.
+CSIL_PRICING_DELIVERY_TIMES = [10]
+
+#: The number of times a failed pricing form request is retried.
+CSIL_PRICING_RETRIES = 2
+
+CSIL_LOGIN_URL = 'http://login.pcbpower.com/V2/login.aspx'
+
+_form_prefix = 'ctl00$ContentPlaceHolder1$'
+
 exparams = {
     'pcbname': 'QASC-',
     'layers': 2,
@@ -81,28 +144,12 @@ exparams = {
 def get_csil_prices(params=exparams, rval=None):
     if rval is None:
         rval = {}
-    delivery_codes = {
-        # 3: '3#333',
-        # 5: '5#334',
-        7: '7#529',
-        10: '10#1452',
-        12: '12#7271',
-        15: '15#1453',
-        18: '18#7272',
-        21: '21#7273'
-    }
-
+    delivery_codes = CSIL_DELIVERY_CODES
     delivery_times = sorted(delivery_codes.keys())
-
-    layers_codes = {
-        1: '2180',
-        2: '2181',
-        4: '2183',
-        6: '2184',
-    }
+    layers_codes = CSIL_LAYERS_CODES
 
     browser = splinter.Browser('firefox', profile=FIREFOX_PROFILE_PATH)
-    url = 'http://login.pcbpower.com/V2/login.aspx'
+    url = CSIL_LOGIN_URL
     browser.visit(url)
     values = {
         'txtUserName': dvobj.username,
@@ -262,14 +309,554 @@ def get_csil_prices(params=exparams, rval=None):
     return rval
 
 
+class CSILPricingError(Exception):
+    pass
+
+
+class CSILPricingClient(object):
+    """
+    Obtains PCB pricing from the CSIL website by posting its (ASP.NET)
+    login and pricing forms directly, as the browser would when the
+    controls driven by :func:`get_csil_prices` are used.
+
+    Each form is read once, and its hidden state (``__VIEWSTATE``,
+    ``__EVENTVALIDATION`` and so on) is posted back along with the fields
+    being set and the submit button, so each price is a single request.
+    Requests are made using the vendor's
+    :attr:`VendorBase.fetcher` session and are subject to its
+    :attr:`VendorBase.rate_limiter`, and :meth:`get_prices` may be called
+    from several threads at once.
+    """
+    def __init__(self, vendor, timeout=60):
+        self._vendor = vendor
+        self._session = vendor.fetcher.session
+        self._timeout = timeout
+        self._order_url = None
+        self._order_fields = None
+        self._lock = threading.Lock()
+
+    def _request(self, url, data=None):
+        self._vendor.rate_limiter.acquire()
+        try:
+            if data is None:
+                r = self._session.get(url, timeout=self._timeout)
+            else:
+                r = self._session.post(url, data=data, timeout=self._timeout)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            raise CSILPricingError("Error requesting {0} : {1}"
+                                   "".format(url, e))
+        return r.url, BeautifulSoup(r.content, 'lxml')
+
+    @staticmethod
+    def _get_form_fields(soup):
+        # The fields the browser would submit with the form, less any
+        # submit buttons.
+        fields = OrderedDict()
+        for el in soup.find_all('input'):
+            name = el.get('name')
+            itype = el.get('type', 'text').lower()
+            if not name or itype in ('submit', 'button', 'image', 'reset'):
+                continue
+            if itype in ('checkbox', 'radio') and not el.has_attr('checked'):
+                continue
+            fields[name] = el.get('value', '')
+        for el in soup.find_all('select'):
+            name = el.get('name')
+            option = el.find('option', selected=True) or el.find('option')
+            if not name or option is None:
+                continue
+            fields[name] = option.get('value', option.text)
+        for el in soup.find_all('textarea'):
+            if el.get('name'):
+                fields[el['name']] = el.text
+        return fields
+
+    @staticmethod
+    def _get_button(soup, name):
+        el = soup.find('input', attrs={'name': name})
+        if el is None:
+            raise CSILPricingError("Form button not found : " + name)
+        return {name: el.get('value', '')}
+
+    def login(self):
+        url, soup = self._request(CSIL_LOGIN_URL)
+        fields = self._get_form_fields(soup)
+        fields.update(self._get_button(soup, 'btnlogin'))
+        fields['txtUserName'] = self._vendor.username
+        fields['txtPassword'] = self._vendor.password
+        url, soup = self._request(url, fields)
+        link = soup.find(id='ctl00_aPlaceOrder')
+        if link is None or not link.get('href'):
+            raise CSILPricingError("Unable to log in to CSIL")
+        url, soup = self._request(urljoin(url, link['href']))
+        fields = self._get_form_fields(soup)
+        fields.update(self._get_button(soup, _form_prefix + 'btnCalculate'))
+        self._order_url = url
+        self._order_fields = fields
+
+    def _ensure_login(self):
+        with self._lock:
+            if self._order_fields is None:
+                self.login()
+
+    @staticmethod
+    def _get_label(soup, name):
+        el = soup.find(id='ctl00_ContentPlaceHolder1_' + name)
+        if el is None:
+            return ''
+        return el.get_text().strip()
+
+    def get_prices(self, values):
+        """
+        Posts the pricing form with the given ``values`` (keyed by field
+        name, without the ``ctl00$ContentPlaceHolder1$`` prefix), and
+        returns the unit prices shown for the selected and the next two
+        delivery terms. Prices which are not shown are returned as
+        ``None``.
+        """
+        self._ensure_login()
+        fields = OrderedDict(self._order_fields)
+        for key, value in viewitems(values):
+            fields[_form_prefix + key] = value
+        _, soup = self._request(self._order_url, fields)
+        labels = [self._get_label(soup, x) for x in
+                  ('lblUnitPrc', 'lblnextunitprc1', 'lblnextunitprc2')]
+        if not labels[0]:
+            raise CSILPricingError("No price returned for " + str(values))
+        try:
+            return [locale.atof(x) if x else None for x in labels]
+        except ValueError:
+            raise CSILPricingError("Unrecognized price : " + str(labels))
+
+
+def _get_csil_price(client, values, retries=CSIL_PRICING_RETRIES):
+    attempt = 0
+    while True:
+        try:
+            return client.get_prices(values)
+        except CSILPricingError:
+            if attempt >= retries:
+                raise
+            attempt += 1
+            logger.warning("Error getting CSIL pricing. Retrying.")
+
+
+def get_csil_prices_direct(params=exparams, client=None, max_workers=None):
+    """
+    Returns the same pricing as :func:`get_csil_prices`, a dictionary of
+    the unit prices keyed by delivery time for each quantity, obtained
+    using the :class:`CSILPricingClient`. The prices for all the
+    quantities and delivery times are requested concurrently, up to
+    ``max_workers`` (by default, the vendor's maximum number of
+    connections) at a time.
+
+    :raises: :class:`CSILPricingError` if any of the prices could not be
+             obtained.
+    """
+    if client is None:
+        client = CSILPricingClient(dvobj)
+    if max_workers is None:
+        max_workers = dvobj.fetcher.max_connections
+    delivery_times = sorted(CSIL_DELIVERY_CODES.keys())
+
+    base = {
+        'txtPCBName': params['pcbname'],
+        'ddlLayers': CSIL_LAYERS_CODES[params['layers']],
+        'txtDimX': str(params['dX']),
+        'txtDimY': str(params['dY']),
+        'DDLsurfacefinish': params['finish'],
+    }
+    jobs = []
+    # The first two quantities are skipped, as they are by get_csil_prices.
+    for qty in params['qty'][2:]:
+        for dt_s in CSIL_PRICING_DELIVERY_TIMES:
+            values = dict(base)
+            values['txtQuantity'] = str(qty)
+            values['ddlDelTerms'] = CSIL_DELIVERY_CODES[dt_s]
+            dt_idx = delivery_times.index(dt_s)
+            jobs.append((qty, delivery_times[dt_idx:dt_idx + 3], values))
+
+    rval = {}
+    pb = TendrilProgressBar(max=len(jobs))
+    results = {}
+    executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        results = dict(
+            (executor.submit(_get_csil_price, client, values), (qty, dts))
+            for qty, dts, values in jobs
+        )
+        for job in futures.as_completed(results):
+            qty, dts = results[job]
+            pb.next(note="{0} {1}".format(qty, dts[0]))
+            lined = rval.setdefault(qty, {})
+            for dt, price in zip(dts, job.result()):
+                if price is not None:
+                    lined[dt] = price
+    finally:
+        for job in results:
+            job.cancel()
+        executor.shutdown(wait=True)
+    pb.finish()
+    return rval
+
+
+#: The parsed contents of a PCB's ``pcb/sourcing.yaml``, as returned by
+#: :func:`get_pcb_sourcing`. ``params`` are the PCB parameters the pricing
+#: was obtained for, ``descriptors`` the PCB descriptors derived from them,
+#: and ``prices`` a list of ``(qty, unit price)`` pairs for the default
+#: delivery time. ``mtime`` is the time the pricing was obtained, and
+#: ``estimated`` is ``True`` if the prices are estimates from the
+#: :class:`CSILPricingModel` (see :func:`estimate_pcb_sourcing`).
+PCBSourcing = namedtuple('PCBSourcing',
+                         'params descriptors prices mtime estimated')
+
+_finish_descriptors = {
+    # HAL, Sn, Au, PBFREE, H, NP, I, OC
+    'Au': "Immersion Gold/ENIG finish",
+    'Sn': "Immersion Tin finish",
+    'PBFREE': "Any Lead Free finish",
+    'H': "Lead F ree HAL finish",
+    'NP': "No Copper finish",
+    'I': "OSP finish",
+    'OC': "Only Copper finish",
+}
+
+_sourcing_paths = {}
+_sourcing_cache = {}
+_sourcing_lock = threading.Lock()
+
+
+def _get_sourcing_path(projfolder):
+    try:
+        return _sourcing_paths[projfolder]
+    except KeyError:
+        gpf = projfile.GedaProjectFile(projfolder)
+        path = os.path.join(gpf.configsfile.projectfolder,
+                            'pcb', 'sourcing.yaml')
+        _sourcing_paths[projfolder] = path
+        return path
+
+
+def _get_descriptors(params):
+    descriptors = [str(params['dX']) + 'mm x ' + str(params['dY']) + 'mm']
+    if params["layers"] == 2:
+        descriptors.append("Double Layer")
+    elif params["layers"] == 4:
+        descriptors.append("ML4")
+    descriptors.append(_finish_descriptors.get(
+        params["finish"], "UNKNOWN FINISH: " + params["finish"]
+    ))
+    descriptors.append("10 Working Days")
+    return descriptors
+
+
+def _parse_sourcing(data, pcbname, mtime):
+    prices = []
+    for qty, qprices in viewitems(data['pricing']):
+        if 10 not in qprices.keys():
+            logger.warning(
+                "Default Delivery Time not in prices. Quantity pricing not imported : " +  # noqa
+                str([qty, pcbname])
+            )
+        else:
+            prices.append((qty, qprices[10]))
+    return PCBSourcing(data['params'], _get_descriptors(data['params']),
+                       prices, mtime, False)
+
+
+def get_pcb_sourcing(projfolder, pcbname=None):
+    """
+    Returns the :class:`PCBSourcing` parsed from the ``pcb/sourcing.yaml``
+    of the PCB project at ``projfolder``, or ``None`` if the PCB does not
+    have one.
+
+    Parsed files are cached in memory, keyed by the file's modification
+    time, so the file is only read again once it has been regenerated.
+    """
+    pricingfp = _get_sourcing_path(projfolder)
+    try:
+        mtime = os.path.getmtime(pricingfp)
+    except OSError:
+        return None
+    with _sourcing_lock:
+        cached = _sourcing_cache.get(pricingfp)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(pricingfp, 'r') as f:
+        data = yaml.load(f)
+    sourcing = _parse_sourcing(data, pcbname or projfolder, mtime)
+    with _sourcing_lock:
+        _sourcing_cache[pricingfp] = (mtime, sourcing)
+    return sourcing
+
+
+#: The file the fitted :class:`CSILPricingModel` is persisted to.
+CSIL_PRICING_MODEL_PATH = os.path.join(INSTANCE_CACHE, 'sourcing',
+                                       'csil-pricing-model.json')
+
+#: The largest (one standard deviation) relative error of a price
+#: estimated by the :class:`CSILPricingModel` for it to be used.
+CSIL_PRICING_MODEL_MAX_ERROR = 0.15
+
+#: The ridge regularization used when fitting the
+#: :class:`CSILPricingModel`.
+CSIL_PRICING_MODEL_RIDGE = 1e-3
+
+_year = 365.25 * 24 * 3600
+
+
+class CSILPricingModel(object):
+    """
+    A log-linear model of the unit price of a PCB, fitted to the prices
+    obtained from CSIL for other PCBs. The log of the unit price is
+    modelled as a linear function of :
+
+        - the log of the PCB area and the log of the quantity, their
+          squares and their product,
+        - the age of the pricing, to account for changes in prices over
+          time,
+        - the layer count and the finish, as categories.
+
+    Prices are estimated as of the most recent pricing the model was
+    fitted to. Along with each price, the model estimates its relative
+    error, from the residuals of the fit and the distance of the PCB from
+    those the model was fitted to. Estimates for layer counts or finishes
+    not seen in the fit are not made.
+    """
+    def __init__(self, layers, finishes, coefficients, covariance, sigma,
+                 reference_time, nsamples):
+        self._layers = list(layers)
+        self._finishes = list(finishes)
+        self._coefficients = list(coefficients)
+        self._covariance = [list(x) for x in covariance]
+        self._sigma = sigma
+        self._reference_time = reference_time
+        self._nsamples = nsamples
+
+    @property
+    def nsamples(self):
+        return self._nsamples
+
+    @staticmethod
+    def _numeric_features(params, qty, age):
+        la = math.log(float(params['dX']) * float(params['dY']) / 1e4)
+        lq = math.log(qty)
+        return [la, lq, la * lq, la * la, lq * lq, age / _year]
+
+    def _vector(self, params, qty, age=0):
+        try:
+            lidx = self._layers.index(params['layers'])
+            fidx = self._finishes.index(params['finish'])
+        except ValueError:
+            return None
+        vector = self._numeric_features(params, qty, age)
+        vector.extend(1 if i == lidx else 0
+                      for i in range(len(self._layers)))
+        # The first finish is the reference, and has no column.
+        vector.extend(1 if i == fidx else 0
+                      for i in range(1, len(self._finishes)))
+        return vector
+
+    def estimate(self, params, qty):
+        """
+        Returns the estimated unit price of ``qty`` PCBs with the given
+        parameters, and the estimated relative error of the price, or
+        ``None`` if the model cannot estimate it.
+        """
+        x = self._vector(params, qty)
+        if x is None:
+            return None
+        c = self._covariance
+        n = len(x)
+        leverage = sum(x[i] * c[i][j] * x[j]
+                       for i in range(n) if x[i] for j in range(n) if x[j])
+        error = self._sigma * math.sqrt(1 + max(leverage, 0))
+        unitp = math.exp(sum(a * b for a, b in zip(x, self._coefficients)))
+        return unitp, math.exp(error) - 1
+
+    def estimate_prices(self, params, qtys,
+                        max_error=CSIL_PRICING_MODEL_MAX_ERROR):
+        """
+        Returns a list of ``(qty, unit price)`` pairs with the estimated
+        unit price at each of the quantities in ``qtys``, or ``None`` if
+        any of them cannot be estimated within ``max_error``.
+        """
+        rval = []
+        for qty in qtys:
+            estimate = self.estimate(params, qty)
+            if estimate is None or estimate[1] > max_error:
+                return None
+            rval.append((qty, round(estimate[0], 2)))
+        return rval
+
+    @classmethod
+    def fit(cls, samples, ridge=CSIL_PRICING_MODEL_RIDGE):
+        """
+        Fits the model to ``samples``, a list of ``(params, qty, unit
+        price, time)`` tuples, where ``time`` is the timestamp at which
+        the price was obtained. Returns ``None`` if there are too few
+        samples to fit the model to.
+        """
+        samples = [x for x in samples if x[1] > 0 and x[2] > 0]
+        if not samples:
+            return None
+        layers = sorted(set(x[0]['layers'] for x in samples))
+        finishes = sorted(set(x[0]['finish'] for x in samples))
+        reference_time = max(x[3] for x in samples)
+        model = cls(layers, finishes, [], [], 0, reference_time,
+                    len(samples))
+        xs = numpy.array([model._vector(p, q, t - reference_time)
+                          for p, q, _, t in samples], dtype=float)
+        ys = numpy.log([x[2] for x in samples])
+        nsamples, nfeatures = xs.shape
+        if nsamples <= nfeatures + 1:
+            return None
+        covariance = numpy.linalg.inv(
+            xs.T.dot(xs) + ridge * numpy.eye(nfeatures)
+        )
+        coefficients = covariance.dot(xs.T.dot(ys))
+        residuals = ys - xs.dot(coefficients)
+        sigma = math.sqrt(residuals.dot(residuals) /
+                          (nsamples - nfeatures))
+        return cls(layers, finishes, coefficients.tolist(),
+                   covariance.tolist(), sigma, reference_time, nsamples)
+
+    def to_dict(self):
+        return {'layers': self._layers, 'finishes': self._finishes,
+                'coefficients': self._coefficients,
+                'covariance': self._covariance, 'sigma': self._sigma,
+                'reference_time': self._reference_time,
+                'nsamples': self._nsamples}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+
+_pricing_model = None
+_pricing_model_loaded = False
+_pricing_model_lock = threading.Lock()
+
+
+def _get_model_samples():
+    for pcbname, projfolder in viewitems(projects.pcbs):
+        try:
+            sourcing = get_pcb_sourcing(projfolder, pcbname)
+        except (IOError, OSError, KeyError, ValueError):
+            logger.warning("Unable to read PCB pricing for : " + pcbname)
+            continue
+        if sourcing is None:
+            continue
+        for qty, unitp in sourcing.prices:
+            yield sourcing.params, qty, unitp, sourcing.mtime
+
+
+def fit_pricing_model(path=CSIL_PRICING_MODEL_PATH):
+    """
+    Fits the :class:`CSILPricingModel` to the pricing of all the PCBs
+    which have it, and persists it to ``path``.
+    """
+    global _pricing_model
+    global _pricing_model_loaded
+    model = CSILPricingModel.fit(list(_get_model_samples()))
+    with _pricing_model_lock:
+        _pricing_model = model
+        _pricing_model_loaded = True
+        if model is None:
+            logger.warning("Not enough PCB pricing to fit a pricing model")
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            write_json_atomic(path, model.to_dict())
+    return model
+
+
+def get_pricing_model(path=CSIL_PRICING_MODEL_PATH):
+    """
+    Returns the persisted :class:`CSILPricingModel`, fitting it first if
+    it has not been persisted. Returns ``None`` if the model could not be
+    fitted.
+    """
+    global _pricing_model
+    global _pricing_model_loaded
+    with _pricing_model_lock:
+        if _pricing_model_loaded:
+            return _pricing_model
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                _pricing_model = CSILPricingModel.from_dict(json.load(f))
+            _pricing_model_loaded = True
+            return _pricing_model
+    return fit_pricing_model(path)
+
+
+def _get_pricing_params(gpf, projfolder):
+    # The PCB parameters and the pricing search parameters of the project,
+    # or None if pricing should not be obtained for it.
+    configdata = gpf.configsfile.configdata
+    try:
+        pcbparams = dict(configdata['pcbdetails']['params'])
+    except KeyError:
+        logger.warning(
+            'Geda project does not seem have pcb details. '
+            'Not generating PCB pricing information : ' +
+            projfolder)
+        return None
+
+    if pcbparams.get('panelize', False) is True:
+        logger.warning(
+            'Not obtaining pricing for panelized pcb : ' + projfolder
+        )
+        return None
+
+    try:
+        searchparams = configdata['pcbdetails']['indicativepricing']
+    except KeyError:
+        searchparams = {
+            'qty': 20,
+            'dterm': 7,
+        }
+    return pcbparams, searchparams
+
+
+def estimate_pcb_sourcing(projfolder, pcbname=None):
+    """
+    Returns a :class:`PCBSourcing` for the PCB project at ``projfolder``
+    with prices estimated by the :class:`CSILPricingModel`, at the same
+    quantities :func:`generate_pcb_pricing` would obtain prices for.
+    Returns ``None`` if the prices cannot be estimated accurately enough.
+    """
+    gpf = projfile.GedaProjectFile(projfolder)
+    params = _get_pricing_params(gpf, projfolder)
+    model = get_pricing_model()
+    if params is None or model is None:
+        return None
+    pcbparams, searchparams = params
+    qtys = list(range(searchparams['qty']))[2:]
+    try:
+        prices = model.estimate_prices(pcbparams, qtys)
+    except (KeyError, ValueError):
+        return None
+    if prices is None:
+        logger.info("Unable to estimate PCB pricing accurately : " +
+                    (pcbname or projfolder))
+        return None
+    return PCBSourcing(pcbparams, _get_descriptors(pcbparams), prices,
+                       None, True)
+
+
 class CSILPart(VendorPartBase):
-    def __init__(self, vpartno, ident, vendor, max_age=600000):
+    def __init__(self, vpartno, ident, vendor, max_age=600000,
+                 shell_only=False):
         if vendor is None:
             vendor = dvobj
         if ident is None:
             ident = vendor.map.get_canonical(vpartno)
         self._descriptors = []
-        super(CSILPart, self).__init__(vpartno, ident, vendor, max_age)
+        self._sourcing = None
+        super(CSILPart, self).__init__(vpartno, ident, vendor, max_age,
+                                       shell_only=shell_only)
 
     def _get_data(self):
         if self.vpno.startswith('PCB'):
@@ -279,70 +866,51 @@ class CSILPart(VendorPartBase):
         if self._pcbname not in projects.pcbs.keys():
             raise VendorPartRetrievalError("Unrecognized PCB")
         self._projectfolder = projects.pcbs[self._pcbname]
+        self._sourcing = get_pcb_sourcing(self._projectfolder,
+                                          self._pcbname)
+        if self._sourcing is None:
+            self._sourcing = estimate_pcb_sourcing(self._projectfolder,
+                                                   self._pcbname)
+        if self._sourcing is None and self._vendor.live_pricing:
+            if generate_pcb_pricing(self._projectfolder) is not None:
+                self._sourcing = get_pcb_sourcing(self._projectfolder,
+                                                  self._pcbname)
+        if self._sourcing is None:
+            logger.debug(
+                "PCB does not have sourcing file. Not loading prices : " +
+                self._pcbname
+            )
         self._load_descriptors()
         self._manufacturer = self._vendor.name
         self._load_prices()
         self._vqtyavail = None
 
     def _load_descriptors(self):
-        gpf = projfile.GedaProjectFile(self._projectfolder)
-        pricingfp = os.path.join(gpf.configsfile.projectfolder,
-                                 'pcb', 'sourcing.yaml')
-        if not os.path.exists(pricingfp):
-            logger.debug(
-                "PCB does not have sourcing file. Not loading prices : " +
-                self._pcbname
-            )
+        if self._sourcing is None:
             return None
-        with open(pricingfp, 'r') as f:
-            data = yaml.load(f)
-        self._descriptors.append(str(data['params']['dX']) + 'mm x ' + str(data['params']['dY']) + 'mm')  # noqa
-        if data["params"]["layers"] == 2:
-            self._descriptors.append("Double Layer")
-        elif data["params"]["layers"] == 4:
-            self._descriptors.append("ML4")
-        # HAL, Sn, Au, PBFREE, H, NP, I, OC
-        if data["params"]["finish"] == 'Au':
-            self._descriptors.append("Immersion Gold/ENIG finish")
-        elif data["params"]["finish"] == 'Sn':
-            self._descriptors.append("Immersion Tin finish")
-        elif data["params"]["finish"] == 'PBFREE':
-            self._descriptors.append("Any Lead Free finish")
-        elif data["params"]["finish"] == 'H':
-            self._descriptors.append("Lead F ree HAL finish")
-        elif data["params"]["finish"] == 'NP':
-            self._descriptors.append("No Copper finish")
-        elif data["params"]["finish"] == 'I':
-            self._descriptors.append("OSP finish")
-        elif data["params"]["finish"] == 'OC':
-            self._descriptors.append("Only Copper finish")
-        else:
-            self._descriptors.append("UNKNOWN FINISH: " + data["params"]["finish"])  # noqa
-        self._descriptors.append("10 Working Days")
+        self._descriptors.extend(self._sourcing.descriptors)
 
     def _load_prices(self):
-        gpf = projfile.GedaProjectFile(self._projectfolder)
-        pricingfp = os.path.join(gpf.configsfile.projectfolder,
-                                 'pcb', 'sourcing.yaml')
-        if not os.path.exists(pricingfp):
-            logger.debug(
-                "PCB does not have sourcing file. Not loading prices : " +
-                self._pcbname
-            )
+        if self._sourcing is None:
             return None
-        with open(pricingfp, 'r') as f:
-            data = yaml.load(f)
-        for qty, prices in viewitems(data['pricing']):
-            if 10 not in prices.keys():
-                logger.warning(
-                    "Default Delivery Time not in prices. Quantity pricing not imported : " +  # noqa
-                    str([qty, self._pcbname])
-                )
-            else:
-                price = VendorPrice(
-                    qty, prices[10], self._vendor.currency
-                )
-                self._prices.append(price)
+        for qty, unitp in self._sourcing.prices:
+            price = VendorPrice(
+                qty, unitp, self._vendor.currency,
+                estimated=self._sourcing.estimated
+            )
+            self._prices.append(price)
+
+    @property
+    def estimated(self):
+        return self._sourcing is not None and self._sourcing.estimated
+
+    def commit(self, session=None):
+        # Estimated prices are not written to the database, so that they
+        # are not mistaken for real ones, and are replaced as soon as the
+        # PCB's pricing is obtained.
+        if self.estimated:
+            return
+        super(CSILPart, self).commit(session=session)
 
     @property
     def descriptors(self):
@@ -394,9 +962,11 @@ class VendorCSIL(VendorBase):
 
     def __init__(self, name, dname, pclass, mappath=None,
                  currency_code='INR', currency_symbol=None,
-                 username=None, password=None, **kwargs):
+                 username=None, password=None, live_pricing=False,
+                 **kwargs):
         self._username = username
         self._password = password
+        self._live_pricing = live_pricing
         self._devices = ['PCB']
         super(VendorCSIL, self).__init__(
             name, dname, pclass, mappath,
@@ -414,6 +984,15 @@ class VendorCSIL(VendorBase):
     def password(self):
         return self._password
 
+    @property
+    def live_pricing(self):
+        """
+        Whether pricing is obtained from the website for PCBs which have
+        no pricing and cannot be priced accurately enough by the
+        :class:`CSILPricingModel`.
+        """
+        return self._live_pricing
+
     def search_vpnos(self, ident):
         if ident not in projects.pcblib:
             return [], 'PCB_NOT_KNOWN'
@@ -453,6 +1032,11 @@ class VendorCSIL(VendorBase):
         return SourcingInfo(self, candidate, oqty, nbprice,
                             ubprice, effprice, urationale, olduprice)
 
+    def get_optimal_pricings(self, ident, rqtys, get_all=False,
+                             relax_moq=False):
+        return [self.get_optimal_pricing(ident, x, get_all=get_all)
+                for x in rqtys]
+
     def _generate_purchase_order(self, path):
         stagebase = super(VendorCSIL, self)._generate_purchase_order(path)
         if stagebase is not None:
@@ -491,31 +1075,10 @@ def flush_pcb_pricing(projfolder):
 def generate_pcb_pricing(projfolder, noregen=True, forceregen=False):
     gpf = projfile.GedaProjectFile(projfolder)
 
-    try:
-        pcbparams = gpf.configsfile.configdata['pcbdetails']['params']
-    except KeyError:
-        logger.warning(
-            'Geda project does not seem have pcb details. '
-            'Not generating PCB pricing information : ' +
-            projfolder)
+    params = _get_pricing_params(gpf, projfolder)
+    if params is None:
         return None
-
-    try:
-        if gpf.configsfile.configdata['pcbdetails']['params']['panelize'] is True:
-            logger.warning(
-                'Not obtaining pricing for panelized pcb : ' + projfolder
-            )
-            return None
-    except KeyError:
-        pass
-
-    try:
-        searchparams = gpf.configsfile.configdata['pcbdetails']['indicativepricing']
-    except KeyError:
-        searchparams = {
-            'qty': 20,
-            'dterm': 7,
-        }
+    pcbparams, searchparams = params
 
     pricingfp = os.path.join(gpf.configsfile.projectfolder,
                              'pcb', 'sourcing.yaml')
@@ -532,7 +1095,12 @@ def generate_pcb_pricing(projfolder, noregen=True, forceregen=False):
     logger.info('Generating PCB Pricing for ' + pricingfp)
 
     pcbparams['qty'] = range(searchparams['qty'])
-    sourcingdata = get_csil_prices(pcbparams)
+    try:
+        sourcingdata = get_csil_prices_direct(pcbparams)
+    except CSILPricingError:
+        logger.warning("Unable to obtain pricing directly. Falling back "
+                       "to the browser for " + pricingfp)
+        sourcingdata = get_csil_prices(pcbparams)
     dumpdata = {'params': pcbparams,
                 'pricing': sourcingdata}
 
@@ -126,9 +126,10 @@ though the part object using the interfaces defined in those class definitions.
     :data:`tendril.utils.types.currency.native_currency_defn`.
 
 Additionally, the contents of the Overview and Attributes tables are
-available, though not parsed, in the form of BS4 trees. Note, however, that
-these contents are only available when part details are obtained from the
-soup itself, and not when reconstructed from the Tendril database.
+available, though not parsed, in the form of the text content of each cell.
+Note, however, that these contents are only available when part details are
+obtained from the product page itself (or the record cached from it), and not
+when reconstructed from the Tendril database.
 
 >>> for k in p.attributes_table.keys():
 ...     print(k)
@@ -186,6 +187,9 @@ import urlparse
 from copy import copy
 from urllib2 import HTTPError
 
+from lxml import etree
+from lxml import html as lxml_html
+
 from tendril.conventions.electronics import check_for_std_val
 from tendril.conventions.electronics import parse_capacitor
 from tendril.conventions.electronics import parse_crystal
@@ -210,6 +214,7 @@ from .vendorbase import VendorBase
 from .vendorbase import VendorElnPartBase
 from .vendorbase import VendorPrice
 from .vendorbase import VendorPartRetrievalError
+from .pagecache import pagecache
 
 logger = log.get_logger(__name__, log.DEFAULT)
 locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
@@ -228,7 +233,8 @@ class DigiKeyPartUnusable(VendorPartRetrievalError):
 
 
 class DigiKeyElnPart(VendorElnPartBase):
-    def __init__(self, dkpartno, ident=None, vendor=None, max_age=-1):
+    def __init__(self, dkpartno, ident=None, vendor=None, max_age=-1,
+                 shell_only=False):
         """
         This class acquires and contains information about a single DigiKey
         part number, specified by the `dkpartno` parameter.
@@ -255,7 +261,8 @@ class DigiKeyElnPart(VendorElnPartBase):
             vendor = dvobj
         if not dkpartno:
             logger.error("Not enough information to create a Digikey Part")
-        super(DigiKeyElnPart, self).__init__(dkpartno, ident, vendor, max_age)
+        super(DigiKeyElnPart, self).__init__(dkpartno, ident, vendor, max_age,
+                                             shell_only=shell_only)
 
     @property
     def vparturl(self):
@@ -265,15 +272,36 @@ class DigiKeyElnPart(VendorElnPartBase):
             return 'https://www.digikey.com/products/en?keywords=' \
                     + urllib.quote_plus(self.vpno)
 
+    #: Namespace for the page records of this class in the shared
+    #: :data:`tendril.sourcing.vendors.pagecache.pagecache`. The suffix
+    #: should be changed whenever the format of the record changes.
+    _pagecache_namespace = 'digikey-1'
+
     def _get_data(self):
         """
         This function downloads the part page from Digi-Key, scrapes the page,
         and populates the object with all the necessary information.
 
+        The information scraped from a product page is cached as a record
+        (see :func:`_get_record`). If the product page is unchanged since the
+        record was made, the record is used directly and the page is not
+        parsed at all. Otherwise, product pages are parsed using :mod:`lxml`
+        directly, and the slower :mod:`bs4` parser is only used when search
+        or category pages need to be navigated to reach the product page.
+
         """
         try:
-            soup, url = self.get_productpage_soup(self.vpno,
-                                                  self.vparturl)
+            url = self.vparturl
+            record = self._get_cached_record(url)
+            if record is None:
+                soup, url = self.get_productpage_soup(self.vpno,
+                                                      self.vparturl)
+                if soup is None:
+                    logger.error("Unable to open DigiKey product page : " +
+                                 self.vpno)
+                    raise VendorPartRetrievalError
+                record = self._get_record(soup)
+                self._put_cached_record(url, record)
             self._vparturl = url
         except HTTPError as e:
             if e.code == 404:
@@ -282,32 +310,178 @@ class DigiKeyElnPart(VendorElnPartBase):
                 raise VendorPartRetrievalError
             else:
                 raise
-        if soup is None:
-            logger.error("Unable to open DigiKey product page : " + self.vpno)
-            raise VendorPartRetrievalError
+        self._load_from_record(record)
+
+    def _get_cached_record(self, url):
+        """
+        Returns the record for the product page at ``url``, either from the
+        page record cache or by parsing the page with :func:`_get_record_lxml`.
+        Returns ``None`` if the page is not a product page.
+        """
+        page = self._vendor.fetcher.fetch(url)
+        if page is None:
+            return None
+        record = pagecache.get(self._pagecache_namespace, url, page)
+        if record is None:
+            record = self._get_record_lxml(page)
+            if record is not None:
+                pagecache.put(self._pagecache_namespace, url, page, record)
+        return record
+
+    def _put_cached_record(self, url, record):
+        page = self._vendor.fetcher.fetch(url)
+        if page is not None:
+            pagecache.put(self._pagecache_namespace, url, page, record)
+
+    @staticmethod
+    def _new_record(exclusions):
+        return {'exclusions': exclusions, 'prices': None,
+                'overview': None, 'attributes': None,
+                'package': None, 'datasheet': None}
+
+    def _get_record(self, soup):
+        """
+        Given the BS4 parsed soup of the Digi-Key product page, this function
+        extracts the information needed to populate the part and returns it
+        as a JSON serializable record, a dictionary containing :
 
-        excl = self._vendor.get_productpage_exclusion_criteria(soup)
-        if excl:
-            raise DigiKeyPartUnusable(excl)
+            - ``exclusions``, as per
+              :func:`VendorDigiKey.get_productpage_exclusion_criteria`
+            - ``prices``, a list of ``(moq, price)`` pairs
+            - ``overview`` and ``attributes``, the overview and attributes
+              tables with the text content of each cell
+            - ``package`` and ``datasheet``
 
+        Information which could not be found on the page is left as ``None``.
+
+        """
+        record = self._new_record(
+            self._vendor.get_productpage_exclusion_criteria(soup)
+        )
+        if record['exclusions']:
+            return record
         try:
-            for price in self._get_prices(soup):
-                self.add_price(price)
+            record['prices'] = self._get_prices(soup)
         except DigiKeyPricingTableNotFound:
-            logger.error("No prices parsed for : " + self.vpno)
-
+            pass
         try:
-            self.overview_table = self._get_overview_table(soup)
+            overview = self._get_overview_table(soup)
         except AttributeError:
+            return record
+        attributes = self._get_attributes_table(soup)
+        record['overview'] = self._get_table_text(overview)
+        record['attributes'] = self._get_table_text(attributes)
+        record['package'] = self._get_package(record['attributes'])
+        try:
+            datasheet = attributes['Datasheets'].findAll('a')[0]
+            record['datasheet'] = datasheet.attrs['href'].strip()
+        except (KeyError, IndexError):
+            pass
+        return record
+
+    def _get_record_lxml(self, page):
+        """
+        Given the content of a Digi-Key page, this function returns the same
+        record as :func:`_get_record` does, parsing the page with :mod:`lxml`
+        directly instead of constructing a BS4 tree.
+
+        If the page is not a product page, or if the page is not in the
+        expected format, ``None`` is returned and the caller should fall
+        back to :func:`_get_record`.
+
+        """
+        try:
+            if isinstance(page, str):
+                page = page.decode('utf-8')
+            tree = lxml_html.fromstring(page)
+        except (etree.ParserError, ValueError):
+            return None
+        overview = tree.find('.//table[@id="product-details"]')
+        if overview is None:
+            return None
+        attributes = tree.xpath(
+            '//table[contains(concat(" ", normalize-space(@class), " "), '
+            '" attributes-table-main ")]'
+        )
+        if not attributes:
+            return None
+        attributes = attributes[0]
+
+        record = self._new_record(
+            self._get_exclusion_criteria_lxml(tree)
+        )
+        if record['exclusions']:
+            return record
+        try:
+            record['prices'] = self._get_prices_lxml(tree)
+        except DigiKeyPricingTableNotFound:
+            pass
+        record['overview'] = self._get_table_lxml(overview)
+        record['attributes'] = self._get_table_lxml(attributes)
+        record['package'] = self._get_package(record['attributes'])
+        for row in attributes.iterfind('.//tr'):
+            head = row.find('.//th')
+            if head is None or head.text_content().strip() != 'Datasheets':
+                continue
+            link = row.find('.//td//a')
+            if link is not None:
+                record['datasheet'] = link.get('href', '').strip()
+            break
+        return record
+
+    @staticmethod
+    def _get_exclusion_criteria_lxml(tree):
+        """
+        The :mod:`lxml` equivalent of
+        :func:`VendorDigiKey.get_productpage_exclusion_criteria`.
+        """
+        rv = []
+        beablock = tree.xpath(
+            '//div[contains(concat(" ", normalize-space(@class), " "), '
+            '" product-details-feedback ")]'
+        )
+        if not beablock:
+            return rv
+        beablock = beablock[0]
+        criteria = [
+            ('obsoleteStockMsg', 'Obsolete item.', 'OBSOLETE_NOTAVAIL'),
+            ('dkcDiscontinuedMsg', 'Digi-Key has discontinued this item.',
+             'DISCONTINUED_NOTAVAIL'),
+            ('valueAddNotAvailableMsg',
+             'Value add packaging not available; alternate packaging exists.',
+             'VAPACKAGING_NOTAVAIL'),
+        ]
+        for elem_id, text, exclusion in criteria:
+            elem = beablock.find('.//li[@id="{0}"]'.format(elem_id))
+            if elem is not None and elem.text_content() == text:
+                rv.append(exclusion)
+        return rv
+
+    def _load_from_record(self, record):
+        """
+        Populates the object from a record, as returned by
+        :func:`_get_record` or :func:`_get_record_lxml`.
+        """
+        if record['exclusions']:
+            raise DigiKeyPartUnusable(record['exclusions'])
+
+        if record['prices'] is None:
+            logger.error("No prices parsed for : " + self.vpno)
+        else:
+            for moq, price in record['prices']:
+                self.add_price(VendorPrice(moq, price, self._vendor.currency))
+
+        if record['overview'] is None:
             logger.error("Error acquiring DigiKey information for {0}"
                          "".format(self.vpno))
             return
-        self.attributes_table = self._get_attributes_table(soup)
+        self.overview_table = record['overview']
+        self.attributes_table = record['attributes']
 
         self.manufacturer = self._get_manufacturer()
         self.mpartno = self._get_mpartno()
-        self.datasheet = self._get_datasheet()
-        self.package = self._get_package()
+        self.datasheet = record['datasheet']
+        self.package = record['package']
         self.vqtyavail = self._get_vqtyavail()
         self.vpartdesc = self._get_vpartdesc()
 
@@ -316,7 +490,7 @@ class DigiKeyElnPart(VendorElnPartBase):
                    idxlist.findAll('a', attrs={'class': 'catfilterlink'})]
         new_urls = [urlparse.urljoin(self._vendor.url_base, u)
                     for u in caturls]
-        return [(self._vendor.get_soup(u), u) for u in new_urls]
+        return list(zip(self._vendor.get_soups(new_urls), new_urls))
 
     def get_productpage_soup(self, vpno, url):
         soup = self._vendor.get_soup(url)
@@ -361,48 +535,65 @@ class DigiKeyElnPart(VendorElnPartBase):
         """
         Given the BS4 parsed soup of the Digi-Key product page, this function
         extracts the prices and breaks and returns them as a list of
-        :class:`.vendors.VendorPrice` instances.
-
-        Price listings containing only 'Call' are ignored. Any other
-        non-numeric content for the price or break quantity listing results
-        in an error message from the logger and the corresponding price /
-        break quantity is returned as 0.
+        ``(moq, price)`` tuples, using :func:`_parse_price_rows`.
 
         """
         pricingtable = soup.find('table', id='product-dollars')
-        prices = []
         if not pricingtable:
             raise DigiKeyPricingTableNotFound(self.vpno)
         try:
-            for row in pricingtable.findAll('tr'):
-                cells = row.findAll('td')
-                if len(cells) == 3:
-                    cells = [cell.text.strip() for cell in cells]
-                    if cells[0] == 'Call' and cells[1] == 'Call':
-                        continue
-                    try:
-                        moq = int(cells[0].replace(',', ''))
-                    except ValueError:
-                        moq = 0
-                        logger.error(
-                            cells[0] + " found while acquiring moq for " +
-                            self.vpno
-                        )
-                    try:
-                        price = locale.atof(cells[1])
-                    except ValueError:
-                        price = 0
-                        logger.error(
-                            cells[1] + " found while acquiring price for " +
-                            self.vpno
-                        )
-                    prices.append(
-                        VendorPrice(moq, price, self._vendor.currency)
-                    )
+            rows = [[cell.text.strip() for cell in row.findAll('td')]
+                    for row in pricingtable.findAll('tr')]
         except AttributeError:
             raise DigiKeyParseError(
                 "Unhandled error parsing pricing table for  " + self.vpno
             )
+        return self._parse_price_rows(rows)
+
+    def _get_prices_lxml(self, tree):
+        """
+        The :mod:`lxml` equivalent of :func:`_get_prices`, given the
+        :mod:`lxml.html` parsed tree of the Digi-Key product page.
+        """
+        pricingtable = tree.find('.//table[@id="product-dollars"]')
+        if pricingtable is None:
+            raise DigiKeyPricingTableNotFound(self.vpno)
+        rows = [[cell.text_content().strip() for cell in row.iterfind('.//td')]
+                for row in pricingtable.iterfind('.//tr')]
+        return self._parse_price_rows(rows)
+
+    def _parse_price_rows(self, rows):
+        """
+        Given the text content of the cells of each row of the pricing table,
+        returns the prices and breaks as a list of ``(moq, price)`` tuples.
+
+        Price listings containing only 'Call' are ignored. Any other
+        non-numeric content for the price or break quantity listing results
+        in an error message from the logger and the corresponding price /
+        break quantity is returned as 0.
+
+        """
+        prices = []
+        for cells in rows:
+            if len(cells) != 3:
+                continue
+            if cells[0] == 'Call' and cells[1] == 'Call':
+                continue
+            try:
+                moq = int(cells[0].replace(',', ''))
+            except ValueError:
+                moq = 0
+                logger.error(
+                    cells[0] + " found while acquiring moq for " + self.vpno
+                )
+            try:
+                price = locale.atof(cells[1])
+            except ValueError:
+                price = 0
+                logger.error(
+                    cells[1] + " found while acquiring price for " + self.vpno
+                )
+            prices.append((moq, price))
         return prices
 
     @staticmethod
@@ -441,6 +632,31 @@ class DigiKeyElnPart(VendorElnPartBase):
                 continue
         return parsed_rows
 
+    @staticmethod
+    def _get_table_text(parsed_rows):
+        """
+        Given a table as returned by :func:`_get_table`, returns the same
+        table with each ``[DATA]`` replaced by its stripped text content.
+        """
+        return {k: v.text.strip() for k, v in parsed_rows.items()}
+
+    @staticmethod
+    def _get_table_lxml(table):
+        """
+        The :mod:`lxml` equivalent of :func:`_get_table` followed by
+        :func:`_get_table_text`, given the :mod:`lxml.html` element for
+        the table.
+        """
+        parsed_rows = {}
+        for row in table.iterfind('.//tr'):
+            head = row.find('.//th')
+            data = row.find('.//td')
+            if head is None or data is None:
+                continue
+            head = head.text_content().strip().encode('ascii', 'replace')
+            parsed_rows[head] = data.text_content().strip()
+        return parsed_rows
+
     def _get_overview_table(self, soup):
         """
         Given the BS4 parsed soup of the Digi-Key product page, this function
@@ -463,38 +679,27 @@ class DigiKeyElnPart(VendorElnPartBase):
         """
         Extracts the Manufacturer Part Number from the overview table.
         """
-        cell = self.overview_table['Manufacturer Part Number']
-        return cell.text.strip().encode('ascii', 'replace')
+        text = self.overview_table['Manufacturer Part Number']
+        return text.encode('ascii', 'replace')
 
     def _get_manufacturer(self):
         """
         Extracts the Manufacturer from the overview table.
         """
-        cell = self.overview_table['Manufacturer']
-        return cell.text.strip().encode('ascii', 'replace')
+        text = self.overview_table['Manufacturer']
+        return text.encode('ascii', 'replace')
 
-    def _get_package(self):
+    @staticmethod
+    def _get_package(attributes_table):
         """
         Extracts the Package from the attributes table. If ``Package / Case``
         is not found in the table, returns None.
         """
         try:
-            cell = self.attributes_table['Package / Case']
-        except KeyError:
-            return None
-        return cell.text.strip().encode('ascii', 'replace')
-
-    def _get_datasheet(self):
-        """
-        Extracts the first datasheet link from the attributes table.
-        If ``Datasheets`` is not found in the table, returns None.
-        """
-        try:
-            cell = self.attributes_table['Datasheets']
+            text = attributes_table['Package / Case']
         except KeyError:
             return None
-        datasheet_link = cell.findAll('a')[0].attrs['href']
-        return datasheet_link.strip()
+        return text.encode('ascii', 'replace')
 
     _regex_vqtyavail = re.compile(r'^(?P<qty>\d+(,*\d+)*)\s*Can ship immediately')
     _regex_vqty_vai = re.compile(r'^Value Added Item')
@@ -506,8 +711,8 @@ class DigiKeyElnPart(VendorElnPartBase):
         returns -2. If any other non integral value is found in the
         cell, returns -1.
         """
-        cell = self.overview_table['Quantity Available']
-        text = cell.text.strip().encode('ascii', 'replace')
+        text = self.overview_table['Quantity Available']
+        text = text.encode('ascii', 'replace')
         try:
             m = self._regex_vqtyavail.search(text)
             qtytext = m.groupdict()['qty'].replace(',', '')
@@ -523,8 +728,8 @@ class DigiKeyElnPart(VendorElnPartBase):
         """
         Extracts the Description from the overview table.
         """
-        cell = self.overview_table['Description']
-        return cell.text.strip().encode('ascii', 'replace')
+        text = self.overview_table['Description']
+        return text.encode('ascii', 'replace')
 
 
 class DigiKeyInvoice(customs.CustomsInvoice):
@@ -579,7 +784,7 @@ class DigiKeyInvoice(customs.CustomsInvoice):
                     lineobj = customs.CustomsInvoiceLine(
                         self, ident, vpno, unitp, qty, idx=idx, desc=desc
                     )
-                    self._lines.append(lineobj)
+                    self.add_line(lineobj)
 
 
 class VendorDigiKey(VendorBase):
@@ -616,6 +821,7 @@ class VendorDigiKey(VendorBase):
     ]
 
     _type = 'DIGIKEY'
+    _rate_limit = 2
 
     def __init__(self, name, dname, pclass, mappath=None,
                  currency_code='USD', currency_symbol='US$', **kwargs):
@@ -635,18 +841,18 @@ class VendorDigiKey(VendorBase):
     def get_soup(self, url):
         """
         Retrieve the soup for a particular url. This function is factored out
-        to allow switching between the :mod:`urllib2` and :mod:`requests`
-        based implementations in :mod:`tendril.utils.www`.
+        to allow switching between the available fetch implementations.
 
-        Currently, the requests based implementation is about two times slower
-        for vendor map generation. The cache provided by :mod:`cachecontrol`
-        in that implementation is not very well suited to this application.
-        Additional changes to the underlying implementation or configuration
-        thereof (perhaps in the heuristic) may change this in the future.
+        Pages are obtained using the vendor's :attr:`fetcher`, which shares
+        the :mod:`tendril.utils.www` page cache but uses pooled keep-alive
+        connections and the vendor's rate limit. The :mod:`requests` and
+        :mod:`cachecontrol` based implementation in :mod:`tendril.utils.www`
+        was about two times slower for vendor map generation, mostly due to
+        its cache not being very well suited to this application.
 
         """
         # return www.get_soup_requests(url, session=self._session)
-        return www.get_soup(url)
+        return self.fetcher.get_soup(url)
 
     def search_vpnos(self, ident):
         device, value, footprint = parse_ident(ident)
@@ -890,10 +1096,10 @@ class VendorDigiKey(VendorBase):
         if len(new_url_parts) == 0:
             return SearchResult(False, None, 'SUBCATEGORY_NOT_FOUND')
 
+        new_urls = [urlparse.urljoin(self._url_base, url_part)
+                    for url_part in new_url_parts]
         results = []
-        for url_part in new_url_parts:
-            new_url = urlparse.urljoin(self._url_base, url_part)
-            soup = self.get_soup(new_url)
+        for soup in self.get_soups(new_urls):
             if soup is not None:
                 try:
                     results.extend(self._get_resultpage_table(soup))
@@ -932,10 +1138,10 @@ class VendorDigiKey(VendorBase):
         if len(new_url_parts) == 0:
             return SearchResult(False, None, 'CATEGORY_NOT_FOUND')
 
+        new_urls = [urlparse.urljoin(self._url_base, url_part)
+                    for url_part in new_url_parts]
         results = []
-        for url_part in new_url_parts:
-            new_url = urlparse.urljoin(self._url_base, url_part)
-            soup = self.get_soup(new_url)
+        for soup in self.get_soups(new_urls):
             if soup is not None:
                 try:
                     results.extend(self._get_resultpage_table(soup))
@@ -40,7 +40,6 @@ from .vendorbase import SearchResult
 from .vendorbase import SearchPart
 from .vendorbase import VendorPartInaccessibleError
 
-from tendril.utils.www import get_soup
 from tendril.conventions.electronics import check_for_std_val
 from tendril.conventions.electronics import parse_ident
 from tendril.conventions.electronics import parse_resistor
@@ -263,7 +262,7 @@ class VendorEvelta(VendorBase):
         params.update({'search': searchterm})
         return self._get_search_results(params, ident)
 
-    def _process_resultpage_row(self, row, ident):
+    def _get_resultpage_row_uri(self, row, ident):
         d, v, f = parse_ident(ident)
         sanitycheck = self._get_device_searchparams(d)[1]
         name_cell = row.find(attrs={'class': 'name'})
@@ -272,11 +271,12 @@ class VendorEvelta(VendorBase):
         if not sanitycheck(name, d, v, f):
             return None
         o = urlparse(link.attrs['href'])
-        uri = o.scheme + "://" + o.netloc + o.path
+        return o.scheme + "://" + o.netloc + o.path
+
+    def _process_resultpage_row(self, response, ident):
         try:
             part = self._partclass(vpno=None, ident=ident, vendor=self,
                                    shell_only=True)
-            response = get_soup(uri)
             part.load_from_response(response)
         except:
             raise
@@ -294,8 +294,10 @@ class VendorEvelta(VendorBase):
         if not table:
             return SearchResult(False, None, 'NORESULTS')
         rows = table.find_all(attrs={'class': 'information_wrapper'})
-        parts = [self._process_resultpage_row(x, ident) for x in rows]
-        parts = [x for x in parts if x]
+        uris = [self._get_resultpage_row_uri(x, ident) for x in rows]
+        uris = [x for x in uris if x]
+        parts = [self._process_resultpage_row(x, ident)
+                 for x in self.get_soups(uris)]
         if len(parts):
             result = True
         else:
@@ -307,7 +309,7 @@ class VendorEvelta(VendorBase):
         params.update(sparams)
         params = urlencode(params)
         url = '?'.join([self._searchurl_base, params])
-        soup = get_soup(url)
+        soup = self.get_soup(url)
         parts = []
         strategy = ''
         for soup in self._get_search_soups(soup):
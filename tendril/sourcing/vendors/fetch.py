@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Vendor Fetch Engine (:mod:`tendril.sourcing.vendors.fetch`)
+===========================================================
+
+A pooled, rate-limited page fetcher for the scraping vendor modules.
+
+The :class:`FetchEngine` is a drop-in replacement for the
+:mod:`tendril.utils.www` ``urllib2`` based :func:`get_soup`. It shares the
+same on-disk page cache (:data:`tendril.utils.www.WWW_CACHE`), but fetches
+fresh pages using a :mod:`requests` session with a keep-alive connection
+pool per host, in place of a new connection and a fixed one second sleep
+per page. Each engine has :
+
+    - a bound on the number of concurrent requests,
+    - a token bucket rate limit (usually the vendor's
+      :attr:`VendorBase.rate_limiter`),
+    - retries with exponential backoff on connection errors and on
+      transient HTTP errors,
+    - :meth:`FetchEngine.get_soups`, which fetches a list of (sibling)
+      pages in parallel.
+
+HTTP errors are raised as :class:`six.moves.urllib.error.HTTPError`, and
+connection errors as :class:`six.moves.urllib.error.URLError`, just as
+they would be by :func:`tendril.utils.www.get_soup`.
+
+"""
+
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+from concurrent import futures
+from six.moves.urllib.error import HTTPError
+from six.moves.urllib.error import URLError
+
+from tendril.utils import www
+from tendril.config import MAX_AGE_DEFAULT
+
+from .ratelimit import TokenBucket
+
+from tendril.utils import log
+logger = log.get_logger(__name__, log.DEFAULT)
+
+
+#: The default maximum number of concurrent requests made by an engine.
+#: This is also the size of each per-host connection pool.
+FETCH_MAX_CONNECTIONS = 4
+
+#: The default number of times a failed request is retried.
+FETCH_RETRIES = 3
+
+#: The default delay, in seconds, before the first retry. The delay is
+#: doubled for every subsequent retry.
+FETCH_BACKOFF = 1.0
+
+#: The default timeout, in seconds, for each request.
+FETCH_TIMEOUT = 60
+
+#: HTTP status codes which are considered transient and retried.
+FETCH_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class FetchEngine(www.WWWCachedFetcher):
+    def __init__(self, rate_limiter=None,
+                 max_connections=FETCH_MAX_CONNECTIONS,
+                 retries=FETCH_RETRIES, backoff=FETCH_BACKOFF,
+                 timeout=FETCH_TIMEOUT, cache_dir=www.WWW_CACHE):
+        super(FetchEngine, self).__init__(cache_dir=cache_dir)
+        if rate_limiter is None:
+            rate_limiter = TokenBucket()
+        self._rate_limiter = rate_limiter
+        self._max_connections = max_connections
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._session = self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self._max_connections,
+                              max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'User-agent': 'Mozilla/5.0'})
+        if www._proxy_dict is not None:
+            session.proxies.update(www._proxy_dict)
+        return session
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def max_connections(self):
+        return self._max_connections
+
+    def _get(self, url):
+        self._rate_limiter.acquire()
+        with self._semaphore:
+            try:
+                response = self._session.get(url, timeout=self._timeout)
+            except requests.RequestException as e:
+                return None, URLError(e)
+        if response.status_code >= 400:
+            return None, HTTPError(url, response.status_code,
+                                   response.reason, response.headers, None)
+        return response.content, None
+
+    def _get_fresh_content(self, url):
+        attempt = 0
+        while True:
+            content, error = self._get(url)
+            if error is None:
+                return content
+            if isinstance(error, HTTPError) and \
+                    error.code not in FETCH_RETRY_STATUS:
+                logger.error("HTTP Error : {0} {1}".format(error.code, url))
+                raise error
+            if attempt >= self._retries:
+                logger.error("Giving up on {0} after {1} attempts : {2}"
+                             "".format(url, attempt + 1, error))
+                raise error
+            delay = self._backoff * (2 ** attempt)
+            attempt += 1
+            logger.debug("Retrying {0} in {1}s : {2}"
+                         "".format(url, delay, error))
+            time.sleep(delay)
+
+    def get_soup(self, url, max_age=MAX_AGE_DEFAULT):
+        """
+        Returns a :mod:`bs4` soup (using the :mod:`lxml` parser) of the page
+        at ``url``, from the cache if a fresh copy exists there.
+        """
+        page = self.fetch(url, max_age=max_age)
+        if page is None:
+            return None
+        return BeautifulSoup(page, 'lxml')
+
+    def get_soups(self, urls, max_age=MAX_AGE_DEFAULT):
+        """
+        Returns a list of soups for the pages at each of the given ``urls``,
+        in the same order. Pages are fetched in parallel, up to the engine's
+        concurrency limit. If any of the pages could not be fetched, the
+        first such error is raised.
+        """
+        urls = list(urls)
+        if len(urls) < 2:
+            return [self.get_soup(x, max_age=max_age) for x in urls]
+        workers = min(self._max_connections, len(urls))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                lambda x: self.get_soup(x, max_age=max_age), urls
+            ))
+
+    def close(self):
+        self._session.close()
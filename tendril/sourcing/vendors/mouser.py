@@ -166,10 +166,24 @@ content is NOT present when the part has been reconstructed from the database.
    MultiSimBlue = 0
  }
 
+.. rubric:: Bulk Retrieve
+
+API responses for many part numbers can be obtained together, packing up
+to :data:`MOUSER_BATCH_SIZE` part numbers into each request :
+
+>>> r = mouser.dvobj.lookup_vpnos(['950-W5300', '595-TPS7A4901DGNR'])
+>>> r['950-W5300'].ManufacturerPartNumber
+W5300
+
+This is used by :meth:`VendorMouser.prefetch_vparts` to retrieve, in bulk,
+the parts which aren't available in the database.
+
 """
 
 import traceback
+import threading
 import re
+from concurrent import futures
 from suds.sax.element import Element
 
 from tendril.conventions.electronics import check_for_std_val
@@ -188,22 +202,40 @@ from .vendorbase import SearchResult
 logger = log.get_logger(__name__, log.DEFAULT)
 
 
+#: The maximum number of part numbers looked up in a single
+#: ``SearchByPartNumber`` request. The API accepts up to 10 part numbers,
+#: separated by :data:`MOUSER_PARTNO_SEPARATOR`.
+MOUSER_BATCH_SIZE = 10
+
+#: The separator used to pack multiple part numbers into a single
+#: ``SearchByPartNumber`` request.
+MOUSER_PARTNO_SEPARATOR = '|'
+
+_api_clients = {}
+_api_clients_lock = threading.Lock()
+
+
+def _get_api_client(endpoint):
+    # The WSDL is fetched and parsed once per process for each endpoint.
+    # suds clients are not thread-safe, so callers should use clones of
+    # the client returned here.
+    with _api_clients_lock:
+        if endpoint not in _api_clients:
+            c = www.get_soap_client(endpoint, cache_requests=True)
+            c.set_options(prefixes=False)
+            c.set_options(service='SearchAPI', port='SearchAPISoap12')
+            _api_clients[endpoint] = c
+        return _api_clients[endpoint]
+
+
 class MouserElnPart(VendorElnPartBase):
     def __init__(self, vpno, **kwargs):
         super(MouserElnPart, self).__init__(vpno, **kwargs)
 
     def _get_data(self):
-        c = self._vendor.api_client
-        r = c.service.SearchByPartNumber(mouserPartNumber=self.vpno)
-        if not r.NumberOfResult:
-            raise ValueError(
-                'Unable to retrieve part information for part number.'
-            )
-
-        part_data = None
-        for part in r.Parts[0]:
-            if part.MouserPartNumber == self.vpno:
-                part_data = part
+        part_data = self._vendor.get_prefetched_part_data(self.vpno)
+        if part_data is None:
+            part_data = self._vendor.lookup_vpnos([self.vpno]).get(self.vpno)
 
         if not part_data:
             raise ValueError(
@@ -257,6 +289,10 @@ class VendorMouser(VendorBase):
     ]
 
     _type = 'Mouser SOAP API'
+    # One request every 5 seconds, as the SOAP client was spaced to
+    # before rate limiting moved to the vendor.
+    _rate_limit = 0.2
+    _max_connections = 2
 
     _url_base = 'http://www.mouser.com/'
     _api_endpoint = 'http://www.mouser.in/service/searchapi.asmx?WSDL'
@@ -266,7 +302,7 @@ class VendorMouser(VendorBase):
             raise Exception('Mouser needs an API KEY to be '
                             'specified in the tendril config')
         self._api_key = apikey
-        self._client = self._build_api_client()
+        self._local = threading.local()
         super(VendorMouser, self).__init__(**kwargs)
         self.add_order_additional_cost_component("Customs", 12.85)
 
@@ -280,18 +316,77 @@ class VendorMouser(VendorBase):
         return header
 
     def _build_api_client(self):
-        c = www.get_soap_client(self._api_endpoint,
-                                cache_requests=True,
-                                minimum_spacing=5)
-        header = self._build_mouser_header()
-        c.set_options(soapheaders=header)
-        c.set_options(prefixes=False)
-        c.set_options(service='SearchAPI', port='SearchAPISoap12')
+        c = _get_api_client(self._api_endpoint).clone()
+        c.set_options(soapheaders=self._build_mouser_header())
         return c
 
     @property
     def api_client(self):
-        return self._client
+        """
+        The SOAP client for the calling thread. Clients are cloned from a
+        single client per process, so the WSDL is only processed once.
+        Requests are throttled by the vendor's :attr:`rate_limiter` rather
+        than by the client, so they should be made through
+        :meth:`_lookup_vpnos` and :meth:`_search_keyword`.
+        """
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._build_api_client()
+            self._local.client = client
+        return client
+
+    def _lookup_vpnos(self, vpnos):
+        self.rate_limiter.acquire()
+        r = self.api_client.service.SearchByPartNumber(
+            mouserPartNumber=MOUSER_PARTNO_SEPARATOR.join(vpnos)
+        )
+        if not r.NumberOfResult:
+            return {}
+        rval = {}
+        for part in r.Parts[0]:
+            if part.MouserPartNumber in vpnos:
+                rval[part.MouserPartNumber] = part
+        return rval
+
+    def _search_keyword(self, keyword):
+        self.rate_limiter.acquire()
+        return self.api_client.service.SearchByKeyword(
+            keyword=keyword, records=50, startingRecord=0, searchOptions=4
+        )
+
+    def lookup_vpnos(self, vpnos):
+        """
+        Retrieves the API response for each of the given Mouser part
+        numbers, returning a dictionary of the responses keyed by part
+        number. Part numbers which are not found are not included.
+
+        Part numbers are looked up :data:`MOUSER_BATCH_SIZE` at a time,
+        with up to the vendor's ``max_connections`` requests in flight at
+        once.
+        """
+        vpnos = sorted(set(vpnos))
+        batches = [vpnos[i:i + MOUSER_BATCH_SIZE]
+                   for i in range(0, len(vpnos), MOUSER_BATCH_SIZE)]
+        rval = {}
+        if len(batches) > 1 and self._max_connections > 1:
+            workers = min(self._max_connections, len(batches))
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for result in executor.map(self._lookup_vpnos, batches):
+                    rval.update(result)
+        else:
+            for batch in batches:
+                rval.update(self._lookup_vpnos(batch))
+        return rval
+
+    def _fetch_parts_data(self, vpnos):
+        try:
+            return self.lookup_vpnos(vpnos)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except Exception:
+            logger.error(traceback.format_exc())
+            logger.error('Unable to look up Mouser parts in bulk')
+            return {}
 
     def search_vpnos(self, ident):
         parts, strategy = self._search_vpnos(ident)
@@ -546,9 +641,7 @@ class VendorMouser(VendorBase):
 
     def _get_search_vpnos(self, device, value, footprint):
         # TODO Allow non-stocked parts and filter them later?
-        r = self.api_client.service.SearchByKeyword(
-            keyword=value, records=50, startingRecord=0, searchOptions=4
-        )
+        r = self._search_keyword(value)
 
         nresults = r.NumberOfResult
         if not nresults:
@@ -590,9 +683,7 @@ def __analyze_categories(devices):
             print("Value Not Extracted for {0}".format(ident))
             continue
         # print "Searching for {0}".format(v)
-        r = dvobj.api_client.service.SearchByKeyword(
-            keyword=v, records=50, startingRecord=0, searchOptions=4
-        )
+        r = dvobj._search_keyword(v)
         if not r.NumberOfResult:
             print(" No results for {0}".format(v))
             continue
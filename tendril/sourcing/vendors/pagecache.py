@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Vendor Page Record Cache (:mod:`tendril.sourcing.vendors.pagecache`)
+====================================================================
+
+A cache for the structured records extracted from scraped vendor pages.
+
+Records are keyed by the URL of the page and validated against a hash of
+the page content, so a record is only returned if the page it was
+extracted from has not changed since. Vendor modules can therefore skip
+parsing the HTML altogether for unchanged pages, even when the part data
+itself has gone stale.
+
+Records are held in a small in-process LRU tier and as JSON files in
+:data:`PAGECACHE_FOLDER`, shared between processes on the same machine.
+Records must be JSON serializable.
+
+"""
+
+import os
+import six
+import json
+import hashlib
+import threading
+
+from cachetools import LRUCache
+
+from tendril.config import INSTANCE_CACHE
+
+from tendril.fileio import write_json_atomic
+
+from tendril.utils import log
+logger = log.get_logger(__name__, log.DEFAULT)
+
+
+#: The maximum number of records held by the in-process tier.
+PAGECACHE_MAXSIZE = 5000
+
+#: The folder used for the on-disk tier. Set to ``None`` to disable it.
+PAGECACHE_FOLDER = os.path.join(INSTANCE_CACHE, 'sourcing', 'pages')
+
+
+def _hash(content):
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    return hashlib.sha1(content).hexdigest()
+
+
+class PageRecordCache(object):
+    def __init__(self, maxsize=PAGECACHE_MAXSIZE, folder=PAGECACHE_FOLDER):
+        self._cache = LRUCache(maxsize)
+        self._folder = folder
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, namespace, url):
+        h = _hash(u':'.join([namespace, url]))
+        return os.path.join(self._folder, namespace, h[:2], h + '.json')
+
+    def _read(self, namespace, url):
+        with self._lock:
+            entry = self._cache.get((namespace, url))
+        if entry is not None or self._folder is None:
+            return entry
+        try:
+            with open(self._path(namespace, url), 'r') as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        with self._lock:
+            self._cache[(namespace, url)] = entry
+        return entry
+
+    def get(self, namespace, url, content):
+        """
+        Returns the record stored for the page at ``url`` if it was
+        extracted from a page with the same ``content``, or ``None``.
+        """
+        entry = self._read(namespace, url)
+        if entry is None or entry['content_hash'] != _hash(content):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['record']
+
+    def put(self, namespace, url, content, record):
+        entry = {'content_hash': _hash(content), 'record': record}
+        with self._lock:
+            self._cache[(namespace, url)] = entry
+        if self._folder is None:
+            return
+        try:
+            write_json_atomic(self._path(namespace, url), entry)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.debug("Unable to write page record for {0} : {1}"
+                         "".format(url, e))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @property
+    def stats(self):
+        return {'size': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses}
+
+
+#: The page record cache instance shared by all the vendors.
+pagecache = PageRecordCache()
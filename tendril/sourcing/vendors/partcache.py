@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Vendor Part Cache (:mod:`tendril.sourcing.vendors.partcache`)
+=============================================================
+
+A two-tier cache for vendor part objects, shared by all the vendors.
+
+The in-process tier holds fully constructed part objects, keyed by vendor,
+vendor part number and ident. Entries expire once the data of their parts
+is older than :data:`tendril.config.legacy.VENDOR_DEFAULT_MAXAGE`, and the
+tier is bounded to :data:`PARTCACHE_MAXSIZE` entries across all vendors.
+Lookups may ask for a shorter maximum age, in which case entries with older
+data are treated as missing.
+
+The optional shared tier holds snapshots of the part data (the same
+information that is stored in the sourcing database) as small JSON files
+in a folder, and is therefore shared between processes (gunicorn workers,
+CLI runs) on the same machine. Snapshots are written atomically, and are
+consulted by the part classes before going to the database.
+
+Entries in both tiers are invalidated whenever a part is committed to the
+database (see :meth:`VendorPartBase._commit_to_db`).
+
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from cachetools import TTLCache
+from cachetools import LRUCache
+
+from tendril.fileio import write_json_atomic
+
+from tendril.config import INSTANCE_CACHE
+from tendril.config.legacy import VENDOR_DEFAULT_MAXAGE
+
+from tendril.utils import log
+logger = log.get_logger(__name__, log.DEFAULT)
+
+
+#: The maximum number of part objects held by the in-process tier,
+#: across all vendors.
+PARTCACHE_MAXSIZE = 20000
+
+#: The folder used for the shared tier. Set to ``None`` to disable the
+#: shared tier. It is read whenever the shared tier is used, and is
+#: created when the first snapshot is written.
+PARTCACHE_FOLDER = os.path.join(INSTANCE_CACHE, 'sourcing', 'parts')
+
+
+class PartCache(object):
+    def __init__(self, maxsize=PARTCACHE_MAXSIZE, ttl=VENDOR_DEFAULT_MAXAGE,
+                 folder=None):
+        if ttl is not None and ttl > 0:
+            self._cache = TTLCache(maxsize, ttl)
+        else:
+            self._cache = LRUCache(maxsize)
+        self._ttl = ttl
+        self._folder = folder
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(vendor, vpno, ident):
+        return vendor, vpno, ident
+
+    # In-process Tier
+    @staticmethod
+    def _get_data_time(part):
+        # Parts retrieved from the vendor rather than loaded from the
+        # database have no timestamp, and their data is current.
+        last_updated = part.last_updated
+        if last_updated is None:
+            return time.time()
+        return last_updated.timestamp
+
+    def _is_fresh(self, data_time, max_age):
+        # Ages are of the part's data, not of the entry. max_age follows
+        # VendorPartBase : 0 forces a reload, and negative ages never
+        # expire. Without one, the tier's ttl applies.
+        if max_age is None:
+            max_age = self._ttl
+            if max_age is None or max_age <= 0:
+                return True
+        if max_age == 0:
+            return False
+        return not time.time() - data_time > max_age >= 0
+
+    def get(self, vendor, vpno, ident, max_age=None):
+        """
+        Returns the cached part object, or ``None`` if there isn't one
+        cached with data no older than ``max_age`` seconds.
+        """
+        key = self._key(vendor, vpno, ident)
+        with self._lock:
+            try:
+                part, data_time = self._cache[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if not self._is_fresh(data_time, max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return part
+
+    def put(self, vendor, vpno, ident, part):
+        with self._lock:
+            self._cache[self._key(vendor, vpno, ident)] = \
+                (part, self._get_data_time(part))
+
+    def contains(self, vendor, vpno, ident, max_age=None):
+        """
+        Returns whether a part object is cached with data no older than
+        ``max_age`` seconds, without counting a hit or miss.
+        """
+        with self._lock:
+            try:
+                part, data_time = self._cache[self._key(vendor, vpno, ident)]
+            except KeyError:
+                return False
+            return self._is_fresh(data_time, max_age)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    # Shared Tier
+    @property
+    def folder(self):
+        """
+        The folder used for the shared tier, or ``None`` if it is disabled.
+        Unless one was given, this is :data:`PARTCACHE_FOLDER` as it is
+        when used.
+        """
+        if self._folder is not None:
+            return self._folder
+        return PARTCACHE_FOLDER
+
+    @property
+    def shared(self):
+        return self.folder is not None
+
+    def _snapshot_path(self, vendor, vpno, ident):
+        h = hashlib.sha1(u':'.join([vendor, ident or u'', vpno])
+                         .encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, h[:2], h + '.json')
+
+    def get_snapshot(self, vendor, vpno, ident):
+        if not self.shared:
+            return None
+        path = self._snapshot_path(vendor, vpno, ident)
+        try:
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.shared_misses += 1
+            return None
+        if self._ttl is not None and self._ttl > 0 and \
+                time.time() - snapshot.get('cached_at', 0) > self._ttl:
+            self._remove_snapshot(path)
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        return snapshot
+
+    def put_snapshot(self, vendor, vpno, ident, snapshot):
+        if not self.shared:
+            return
+        path = self._snapshot_path(vendor, vpno, ident)
+        snapshot = dict(snapshot, cached_at=time.time())
+        try:
+            write_json_atomic(path, snapshot)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.debug("Unable to write part cache snapshot for {0} {1} : "
+                         "{2}".format(vendor, vpno, e))
+
+    @staticmethod
+    def _remove_snapshot(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # Invalidation
+    def invalidate(self, vendor, vpno, ident):
+        with self._lock:
+            self._cache.pop(self._key(vendor, vpno, ident), None)
+            self.invalidations += 1
+        if self.shared:
+            self._remove_snapshot(self._snapshot_path(vendor, vpno, ident))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @property
+    def stats(self):
+        return {'size': len(self),
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'shared_misses': self.shared_misses,
+                'invalidations': self.invalidations}
+
+
+#: The part cache instance shared by all the vendors.
+partcache = PartCache()
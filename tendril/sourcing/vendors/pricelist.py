@@ -17,12 +17,19 @@
 """
 Pricelist Vendor Module (:mod:`tendril.sourcing.pricelist`)
 ===========================================================
+
+Pricelists are compiled when loaded, by expanding the pricelist's
+``pricegens`` and ``pricecsv`` into its ``prices``, and indexing the
+prices by ident and by vendor part number. Compiled pricelists are
+pickled into :data:`PRICELIST_CACHE_FOLDER`, and are used in place of
+the pricelist's source files for as long as none of them are modified.
 """
 
 import codecs
 import csv
 import os
 import re
+import pickle
 
 import iec60063
 from future.utils import viewitems
@@ -33,12 +40,14 @@ from tendril.conventions.electronics import construct_capacitor
 from tendril.conventions.electronics import construct_resistor
 from tendril.conventions.electronics import ident_transform
 from tendril.utils import log
+from tendril.config import INSTANCE_CACHE
 from tendril.config.legacy import INSTANCE_ROOT
 from tendril.config.legacy import PRICELISTVENDORS_FOLDER
 from tendril.config.legacy import VENDOR_DEFAULT_MAXAGE
 from tendril.utils.files import yml as yaml
 from tendril.utils.fsutils import get_file_mtime
 from tendril.utils.types import currency
+from tendril.fileio import write_file_atomic
 from .vendorbase import SourcingInfo
 from .vendorbase import VendorBase
 from .vendorbase import VendorPartBase
@@ -47,10 +56,29 @@ from .vendorbase import VendorPrice
 logger = log.get_logger(__name__, log.DEFAULT)
 
 
+#: The folder compiled pricelists are cached in. Set to ``None`` to disable
+#: the cache.
+PRICELIST_CACHE_FOLDER = os.path.join(INSTANCE_CACHE, 'sourcing',
+                                      'pricelists')
+
+#: The version of the compiled pricelist format. Cached compiled pricelists
+#: of other versions are ignored.
+PRICELIST_COMPILED_VERSION = 1
+
+
+def _get_source_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
 class PricelistPart(VendorPartBase):
-    def __init__(self, vpartno, ident, vendor, max_age=600000):
+    def __init__(self, vpartno, ident, vendor, max_age=600000,
+                 shell_only=False):
         super(PricelistPart, self).__init__(
-            vpartno, ident, vendor, max_age
+            vpartno, ident, vendor, max_age, shell_only=shell_only
         )
 
     @property
@@ -116,9 +144,11 @@ class VendorPricelist(VendorBase):
         if pricelistpath is None:
             pricelistpath = os.path.join(PRICELISTVENDORS_FOLDER,
                                          name + '-pricelist.yaml')
-        with open(pricelistpath, 'r') as f:
-            self._pricelist = yaml.load(f)
-        self._last_updated = get_file_mtime(pricelistpath)
+        compiled = self._load_compiled(name, pricelistpath)
+        self._pricelist = compiled['pricelist']
+        self._ident_index = compiled['ident_index']
+        self._vpno_index = compiled['vpno_index']
+        self._last_updated = get_file_mtime(compiled['last_updated'])
         if currency_code is None:
             currency_code = self._pricelist["currency"]["code"].strip()
         if currency_symbol is None:
@@ -143,20 +173,88 @@ class VendorPricelist(VendorBase):
             )
         except KeyError:
             pass
-        if "prices" not in self._pricelist:
+        if not compiled['has_prices']:
             logger.error("No prices found for " + self.name)
-        if "pricegens" in self._pricelist:
-            self._generate_insert_idents()
-        if "pricecsv" in self._pricelist:
-            self._load_pricecsv(self._pricelist["pricecsv"])
 
     @property
     def last_updated(self):
         return self._last_updated
 
+    @staticmethod
+    def _get_compiled_path(name):
+        if PRICELIST_CACHE_FOLDER is None:
+            return None
+        return os.path.join(PRICELIST_CACHE_FOLDER, name + '.pickle')
+
+    def _load_compiled(self, name, pricelistpath):
+        """
+        Returns the compiled pricelist (see :meth:`_compile`), from the
+        cache if none of its source files have been modified since it was
+        cached, and compiling and caching it otherwise.
+        """
+        cpath = self._get_compiled_path(name)
+        if cpath is not None and os.path.exists(cpath):
+            try:
+                with open(cpath, 'rb') as f:
+                    compiled = pickle.load(f)
+                if compiled['version'] == PRICELIST_COMPILED_VERSION and \
+                        compiled['pricelistpath'] == pricelistpath and \
+                        all(_get_source_stamp(k) == v for k, v in
+                            viewitems(compiled['sources'])):
+                    return compiled
+            except Exception:
+                logger.warning("Unable to read compiled pricelist : " +
+                               cpath)
+        compiled = self._compile(pricelistpath)
+        if cpath is not None:
+            try:
+                write_file_atomic(
+                    cpath, lambda f: pickle.dump(compiled, f,
+                                                 pickle.HIGHEST_PROTOCOL),
+                    mode='wb'
+                )
+            except (pickle.PicklingError, TypeError, IOError, OSError):
+                logger.warning("Unable to cache compiled pricelist : " +
+                               cpath)
+        return compiled
+
+    def _compile(self, pricelistpath):
+        """
+        Loads the pricelist at ``pricelistpath``, expands its ``pricegens``
+        and ``pricecsv`` into its ``prices``, and builds the indexes of the
+        prices by ident and by vendor part number. The returned dictionary
+        contains these along with the modification stamps of the source
+        files.
+        """
+        with open(pricelistpath, 'r') as f:
+            self._pricelist = yaml.load(f)
+        sources = [pricelistpath]
+        has_prices = "prices" in self._pricelist
+        self._pricelist.setdefault("prices", [])
+        if "pricegens" in self._pricelist:
+            self._generate_insert_idents()
+        if "pricecsv" in self._pricelist:
+            sources.append(self._load_pricecsv(self._pricelist["pricecsv"]))
+
+        ident_index = {}
+        vpno_index = {}
+        for part in self._pricelist["prices"]:
+            vpno = part['vpno'].strip()
+            ident_index.setdefault(part['ident'], []).append(vpno)
+            # The first part with a vpno is the one used, as it was when
+            # the prices were searched through in order.
+            vpno_index.setdefault(vpno, part)
+        return {'version': PRICELIST_COMPILED_VERSION,
+                'pricelistpath': pricelistpath,
+                'sources': dict((x, _get_source_stamp(x)) for x in sources),
+                'last_updated': sources[-1],
+                'has_prices': has_prices,
+                'pricelist': self._pricelist,
+                'ident_index': ident_index,
+                'vpno_index': vpno_index}
+
     def _load_pricecsv(self, fname):
         pricecsvpath = os.path.join(PRICELISTVENDORS_FOLDER, fname)
-        self._last_updated = get_file_mtime(pricecsvpath)
         with open(pricecsvpath, 'r') as f:
             reader = csv.reader(f)
             for line in reader:
@@ -176,6 +274,7 @@ class VendorPricelist(VendorBase):
                 except ValueError:
                     partdict['avail'] = None
                 self._pricelist["prices"].append(partdict)
+        return pricecsvpath
 
     def _generate_insert_idents(self):
         for pricegen in self._pricelist['pricegens']:
@@ -247,10 +346,7 @@ class VendorPricelist(VendorBase):
             return values
 
     def search_vpnos(self, ident):
-        vplist = []
-        for part in self._pricelist['prices']:
-            if part['ident'] == ident:
-                vplist.append(part['vpno'].strip())
+        vplist = list(self._ident_index.get(ident, []))
         if len(vplist) > 0:
             return vplist, 'MANUAL'
         else:
@@ -270,11 +366,11 @@ class VendorPricelist(VendorBase):
         return PricelistPart(vp_dict['vpno'], ident, self, max_age=max_age)
 
     def _pl_get_vpart_dict(self, vpartno):
-        for part in self._pricelist["prices"]:
-            if part['vpno'].strip() == vpartno:
-                return part
-        raise ValueError("No vpdict found for {0} in vendor {1}."
-                         "".format(vpartno, self._name))
+        vp_dict = self._vpno_index.get(vpartno)
+        if vp_dict is None:
+            raise ValueError("No vpdict found for {0} in vendor {1}."
+                             "".format(vpartno, self._name))
+        return vp_dict
 
     def get_optimal_pricing(self, ident, rqty, get_all=False):
         candidate_names = self.get_vpnos(ident)
@@ -313,6 +409,11 @@ class VendorPricelist(VendorBase):
         return SourcingInfo(self, selcandidate, oqty, None,
                             price, effprice, "Vendor MOQ/GL", None)
 
+    def get_optimal_pricings(self, ident, rqtys, get_all=False,
+                             relax_moq=False):
+        return [self.get_optimal_pricing(ident, x, get_all=get_all)
+                for x in rqtys]
+
 
 class AnalogDevicesInvoice(customs.CustomsInvoice):
     def __init__(self, vendor=None, inv_yaml=None, working_folder=None):
@@ -368,4 +469,4 @@ class AnalogDevicesInvoice(customs.CustomsInvoice):
                     lineobj = customs.CustomsInvoiceLine(
                         self, ident, vpno, unitp, qty, idx=idx, desc=desc
                     )
-                    self._lines.append(lineobj)
+                    self.add_line(lineobj)
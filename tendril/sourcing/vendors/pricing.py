@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Vendor Candidate Pricing (:mod:`tendril.sourcing.vendors.pricing`)
+==================================================================
+
+Vectorized pricing of the candidate parts a vendor has for an ident, used
+by :meth:`VendorBase.get_optimal_pricings`.
+
+The price breaks of all the candidates are converted to the native
+currency once, including the additional price components each part
+applies to arrive at its effective price, and packed into arrays. Total
+costs, candidate selection and price break 'bumps' for any number of
+requested quantities are then computed together using :mod:`numpy`,
+instead of by walking the price breaks of each candidate through
+:class:`tendril.utils.types.currency.CurrencyValue` arithmetic for every
+quantity.
+
+The selection rules are the same as those historically used by
+:meth:`VendorBase.get_optimal_pricing` :
+
+    - A candidate is only considered for a quantity if its smallest moq
+      is not larger than the quantity (unless ``relax_moq`` is set), and
+      if the vendor's available quantity is unknown, unconfirmable (-2)
+      or larger than the quantity.
+    - The candidate with the smallest total effective cost for the
+      quantity is selected. Ties go to the later candidate.
+    - The order quantity is bumped up to the next price break if doing so
+      increases the total cost by less than :data:`BUMP_TC_INCREASE`
+      (40%), or failing that, if the unit price at the next break is less
+      than :data:`BUMP_UP_FACTOR` (20%) of the present unit price.
+
+Parts whose price for a quantity is not determined by their list of price
+breaks (those which override :meth:`VendorPartBase.get_price`) should not
+be priced using this engine.
+
+"""
+
+import numpy
+
+from tendril.utils import log
+logger = log.get_logger(__name__, log.DEFAULT)
+
+
+#: The order quantity is bumped to the next price break if the total cost
+#: at the next price break is less than this multiple of the present total
+#: cost.
+BUMP_TC_INCREASE = 1.4
+
+#: The order quantity is bumped to the next price break if the unit price
+#: at the next price break is less than this multiple of the present unit
+#: price.
+BUMP_UP_FACTOR = 0.2
+
+#: Rationale recorded when the order quantity is bumped due to
+#: :data:`BUMP_TC_INCREASE`.
+RATIONALE_TC = "TC Increase < 40%"
+
+#: Rationale recorded when the order quantity is bumped due to
+#: :data:`BUMP_UP_FACTOR`.
+RATIONALE_UP = "UP Decrease > 80%"
+
+
+class CandidatePricing(object):
+    """
+    Packs the price breaks of the given ``candidates`` (vendor part
+    objects) into arrays. Candidates whose effective prices cannot be
+    determined are retained, but are never selected.
+    """
+    def __init__(self, candidates):
+        self._candidates = list(candidates)
+        self._prices = []
+        self._effprices = []
+        for candidate in self._candidates:
+            prices = candidate.prices
+            try:
+                effprices = [candidate.get_effective_price(x) for x in prices]
+            except Exception:
+                logger.error("Unable to price part {0}"
+                             "".format(candidate.vpno))
+                prices, effprices = [], None
+            self._prices.append(prices)
+            self._effprices.append(effprices)
+
+        n = len(self._candidates)
+        b = max([len(x) for x in self._prices] + [1])
+        self._nbreaks = numpy.array([len(x) for x in self._prices], dtype=int)
+        self._priceable = numpy.array(
+            [x is not None for x in self._effprices], dtype=bool
+        )
+        self._moqs = numpy.full((n, b), numpy.inf)
+        self._uprices = numpy.full((n, b), numpy.nan)
+        self._euprices = numpy.full((n, b), numpy.nan)
+        for i, (prices, effprices) in \
+                enumerate(zip(self._prices, self._effprices)):
+            for j, price in enumerate(prices):
+                self._moqs[i, j] = price.moq
+                self._uprices[i, j] = price.unit_price.native_value
+                self._euprices[i, j] = effprices[j].unit_price.native_value
+        self._abs_moqs = numpy.array(
+            [x.abs_moq for x in self._candidates], dtype=float
+        )
+        self._vqtyavail = numpy.array(
+            [numpy.nan if x.vqtyavail is None else x.vqtyavail
+             for x in self._candidates], dtype=float
+        )
+
+    @property
+    def candidates(self):
+        return self._candidates
+
+    def __len__(self):
+        return len(self._candidates)
+
+    def evaluate(self, qtys, relax_moq=False):
+        """
+        Evaluates all the candidates at each of the given quantities.
+
+        Returns a :class:`CandidateEvaluation`, whose arrays are indexed
+        by candidate along the first axis and by quantity along the second.
+        """
+        qtys = numpy.asarray(qtys, dtype=float)
+        rows = numpy.arange(len(self._candidates))[:, None]
+
+        # Index of the applicable price break. -1 if the quantity is less
+        # than the smallest moq.
+        bidx = (self._moqs[:, None, :] <= qtys[None, :, None]).sum(axis=2) - 1
+        bsafe = bidx.clip(min=0)
+
+        vqty = self._vqtyavail[:, None]
+        eligible = (
+            self._priceable[:, None] & (bidx >= 0) &
+            (numpy.isnan(vqty) | (vqty > qtys) | (vqty == -2))
+        )
+        if not relax_moq:
+            eligible &= self._abs_moqs[:, None] <= qtys
+
+        tcost = numpy.where(eligible, self._euprices[rows, bsafe] * qtys,
+                            numpy.inf)
+
+        nidx = bidx + 1
+        nsafe = nidx.clip(max=self._moqs.shape[1] - 1)
+        has_next = eligible & (nidx < self._nbreaks[:, None])
+        ntcost = self._euprices[rows, nsafe] * self._moqs[rows, nsafe]
+        tc_bump = has_next & (ntcost < tcost * BUMP_TC_INCREASE)
+        up_bump = has_next & ~tc_bump & (
+            self._uprices[rows, nsafe] < self._uprices[rows, bsafe] *
+            BUMP_UP_FACTOR
+        )
+        return CandidateEvaluation(self, qtys, eligible, bidx,
+                                   tcost, ntcost, tc_bump, up_bump)
+
+
+class CandidateEvaluation(object):
+    def __init__(self, pricing, qtys, eligible, bidx,
+                 tcost, ntcost, tc_bump, up_bump):
+        self._pricing = pricing
+        self.qtys = qtys
+        self.eligible = eligible
+        self.bidx = bidx
+        self.tcost = tcost
+        self.ntcost = ntcost
+        self.tc_bump = tc_bump
+        self.up_bump = up_bump
+
+    def select(self):
+        """
+        Returns an array containing, for each quantity, the index of the
+        selected candidate, or -1 if no candidate is usable.
+        """
+        n = self.tcost.shape[0]
+        if n == 0:
+            return numpy.full(self.qtys.shape, -1, dtype=int)
+        # argmin returns the first minimum. Reversing the candidates makes
+        # ties go to the last one instead.
+        sel = n - 1 - self.tcost[::-1].argmin(axis=0)
+        sel[~numpy.isfinite(self.tcost.min(axis=0))] = -1
+        return sel
+
+    def info(self, cidx, qidx):
+        """
+        Returns the pricing of candidate ``cidx`` at quantity ``qidx`` as
+        a tuple of ``(oqty, nbprice, ubprice, effprice, urationale,
+        olduprice)``, containing the relevant
+        :class:`tendril.sourcing.vendors.vendorbase.VendorPrice` instances.
+        """
+        prices = self._pricing._prices[cidx]
+        effprices = self._pricing._effprices[cidx]
+        j = self.bidx[cidx, qidx]
+        oqty = self.qtys[qidx]
+        if oqty == int(oqty):
+            oqty = int(oqty)
+
+        def _get(items, k):
+            return items[k] if k < len(items) else None
+
+        urationale = None
+        olduprice = None
+        if self.tc_bump[cidx, qidx] or self.up_bump[cidx, qidx]:
+            if self.tc_bump[cidx, qidx]:
+                urationale = RATIONALE_TC
+            else:
+                urationale = RATIONALE_UP
+            olduprice = prices[j]
+            j += 1
+            oqty = prices[j].moq
+        return (oqty, _get(prices, j + 1), prices[j], effprices[j],
+                urationale, olduprice)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Vendor Rate Limiting (:mod:`tendril.sourcing.vendors.ratelimit`)
+================================================================
+
+A thread-safe token bucket, used to limit the rate at which requests are
+made to any single vendor, including when vendor operations are run
+concurrently. A token is taken for each request made to the vendor.
+"""
+
+import time
+import threading
+
+
+class TokenBucket(object):
+    """
+    Allows up to ``rate`` acquisitions per second on average, with bursts
+    of up to ``burst`` acquisitions. If ``rate`` is ``None``, acquisitions
+    are never delayed.
+    """
+    def __init__(self, rate=None, burst=1):
+        self._rate = float(rate) if rate else None
+        self._capacity = float(max(burst, 1))
+        self._tokens = self._capacity
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self._capacity,
+                           self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        if self._rate is None:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        if self._rate is None:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
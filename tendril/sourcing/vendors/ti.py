@@ -47,13 +47,15 @@ html_parser = HTMLParser.HTMLParser()
 
 
 class TIElnPart(VendorElnPartBase):
-    def __init__(self, tipartno, ident=None, vendor=None, max_age=600000):
+    def __init__(self, tipartno, ident=None, vendor=None, max_age=600000,
+                 shell_only=False):
         if not tipartno:
             logger.error("Not enough information to create a TI Part")
         if vendor is None:
             vendor = dvobj
         self.url_base = vendor.url_base
-        super(TIElnPart, self).__init__(tipartno, ident, vendor, max_age)
+        super(TIElnPart, self).__init__(tipartno, ident, vendor, max_age,
+                                        shell_only=shell_only)
 
     def _get_data(self):
         soup = self._get_product_soup()
@@ -75,7 +77,7 @@ class TIElnPart(VendorElnPartBase):
 
     def _get_product_soup(self):
         start_url = self.vpart_url
-        soup = www.get_soup(start_url)
+        soup = self._vendor.get_soup(start_url)
         ptable = soup.find('table',
                            id=re.compile(r'ctl00_ProductList'))
         if ptable is None:
@@ -96,7 +98,7 @@ class TIElnPart(VendorElnPartBase):
         if not product_url:
             raise ValueError("Exact match not found for " + self.vpno)
 
-        soup = www.get_soup(product_url)
+        soup = self._vendor.get_soup(product_url)
         if soup is None:
             logger.error("Unable to open TI product page : " + self.vpno)
             return
@@ -173,6 +175,7 @@ class VendorTI(VendorBase):
     _partclass = TIElnPart
     _vendorlogo = '/static/images/vendor-logo-ti.png'
     _url_base = 'https://store.ti.com'
+    _rate_limit = 1
     _devices = ['IC SMD', 'IC THRU', 'IC PLCC',]
     _type = 'TI'
 
@@ -305,7 +308,7 @@ class VendorTI(VendorBase):
             self._url_base,
             "Search.aspx?k={0}&pt=-1".format(urllib.quote_plus(value))
         )
-        soup = www.get_soup(url)
+        soup = self.get_soup(url)
         if soup is None:
             return None, 'URL_FAIL'
         parts = []
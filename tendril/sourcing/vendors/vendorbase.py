@@ -22,12 +22,12 @@ Vendors module documentation (:mod:`tendril.sourcing.vendors`)
 import os
 import csv
 import time
+import arrow
 import warnings
 
 from collections import namedtuple
 from sqlalchemy.orm.exc import NoResultFound
 from six.moves.urllib.error import HTTPError, URLError
-from cachetools import LFUCache
 
 from tendril.entityhub.maps import MapFileBase
 from tendril.utils.types import currency
@@ -39,6 +39,10 @@ from tendril.config import BASE_CURRENCY_SYMBOL
 from tendril.sourcing.db import controller
 from tendril.sourcing import maintenance
 
+from .partcache import partcache
+from .ratelimit import TokenBucket
+from .pricing import CandidatePricing
+
 from tendril.utils import log
 logger = log.get_logger(__name__, log.INFO)
 
@@ -97,8 +101,37 @@ class VendorMapFileDB(MapFileBase):
     def __init__(self, vendor):
         self._vendor = vendor
         self._vendor_name = vendor.cname
+        self._prefetched = {}
         super(VendorMapFileDB, self).__init__(self._vendor.mappath)
 
+    def prefetch(self, idents):
+        """
+        Loads the maps for all of the given idents from the database in
+        bulk (see :func:`controller.get_maps`). Subsequent lookups of the
+        map time and part numbers of these idents are served from memory
+        until :meth:`clear_prefetched` is called or the ident's map is
+        modified through this object.
+        """
+        prefetched = {}
+        with get_session() as session:
+            for map_obj in controller.get_maps(vendor=self._vendor_name,
+                                               idents=idents,
+                                               session=session):
+                mtime = map_obj.updated_at or map_obj.created_at
+                prefetched[map_obj.ident] = (
+                    mtime.timestamp,
+                    [str(x.vpno) for x in map_obj.umap],
+                    [str(x.vpno) for x in map_obj.amap],
+                )
+        self._prefetched = prefetched
+        return len(prefetched)
+
+    def clear_prefetched(self, canonical=None):
+        if canonical is None:
+            self._prefetched = {}
+        else:
+            self._prefetched.pop(canonical, None)
+
     def length(self):
         return controller.get_vendor_map_length(vendor=self._vendor_name)
 
@@ -110,16 +143,22 @@ class VendorMapFileDB(MapFileBase):
                 controller.get_vendor_idents(vendor=self._vendor_name)]
 
     def get_map_time(self, canonical):
+        if canonical in self._prefetched:
+            return self._prefetched[canonical][0]
         return controller.get_time(vendor=self._vendor_name, ident=canonical)
 
     def get_canonical(self, partno):
         return controller.get_ident(vendor=self._vendor_name, vpno=partno)
 
     def get_apartnos(self, canonical):
+        if canonical in self._prefetched:
+            return list(self._prefetched[canonical][2])
         return controller.get_amap_vpnos(vendor=self._vendor_name,
                                          ident=canonical)
 
     def get_upartnos(self, canonical):
+        if canonical in self._prefetched:
+            return list(self._prefetched[canonical][1])
         return controller.get_umap_vpnos(vendor=self._vendor_name,
                                          ident=canonical)
 
@@ -128,6 +167,7 @@ class VendorMapFileDB(MapFileBase):
                                        ident=canonical)
 
     def remove_apartno(self, partno, canonical):
+        self.clear_prefetched(canonical)
         return controller.remove_amap_vpno(
             vendor=self._vendor_name, ident=canonical, vpno=partno
         )
@@ -241,10 +281,12 @@ class VendorOrder(object):
 
 
 class VendorPrice(object):
-    def __init__(self, moq, price, currency_def, oqmultiple=1):
+    def __init__(self, moq, price, currency_def, oqmultiple=1,
+                 estimated=False):
         self._moq = moq
         self._price = currency.CurrencyValue(price, currency_def)
         self._oqmulitple = oqmultiple
+        self._estimated = estimated
 
     @property
     def moq(self):
@@ -258,6 +300,14 @@ class VendorPrice(object):
     def unit_price(self):
         return self._price
 
+    @property
+    def estimated(self):
+        """
+        Whether the price is an estimate (such as from a pricing model)
+        rather than a price actually quoted by the vendor.
+        """
+        return self._estimated
+
     def extended_price(self, qty, allow_partial=False):
         if not allow_partial:
             if qty < self.moq:
@@ -276,8 +326,9 @@ class VendorPrice(object):
         return self.unit_price.is_foreign
 
     def __repr__(self):
-        return '<VendorPrice {2} @{0}({1})>'.format(
-            self.moq, self.oqmultiple, self.unit_price)
+        return '<VendorPrice {2}{3} @{0}({1})>'.format(
+            self.moq, self.oqmultiple, self.unit_price,
+            ' (est)' if self._estimated else '')
 
 
 class VendorPartBase(object):
@@ -299,9 +350,14 @@ class VendorPartBase(object):
 
     def _populate(self, max_age=VENDOR_DEFAULT_MAXAGE):
         if self._vendor is not None and self._canonical_repr is not None:
+            if max_age != 0 and self._load_from_shared_cache(max_age):
+                return
             with get_session() as s:
                 try:
                     self.load_from_db(max_age, s)
+                    partcache.put_snapshot(self._vendor.cname, self._vpno,
+                                           self._canonical_repr,
+                                           self._get_snapshot())
                     return
                 except DBPartDataUnusable:
                     try:
@@ -326,6 +382,8 @@ class VendorPartBase(object):
             self._commit_to_db(session=session)
 
     def _commit_to_db(self, session):
+        partcache.invalidate(self._vendor.cname, self._vpno,
+                             self._canonical_repr)
         vpno = controller.get_vpno_obj(
             vendor=self._vendor.cname, ident=self._canonical_repr,
             vpno=self._vpno, session=session
@@ -346,19 +404,30 @@ class VendorPartBase(object):
             self._load_from_db(max_age, session=session)
 
     def _load_from_db(self, max_age, session, expired_is_error=False):
+        vpno = self._vendor.get_prefetched_vpno_obj(self._vpno,
+                                                    self._canonical_repr)
+        if vpno is None:
+            try:
+                vpno = controller.get_vpno_obj(
+                    vendor=self._vendor.cname, ident=self._canonical_repr,
+                    vpno=self._vpno, session=session
+                )
+            except NoResultFound:
+                raise DBPartDataUnavailable
+        return self._load_from_vpno_obj(vpno, max_age)
+
+    def _check_data_age(self, data_ts, max_age):
+        now = time.time()
+        if max_age == 0:
+            raise DBPartDataExpired
+        if now - data_ts > max_age >= 0:
+            maintenance.update_vpinfo(self._vendor.cname,
+                                      self._canonical_repr,
+                                      self._vpno)
+
+    def _load_from_vpno_obj(self, vpno, max_age):
         try:
-            vpno = controller.get_vpno_obj(
-                vendor=self._vendor.cname, ident=self._canonical_repr,
-                vpno=self._vpno, session=session
-            )
-            data_ts = vpno.updated_at.timestamp
-            now = time.time()
-            if max_age == 0:
-                raise DBPartDataExpired
-            if now - data_ts > max_age >= 0:
-                maintenance.update_vpinfo(self._vendor.cname,
-                                          self._canonical_repr,
-                                          self._vpno)
+            self._check_data_age(vpno.updated_at.timestamp, max_age)
             self._vqtyavail = vpno.detail.vqtyavail
             self._manufacturer = vpno.detail.manufacturer
             self._mpartno = vpno.detail.mpartno
@@ -368,15 +437,54 @@ class VendorPartBase(object):
             self._vparturl = vpno.detail.vparturl
             for price in vpno.prices:
                 self.add_price(
-                    VendorPrice(int(price.moq), float(price.price),
-                                self._vendor.currency, int(price.oqmultiple))
+                    VendorPrice(price.moq, price.price,
+                                self._vendor.currency, price.oqmultiple)
                 )
             return vpno
-        except NoResultFound:
-            raise DBPartDataUnavailable
         except AttributeError as e:
             raise DBPartDataIncomplete(e)
 
+    def _get_snapshot(self):
+        return {
+            'vqtyavail': self._vqtyavail,
+            'manufacturer': self._manufacturer,
+            'mpartno': self._mpartno,
+            'vpartdesc': self._vpartdesc,
+            'pkgqty': self._pkgqty,
+            'vparturl': self._vparturl,
+            'updated_at': self._last_updated.timestamp,
+            'prices': [(x.moq, x.unit_price.source_value, x.oqmultiple)
+                       for x in self._prices],
+        }
+
+    def _load_from_snapshot(self, snapshot):
+        self._vqtyavail = snapshot['vqtyavail']
+        self._manufacturer = snapshot['manufacturer']
+        self._mpartno = snapshot['mpartno']
+        self._vpartdesc = snapshot['vpartdesc']
+        self._pkgqty = snapshot['pkgqty']
+        self._vparturl = snapshot['vparturl']
+        self._last_updated = arrow.get(snapshot['updated_at'])
+        for moq, price, oqmultiple in snapshot['prices']:
+            self.add_price(
+                VendorPrice(moq, price, self._vendor.currency, oqmultiple)
+            )
+
+    def _load_from_shared_cache(self, max_age):
+        snapshot = partcache.get_snapshot(self._vendor.cname, self._vpno,
+                                          self._canonical_repr)
+        if snapshot is None:
+            return False
+        try:
+            self._check_data_age(snapshot['updated_at'], max_age)
+            self._load_from_snapshot(snapshot)
+        except (KeyError, TypeError, ValueError):
+            # Snapshot from an incompatible version. Discard whatever
+            # was partially loaded and fall back to the database.
+            self._prices = []
+            return False
+        return True
+
     def _get_data(self):
         raise NotImplementedError
 
@@ -554,12 +662,27 @@ class VendorElnPartBase(VendorPartBase):
         )
         return vpno
 
-    def _load_from_db(self, max_age, session, expired_is_error=False):
-        vpno = super(VendorElnPartBase, self)._load_from_db(max_age,
-                                                            session=session)
+    def _load_from_vpno_obj(self, vpno, max_age):
+        vpno = super(VendorElnPartBase, self)._load_from_vpno_obj(vpno,
+                                                                  max_age)
         if vpno is not None:
-            self._package = vpno.detail_eln.package
-            self._datasheet = vpno.detail_eln.datasheet
+            try:
+                self._package = vpno.detail_eln.package
+                self._datasheet = vpno.detail_eln.datasheet
+            except AttributeError as e:
+                raise DBPartDataIncomplete(e)
+        return vpno
+
+    def _get_snapshot(self):
+        snapshot = super(VendorElnPartBase, self)._get_snapshot()
+        snapshot['package'] = self._package
+        snapshot['datasheet'] = self._datasheet
+        return snapshot
+
+    def _load_from_snapshot(self, snapshot):
+        super(VendorElnPartBase, self)._load_from_snapshot(snapshot)
+        self._package = snapshot['package']
+        self._datasheet = snapshot['datasheet']
 
     def _get_data(self):
         raise NotImplementedError
@@ -588,12 +711,29 @@ class VendorBase(object):
     _type = 'BASE'
     _url_base = None
     _ident_blacklist = []
+    #: The default maximum average rate, in requests per second, at which
+    #: requests are made to the vendor. ``None`` implies no limit. Can be
+    #: overridden per instance by the ``rate_limit`` parameter in the
+    #: vendor's configuration. The limit is applied where each request is
+    #: made, by the :attr:`fetcher` for vendors which scrape and by the
+    #: vendor's API calls for the others.
+    _rate_limit = None
+    #: The maximum number of concurrent requests the vendor's
+    #: :attr:`fetcher` should make. Can be overridden per instance by the
+    #: ``max_connections`` parameter in the vendor's configuration.
+    _max_connections = 4
+    #: Whether the vendor's :meth:`search_vpnos_many` is used in preference
+    #: to :meth:`search_vpnos` when generating maps or sourcing in bulk. Can
+    #: be overridden per instance by the ``bulk_search`` parameter in the
+    #: vendor's configuration.
+    _bulk_search = False
 
     def __init__(self, name, dname, pclass, mappath=None,
                  currency_code=BASE_CURRENCY,
                  currency_symbol=BASE_CURRENCY_SYMBOL,
                  vendorlogo=None, sname=None, is_manufacturer=None,
-                 vtype=None):
+                 vtype=None, rate_limit=None, max_connections=None,
+                 bulk_search=None):
         self._name = name
         self._dname = dname
         self._sname = sname
@@ -606,7 +746,16 @@ class VendorBase(object):
         self._order = None
         self._orderbasecosts = []
         self._orderadditionalcosts = []
-        self._partcache = LFUCache(1000)
+        self._prefetched = {}
+        self._prefetched_data = {}
+        if rate_limit is None:
+            rate_limit = self._rate_limit
+        self._rate_limiter = TokenBucket(rate_limit)
+        if max_connections is not None:
+            self._max_connections = max_connections
+        if bulk_search is not None:
+            self._bulk_search = bulk_search
+        self._fetcher = None
         if mappath is not None:
             self._mappath = mappath
         else:
@@ -675,6 +824,33 @@ class VendorBase(object):
             return self._instance_vendorlogo
         return self._vendorlogo
 
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    @property
+    def fetcher(self):
+        """
+        The vendor's :class:`tendril.sourcing.vendors.fetch.FetchEngine`,
+        created on first use and limited by the vendor's
+        :attr:`rate_limiter`.
+        """
+        if self._fetcher is None:
+            # Imported here to avoid pulling in the www stack (which tests
+            # connectivity on import) for vendors which never scrape.
+            from .fetch import FetchEngine
+            self._fetcher = FetchEngine(
+                rate_limiter=self._rate_limiter,
+                max_connections=self._max_connections
+            )
+        return self._fetcher
+
+    def get_soup(self, url):
+        return self.fetcher.get_soup(url)
+
+    def get_soups(self, urls):
+        return self.fetcher.get_soups(urls)
+
     @property
     def url_base(self):
         try:
@@ -715,6 +891,7 @@ class VendorBase(object):
                 vpnos, strategy = self.search_vpnos(ident)
                 if not vpnos:
                     vpnos = []
+                self._map.clear_prefetched(ident)
                 with get_session() as session:
                     controller.set_strategy(vendor=self._name, ident=ident,
                                             strategy=strategy, session=session)
@@ -727,115 +904,244 @@ class VendorBase(object):
     def search_vpnos(self, ident):
         raise NotImplementedError
 
+    @property
+    def bulk_search(self):
+        return self._bulk_search
+
+    def search_vpnos_many(self, idents):
+        """
+        Searches for the vendor part numbers for each of the given idents,
+        yielding ``(ident, (vpnos, strategy))`` tuples in the order of
+        ``idents``.
+
+        This implementation searches for the idents one at a time, so
+        ``(vpnos, strategy)`` is what :meth:`search_vpnos` returns for the
+        ident. Vendors whose APIs can search for several parts in a single
+        request should override this. They should only set
+        :attr:`_bulk_search` if their results are the same as those of
+        :meth:`search_vpnos`, and otherwise document how they differ,
+        leaving bulk search to be enabled in the vendor's configuration.
+        """
+        for ident in idents:
+            yield ident, self.search_vpnos(ident)
+
+    def refresh_vpmaps(self, idents):
+        """
+        Searches for the vendor part numbers for each of the given idents
+        (see :meth:`search_vpnos_many`), and writes the results to the
+        database within a single session. Blacklisted idents are skipped.
+
+        :return: The number of idents searched for.
+        """
+        idents = [x for x in idents if x not in self._ident_blacklist]
+        if not idents:
+            return 0
+        with get_session() as session:
+            for ident, (vpnos, strategy) in self.search_vpnos_many(idents):
+                controller.set_strategy(vendor=self._name, ident=ident,
+                                        strategy=strategy,
+                                        session=session)
+                controller.set_amap_vpnos(vendor=self._name, ident=ident,
+                                          vpnos=vpnos or [],
+                                          session=session)
+        return len(idents)
+
+    def _search_missing_vpnos(self, idents):
+        # Used when prefetching for bulk sourcing, to search for the idents
+        # which get_vpnos would otherwise search for one at a time.
+        missing = [x for x in idents if x not in self._ident_blacklist and
+                   not self._map.get_map_time(canonical=x)]
+        if not missing:
+            return False
+        try:
+            self.refresh_vpmaps(missing)
+        except (NotImplementedError, URLError, HTTPError):
+            logger.warning("Bulk search failed for {0}, idents will be "
+                           "searched individually".format(self._name))
+        return True
+
     def get_vpart(self, vpartno, ident=None, max_age=VENDOR_DEFAULT_MAXAGE):
-        idx = (vpartno, ident)
-        if idx not in self._partcache.keys():
+        part = partcache.get(self.cname, vpartno, ident, max_age=max_age)
+        if part is None:
             part = self._partclass(vpartno, ident=ident,
                                    vendor=self, max_age=max_age)
-            self._partcache[idx] = part
-        return self._partcache[idx]
+            # Keyed as the part invalidates itself in _commit_to_db.
+            partcache.put(self.cname, part.vpno, part.ident, part)
+        return part
 
-    @staticmethod
-    def _get_candidate_tcost(candidate, oqty):
-        ubprice, nbprice = candidate.get_price(oqty)
-        effprice = candidate.get_effective_price(ubprice)
-        return effprice.extended_price(oqty).native_value
-
-    def _get_candidate_isinfo(self, candidate, oqty):
-        tcost = self._get_candidate_tcost(candidate, oqty)
-        ubprice, nbprice = candidate.get_price(oqty)
-        effprice = candidate.get_effective_price(ubprice)
-        urationale = None
-        olduprice = None
-        if nbprice is not None:
-            nubprice, nnbprice = candidate.get_price(nbprice.moq)
-            neffprice = candidate.get_effective_price(nubprice)
-            ntcost = neffprice.extended_price(nbprice.moq).native_value
-            # bump_excess_qty = nubprice.moq - rqty
-
-            if ntcost < tcost * 1.4:
-                urationale = "TC Increase < 40%"
-                oqty = nbprice.moq
-                olduprice = ubprice
-                ubprice = nubprice
-                nbprice = nnbprice
-                effprice = neffprice
-            elif nubprice.unit_price.native_value < \
-                    ubprice.unit_price.native_value * 0.2:
-                # TODO This used to be 40%. Evelta threw this out the window.
-                # Figure out a better way to handle sparse price breaks.
-                urationale = "UP Decrease > 80%"
-                olduprice = ubprice
-                oqty = nbprice.moq
-                ubprice = nubprice
-                nbprice = nnbprice
-                effprice = neffprice
-        return SourcingInfo(self, candidate, oqty, nbprice,
-                            ubprice, effprice, urationale, olduprice)
+    def get_prefetched_vpno_obj(self, vpartno, ident):
+        return self._prefetched.get((vpartno, ident), None)
 
-    def get_optimal_pricing(self, ident, rqty, get_all=False, relax_moq=False):
-        candidate_names = self.get_vpnos(ident)
+    def get_prefetched_part_data(self, vpartno):
+        return self._prefetched_data.get(vpartno, None)
+
+    def _fetch_parts_data(self, vpnos):
+        """
+        Retrieves the raw data for all of the given vendor part numbers in
+        bulk, as a dictionary keyed by part number. This is used by
+        :meth:`prefetch_vparts` for parts which would otherwise have to be
+        retrieved from the vendor one at a time, and part classes may use
+        :meth:`get_prefetched_part_data` in their ``_get_data`` to obtain
+        it. Vendors which support bulk retrieval should override this.
+        """
+        return {}
+
+    def prefetch_vparts(self, idents, max_age=VENDOR_DEFAULT_MAXAGE):
+        """
+        Loads the vendor parts mapped to all of the given idents from the
+        database in bulk (see :func:`controller.get_vpno_objs`) and
+        populates the part cache with them, so that subsequent calls to
+        :meth:`get_vpart` and :meth:`get_optimal_pricing` for these idents
+        do not hit the database one part at a time.
+
+        Parts whose database information is missing, incomplete or older
+        than ``max_age`` are handled by the part class exactly as they
+        would have been had they been individually retrieved. For vendors
+        which support it (see :meth:`_fetch_parts_data`), the vendor data
+        for parts missing from the database is first retrieved in bulk.
+
+        :return: The number of parts added to the part cache.
+        """
+        count = 0
+        with get_session() as session:
+            vpno_objs = controller.get_vpno_objs(vendor=self._name,
+                                                 idents=idents,
+                                                 session=session)
+            self._prefetched = dict(((x.vpno, x.vpmap.ident), x)
+                                    for x in vpno_objs)
+            try:
+                missing = [vpartno for (vpartno, ident), vpno_obj
+                           in self._prefetched.items()
+                           if (max_age == 0 or vpno_obj.detail is None) and
+                           not partcache.contains(self.cname, vpartno,
+                                                  ident, max_age)]
+                if missing:
+                    self._prefetched_data = self._fetch_parts_data(missing)
+                for vpartno, ident in self._prefetched.keys():
+                    if partcache.contains(self.cname, vpartno, ident,
+                                          max_age):
+                        continue
+                    try:
+                        self.get_vpart(vpartno, ident=ident, max_age=max_age)
+                        count += 1
+                    except VendorPartRetrievalError:
+                        continue
+            finally:
+                self._prefetched = {}
+                self._prefetched_data = {}
+        return count
+
+    def refresh_vparts(self, vpnos):
+        """
+        Retrieves fresh information from the vendor for each of the given
+        ``(ident, vpno)`` pairs, regardless of the age of the information
+        in the database, and writes it to the database within a single
+        session. For vendors which support it (see
+        :meth:`_fetch_parts_data`), the vendor data is retrieved in bulk.
+
+        Parts which can't be retrieved are skipped.
+
+        :return: The number of parts refreshed.
+        """
+        parts = []
+        try:
+            self._prefetched_data = self._fetch_parts_data(
+                [x[1] for x in vpnos]
+            )
+            for ident, vpno in vpnos:
+                part = self._partclass(vpno, ident=ident, vendor=self,
+                                       shell_only=True)
+                try:
+                    part._get_data()
+                except (VendorPartRetrievalError,
+                        VendorPartInaccessibleError) as e:
+                    logger.warning("Unable to refresh {0} {1} : {2}"
+                                   "".format(self._name, vpno, e))
+                    continue
+                parts.append(part)
+        finally:
+            self._prefetched_data = {}
+        with get_session() as session:
+            for part in parts:
+                try:
+                    part.commit(session)
+                except NoResultFound:
+                    pass
+        return len(parts)
+
+    def prefetch(self, idents, max_age=VENDOR_DEFAULT_MAXAGE):
+        """
+        Prefetches the vendor maps for all of the given idents and the
+        parts mapped to them (see :meth:`prefetch_vparts`), in preparation
+        for sourcing them in bulk. The prefetched maps should be released
+        using :meth:`clear_prefetched` once done.
+
+        For vendors which support bulk search (see :attr:`bulk_search`),
+        idents which have not yet been mapped are also searched for
+        together, instead of one at a time as they are sourced.
+        """
+        self._map.prefetch(idents)
+        if self._bulk_search and self._search_missing_vpnos(idents):
+            self._map.prefetch(idents)
+        return self.prefetch_vparts(idents, max_age=max_age)
+
+    def clear_prefetched(self):
+        self._map.clear_prefetched()
+
+    def _get_candidates(self, ident):
         candidates = []
-        for name in candidate_names:
+        for name in self.get_vpnos(ident):
             try:
                 candidates.append(self.get_vpart(name, ident=ident))
             except VendorPartRetrievalError:
                 continue
-        if not relax_moq:
-            candidates = [x for x in candidates if x.abs_moq <= rqty]
-        candidates = [x for x in candidates
-                      if x.vqtyavail is None or
-                      x.vqtyavail > rqty or
-                      x.vqtyavail == -2]
-        oqty = rqty
-
-        if len(candidates) == 0:
-            if not get_all:
-                return SourcingInfo(self, None, None, None,
-                                    None, None, None, None)
-            else:
-                return []
+        return candidates
 
-        if get_all:
-            return [self._get_candidate_isinfo(x, oqty) for x in candidates]
+    def get_optimal_pricing(self, ident, rqty, get_all=False, relax_moq=False):
+        return self.get_optimal_pricings(ident, [rqty], get_all=get_all,
+                                         relax_moq=relax_moq)[0]
 
-        tcost = None
-        idx = 0
-        while not tcost:
-            selcandidate = candidates[idx]
-            try:
-                tcost = selcandidate.get_effective_price(
-                    selcandidate.get_price(rqty)[0]
-                ).extended_price(rqty).native_value
-            except VendorPartPricingError:
-                logger.error("Unable to price part {0}"
-                             "".format(selcandidate.vpno))
-                idx += 1
-            except IndexError:
-                if not get_all:
-                    return SourcingInfo(self, None, None, None,
-                                        None, None, None, None)
-                else:
-                    return []
+    def get_optimal_pricings(self, ident, rqtys, get_all=False,
+                             relax_moq=False):
+        """
+        Returns the sourcing information for the ident from this vendor at
+        each of the requested quantities in ``rqtys``, as a list in the same
+        order. Each element is what :meth:`get_optimal_pricing` would return
+        for that quantity, i.e., a :class:`SourcingInfo` for the selected
+        candidate part, or a list of them for every usable candidate if
+        ``get_all`` is ``True``.
+
+        The candidate parts are priced at all the quantities together using
+        :class:`tendril.sourcing.vendors.pricing.CandidatePricing`, so this
+        should be preferred over repeated calls to
+        :meth:`get_optimal_pricing` when sweeping over quantities.
+        """
+        pricing = CandidatePricing(self._get_candidates(ident))
+        evaluation = pricing.evaluate(rqtys, relax_moq=relax_moq)
 
-        selcandidate = None
-        for candidate in candidates:
-            try:
-                ntcost = self._get_candidate_tcost(candidate, oqty)
-            except VendorPartPricingError:
-                continue
-            if ntcost <= tcost:
-                tcost = ntcost
-                selcandidate = candidate
-
-        if selcandidate.vqtyavail == -2:
-            logger.warning(
-                "Vendor available quantity could not be confirmed. "
-                "Verify manually : " + self.name + " " + selcandidate.vpno +
-                os.linesep + os.linesep + os.linesep
-            )
+        if get_all:
+            return [[SourcingInfo(self, candidate,
+                                  *evaluation.info(cidx, qidx))
+                     for cidx, candidate in enumerate(pricing.candidates)
+                     if evaluation.eligible[cidx, qidx]]
+                    for qidx in range(len(rqtys))]
 
-        return self._get_candidate_isinfo(selcandidate, oqty)
+        rval = []
+        for qidx, cidx in enumerate(evaluation.select()):
+            if cidx < 0:
+                rval.append(SourcingInfo(self, None, None, None,
+                                         None, None, None, None))
+                continue
+            selcandidate = pricing.candidates[cidx]
+            if selcandidate.vqtyavail == -2:
+                logger.warning(
+                    "Vendor available quantity could not be confirmed. "
+                    "Verify manually : " + self.name + " " +
+                    selcandidate.vpno + os.linesep + os.linesep + os.linesep
+                )
+            rval.append(SourcingInfo(self, selcandidate,
+                                     *evaluation.info(cidx, qidx)))
+        return rval
 
     def add_order_additional_cost_component(self, desc, percent):
         self._orderadditionalcosts.append((desc, percent))
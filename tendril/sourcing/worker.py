@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Sourcing Refresh Worker (:mod:`tendril.sourcing.worker`)
+========================================================
+
+Consumes the vendor part information and vendor map refresh requests
+published by :mod:`tendril.sourcing.maintenance` when stale sourcing
+information is encountered, and refreshes the information from the
+vendors, so that the slow retrieval from vendors happens here instead of
+within interactive costing.
+
+The worker is run using the ``tendril-sourcingworker`` script (see
+:mod:`tendril.scripts.sourcingworker`).
+
+Each vendor has its own queue of pending requests, processed by its own
+thread, so a slow vendor does not hold up the others and each vendor's
+requests are subject only to its own rate limiter. Requests are processed
+in batches (see :meth:`VendorBase.refresh_vparts` and
+:meth:`VendorBase.refresh_vpmaps`), whose results are written to the
+database within a single session, and are acknowledged to the server only
+once they have been processed. Repeated requests for the same part or map
+which are waiting to be processed are merged.
+
+Requests are processed in order of priority (see
+:func:`get_priority_idents`) :
+
+  - :data:`PRIORITY_PRODUCTION`, for idents in the COBOMs of active
+    production orders.
+  - :data:`PRIORITY_COBOM`, for idents in the COBOMs of other active
+    inventory indents.
+  - :data:`PRIORITY_DEFAULT`, for everything else.
+
+"""
+
+import json
+import time
+import heapq
+import threading
+from six.moves import queue
+
+from tendril.connectors.mq import _mq_connect
+from tendril.sourcing.maintenance import VPINFO_QUEUE
+from tendril.sourcing.maintenance import VPMAP_QUEUE
+
+from tendril.utils import log
+logger = log.get_logger(__name__, log.DEFAULT)
+
+
+#: The priority of requests for idents in active production orders.
+PRIORITY_PRODUCTION = 0
+
+#: The priority of requests for idents in other active COBOMs.
+PRIORITY_COBOM = 1
+
+#: The priority of all other requests.
+PRIORITY_DEFAULT = 2
+
+#: The indent statuses considered to be active.
+ACTIVE_INDENT_STATUSES = ('active', 'pending')
+
+#: The maximum number of requests processed together for a vendor.
+REFRESH_BATCH_SIZE = 20
+
+#: The maximum number of unacknowledged requests held by the worker. Only
+#: the requests held are ordered by priority.
+REFRESH_PREFETCH_COUNT = 500
+
+#: The number of most recent production orders and indents considered
+#: when determining priorities.
+REFRESH_PRIORITY_LIMIT = 50
+
+#: The interval, in seconds, at which priorities are redetermined.
+REFRESH_PRIORITY_INTERVAL = 3600
+
+#: The interval, in seconds, at which throughput statistics are logged.
+REFRESH_STATS_INTERVAL = 300
+
+
+def _add_cobom_idents(priorities, cobom, priority):
+    for line in cobom.lines:
+        if priorities.get(line.ident, PRIORITY_DEFAULT) > priority:
+            priorities[line.ident] = priority
+
+
+def get_priority_idents(limit=REFRESH_PRIORITY_LIMIT):
+    """
+    Returns a dictionary of the priorities of idents in the COBOMs of the
+    ``limit`` most recent production orders and inventory indents, whose
+    indents are active (see :data:`ACTIVE_INDENT_STATUSES`). Idents not
+    included have :data:`PRIORITY_DEFAULT`.
+    """
+    from tendril.dox.indent import get_all_indent_sno_strings
+    from tendril.dox.production import get_all_prodution_order_snos_strings
+    from tendril.inventory.indent import InventoryIndent
+    from tendril.production.order import ProductionOrder
+
+    priorities = {}
+    indents = [(sno, PRIORITY_COBOM)
+               for sno in get_all_indent_sno_strings(limit=limit)]
+    for sno in get_all_prodution_order_snos_strings(limit=limit):
+        try:
+            indent_snos = ProductionOrder(sno).indent_snos
+        except Exception as e:
+            logger.warning("Unable to load production order {0} : {1}"
+                           "".format(sno, e))
+            continue
+        indents.extend((x, PRIORITY_PRODUCTION) for x in indent_snos)
+    for sno, priority in indents:
+        try:
+            indent = InventoryIndent(sno, verbose=False)
+        except Exception as e:
+            logger.warning("Unable to load indent {0} : {1}".format(sno, e))
+            continue
+        if indent.status not in ACTIVE_INDENT_STATUSES or \
+                indent.cobom is None:
+            continue
+        _add_cobom_idents(priorities, indent.cobom, priority)
+    return priorities
+
+
+class RefreshQueue(object):
+    """
+    The queue of pending refresh requests for a single vendor.
+
+    Requests are identified by a hashable key, whose first element is the
+    kind of request, either ``'vpinfo'`` or ``'vpmap'``. Requests for a
+    key which is already pending are merged into the pending request, and
+    processed once with all of their delivery tags. Requests are taken in
+    batches of a single kind, in order of priority and then of arrival.
+    """
+    def __init__(self):
+        self._heap = []
+        self._pending = {}
+        self._seq = 0
+        self._lock = threading.Condition()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def put(self, key, priority, tag):
+        """
+        Adds a request. Returns ``False`` if it was merged into a pending
+        request for the same key.
+        """
+        with self._lock:
+            if key in self._pending:
+                self._pending[key].append(tag)
+                return False
+            self._pending[key] = [tag]
+            heapq.heappush(self._heap, (priority, self._seq, key))
+            self._seq += 1
+            self._lock.notify()
+            return True
+
+    def get_batch(self, size, timeout=None):
+        """
+        Removes and returns up to ``size`` of the highest priority pending
+        requests of the same kind as the highest priority one, as a list
+        of ``(key, tags)`` tuples, waiting up to ``timeout`` seconds for
+        one to arrive. Returns an empty list if none did.
+        """
+        with self._lock:
+            if not self._heap:
+                self._lock.wait(timeout)
+            if not self._heap:
+                return []
+            batch = []
+            deferred = []
+            kind = self._heap[0][2][0]
+            while self._heap and len(batch) < size:
+                item = heapq.heappop(self._heap)
+                if item[2][0] != kind:
+                    deferred.append(item)
+                    continue
+                batch.append((item[2], self._pending.pop(item[2])))
+            for item in deferred:
+                heapq.heappush(self._heap, item)
+            return batch
+
+    def wake(self):
+        with self._lock:
+            self._lock.notify_all()
+
+
+class RefreshWorker(object):
+    """
+    Consumes refresh requests for the given vendors from the message
+    queue server and processes them, until :meth:`stop` is called.
+
+    :param vendors: The vendors to refresh information for. Requests for
+                    other vendors are discarded.
+    :param connect: A callable returning a new
+                    :class:`pika.BlockingConnection`. Defaults to a
+                    connection to the configured ``MQ_SERVER``.
+    :param priorities: A callable returning a dictionary of ident
+                       priorities. Defaults to :func:`get_priority_idents`.
+
+    """
+    def __init__(self, vendors, connect=None, priorities=None,
+                 batch_size=REFRESH_BATCH_SIZE,
+                 prefetch_count=REFRESH_PREFETCH_COUNT,
+                 priority_interval=REFRESH_PRIORITY_INTERVAL,
+                 stats_interval=REFRESH_STATS_INTERVAL):
+        self._vendors = dict((x.cname, x) for x in vendors)
+        self._connect = connect or _mq_connect
+        self._get_priorities = priorities or get_priority_idents
+        self._batch_size = batch_size
+        self._prefetch_count = prefetch_count
+        self._priority_interval = priority_interval
+        self._stats_interval = stats_interval
+
+        self._queues = dict((x, RefreshQueue()) for x in self._vendors)
+        self._threads = []
+        self._acks = queue.Queue()
+        self._stop = threading.Event()
+        self._priorities = {}
+        self._priorities_at = None
+
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._last_active = None
+        self._counts = dict((x, 0) for x in ('received', 'merged',
+                                             'discarded', 'vpinfo',
+                                             'vpmap', 'failed', 'batches'))
+        self._vendor_counts = dict((x, 0) for x in self._vendors)
+
+    def _update_priorities(self):
+        try:
+            self._priorities = self._get_priorities()
+            logger.info("Prioritizing {0} idents"
+                        "".format(len(self._priorities)))
+        except Exception as e:
+            logger.warning("Unable to determine priorities : {0}".format(e))
+        self._priorities_at = time.time()
+
+    def _on_message(self, channel, method, properties, body):
+        with self._lock:
+            self._counts['received'] += 1
+            self._last_active = time.time()
+        try:
+            message = json.loads(body)
+            vqueue = self._queues[message['vendor']]
+            ident = message['ident']
+            if method.routing_key == VPINFO_QUEUE:
+                key = ('vpinfo', ident, message['vpno'])
+            else:
+                key = ('vpmap', ident)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Discarding refresh request {0}".format(body))
+            with self._lock:
+                self._counts['discarded'] += 1
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        priority = self._priorities.get(ident, PRIORITY_DEFAULT)
+        if not vqueue.put(key, priority, method.delivery_tag):
+            with self._lock:
+                self._counts['merged'] += 1
+
+    def _process_batch(self, vendor, batch):
+        kind = batch[0][0][0]
+        try:
+            if kind == 'vpinfo':
+                vendor.refresh_vparts([x[0][1:] for x in batch])
+            else:
+                vendor.refresh_vpmaps([x[0][1] for x in batch])
+            failed = False
+        except Exception as e:
+            # Requests which fail are not retried. They'll be made again
+            # the next time the information is found to be stale.
+            logger.warning("Unable to refresh {0} {1}s : {2}"
+                           "".format(vendor.cname, kind, e))
+            failed = True
+        with self._lock:
+            self._counts['batches'] += 1
+            self._counts['failed' if failed else kind] += len(batch)
+            if not failed:
+                self._vendor_counts[vendor.cname] += len(batch)
+            self._last_active = time.time()
+        for _, tags in batch:
+            for tag in tags:
+                self._acks.put(tag)
+
+    def _run_vendor(self, vendor):
+        vqueue = self._queues[vendor.cname]
+        while not self._stop.is_set():
+            batch = vqueue.get_batch(self._batch_size, timeout=1)
+            if batch:
+                self._process_batch(vendor, batch)
+
+    def _ack(self, channel):
+        while True:
+            try:
+                tag = self._acks.get_nowait()
+            except queue.Empty:
+                return
+            channel.basic_ack(delivery_tag=tag)
+
+    @property
+    def backlog(self):
+        """
+        The number of requests waiting to be processed, for each vendor.
+        """
+        return dict((k, len(v)) for k, v in self._queues.items())
+
+    @property
+    def stats(self):
+        """
+        A dictionary of processing statistics :
+
+        - ``received``, ``merged`` and ``discarded``, the number of
+          requests received, merged into pending requests for the same
+          part or map, and discarded as unusable.
+        - ``vpinfo`` and ``vpmap``, the number of requests processed.
+        - ``failed``, the number of requests whose processing failed.
+        - ``batches``, the number of batches processed.
+        - ``rate``, the number of requests processed per second.
+        - ``vendors``, the number of requests processed for each vendor.
+        - ``backlog``, see :attr:`backlog`.
+
+        """
+        with self._lock:
+            rval = dict(self._counts)
+            rval['vendors'] = dict(self._vendor_counts)
+        elapsed = time.time() - self._started_at if self._started_at else 0
+        processed = rval['vpinfo'] + rval['vpmap']
+        rval['rate'] = processed / elapsed if elapsed else 0
+        rval['backlog'] = self.backlog
+        return rval
+
+    def _log_stats(self):
+        stats = self.stats
+        logger.info(
+            "Refreshed {0} parts and {1} maps ({2:.2f}/s), {3} failed, "
+            "{4} merged, {5} waiting".format(
+                stats['vpinfo'], stats['vpmap'], stats['rate'],
+                stats['failed'], stats['merged'],
+                sum(stats['backlog'].values())
+            )
+        )
+
+    def _is_idle(self, idle_exit):
+        if idle_exit is None or sum(self.backlog.values()):
+            return False
+        with self._lock:
+            return time.time() - self._last_active > idle_exit
+
+    def run(self, idle_exit=None):
+        """
+        Runs the worker until :meth:`stop` is called, or, if ``idle_exit``
+        is not ``None``, until no requests have been received or processed
+        for ``idle_exit`` seconds. Requests not yet processed when the
+        worker stops are left with the server.
+        """
+        self._stop.clear()
+        self._started_at = self._last_active = time.time()
+        self._update_priorities()
+        connection = self._connect()
+        channel = None
+        try:
+            channel = connection.channel()
+            channel.basic_qos(prefetch_count=self._prefetch_count)
+            for key in (VPMAP_QUEUE, VPINFO_QUEUE):
+                channel.queue_declare(queue=key, durable=True)
+                channel.basic_consume(self._on_message, queue=key)
+            self._threads = [
+                threading.Thread(target=self._run_vendor, args=(x,))
+                for x in self._vendors.values()
+            ]
+            for thread in self._threads:
+                thread.daemon = True
+                thread.start()
+            stats_at = time.time()
+            while not self._stop.is_set():
+                connection.process_data_events(time_limit=0.1)
+                self._ack(channel)
+                now = time.time()
+                if now - self._priorities_at > self._priority_interval:
+                    self._update_priorities()
+                if now - stats_at > self._stats_interval:
+                    self._log_stats()
+                    stats_at = now
+                if self._is_idle(idle_exit):
+                    break
+        finally:
+            self._stop.set()
+            for vqueue in self._queues.values():
+                vqueue.wake()
+            for thread in self._threads:
+                thread.join()
+            try:
+                if channel is not None:
+                    self._ack(channel)
+            finally:
+                connection.close()
+            self._log_stats()
+
+    def stop(self):
+        """
+        Asks the worker to stop, once the batches being processed are done.
+        """
+        self._stop.set()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Fixtures shared by the tests, including a local stand-in for ``gnetlist``.
+"""
+
+import os
+import sys
+import stat
+import pytest
+
+
+# Writes a BOM netlist with a line for each 'refdes device' line of the
+# schematic, taking longer for earlier sheets so that they finish out of
+# order. A 'refdes ...' line after the first gives the columns of the
+# netlist instead. Schematics containing FAIL produce no netlist. Each run
+# is recorded in a 'calls' file alongside.
+_GNETLIST = """#!{python}
+import os
+import sys
+import time
+with open(os.path.join(os.path.dirname(sys.argv[0]), 'calls'), 'a') as f:
+    f.write(sys.argv[-1] + '\\n')
+args = sys.argv[1:]
+outpath = args[args.index('-o') + 1]
+schpath = args[-1]
+with open(schpath) as f:
+    lines = [x.split() for x in f.read().splitlines()
+             if not x.startswith('C ')]
+if ['FAIL'] in lines:
+    sys.stderr.write('error in ' + schpath)
+    sys.exit(2)
+time.sleep(0.2 * int(lines[0][0]))
+header = ['refdes', 'device']
+if len(lines) > 1 and lines[1][0] == 'refdes':
+    header = lines.pop(1)
+with open(outpath, 'w') as f:
+    f.write('\\t'.join(header) + '\\n')
+    for line in lines[1:]:
+        f.write('\\t'.join(line) + '\\n')
+"""
+
+
+@pytest.fixture
+def gnetlist(tmpdir, monkeypatch):
+    path = tmpdir.mkdir('bin').join('gnetlist')
+    path.write(_GNETLIST.format(python=sys.executable))
+    path.chmod(path.stat().mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', '{0}{1}{2}'.format(path.dirname, os.pathsep,
+                                                  os.environ['PATH']))
+    return path
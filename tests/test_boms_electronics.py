@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the cache of BOMs imported by :func:`import_pcb`, with local
+stand-ins for the configs file and the BOM, and for pickling BOMs imported
+from a project, against the local stand-in for ``gnetlist`` (see
+``conftest.py``).
+"""
+
+import pickle
+import pytest
+from tendril.boms import electronics
+from tendril.gedaif import bomparser
+from tendril.gedaif.bomparser import BomLine
+from tendril.gedaif.conffile import ConfigsFile
+from tendril.validation.motifs import BomMotifUnrecognizedError
+
+
+class _Configs(object):
+    schema_name = 'pcbconfigs'
+    schema_version_min = '1.0'
+    schema_version_max = '1.0'
+
+    def __init__(self, projectfolder):
+        self.projectfolder = projectfolder
+        self.rawconfig = {}
+
+
+class _Bom(object):
+    built = 0
+
+    def __init__(self, configfile, use_cached=True):
+        _Bom.built += 1
+        self.configurations = configfile
+        self.lines = [BomLine('R1\tRES\n', ['refdes', 'device'])]
+
+
+@pytest.fixture
+def project(tmpdir, monkeypatch):
+    symlib = tmpdir.mkdir('symlib')
+    symlib.join('res.sym').write('device=RESISTOR\n')
+    monkeypatch.setattr(bomparser, 'GEDA_SYMLIB_ROOT', str(symlib))
+    monkeypatch.setattr(bomparser, '_symbol_paths', None)
+    monkeypatch.setattr(bomparser, '_missing_symbols', set())
+    monkeypatch.setattr(electronics, 'ELNBOM_CACHE_FOLDER',
+                        str(tmpdir.join('cache')))
+    monkeypatch.setattr(electronics, 'ConfigsFile', _Configs)
+    monkeypatch.setattr(electronics, 'EntityElnBom', _Bom)
+    monkeypatch.setattr(_Bom, 'built', 0)
+    electronics.clear_import_cache()
+    schfolder = tmpdir.mkdir('project').mkdir('schematic')
+    schfolder.join('configs.yaml').write('projfile: p.gsch2pcb\n')
+    schfolder.join('s0.sch').write('C 100 100 1 0 0 res.sym\n')
+    yield schfolder
+    electronics.clear_import_cache()
+
+
+@pytest.fixture
+def geda_project(tmpdir, monkeypatch):
+    monkeypatch.setattr(bomparser, 'BOM_CACHE_FOLDER',
+                        str(tmpdir.join('cache')))
+    monkeypatch.setattr(bomparser, 'SHEET_CACHE_FOLDER',
+                        str(tmpdir.join('cache', 'sheets')))
+    monkeypatch.setattr(bomparser, 'GEDA_SYMLIB_ROOT',
+                        str(tmpdir.mkdir('symlib')))
+    monkeypatch.setattr(bomparser, '_symbol_paths', None)
+    monkeypatch.setattr(bomparser, '_missing_symbols', set())
+    monkeypatch.setattr(bomparser.fsutils, 'TEMPDIR',
+                        str(tmpdir.mkdir('temp')))
+    monkeypatch.setattr(electronics, 'EDA_HARMONIZE_IDENTS', False)
+    schfolder = tmpdir.mkdir('project').mkdir('schematic')
+    schfolder.join('configs.yaml').write(
+        'schema:\n'
+        '  name: pcbconfigs\n'
+        '  version: 1.0\n'
+        'projfile: test.gsch2pcb\n'
+        'pcbname: TEST\n'
+        'grouplist:\n'
+        '  - name: default\n'
+        '    desc: Unclassified\n'
+        '  - name: power\n'
+        '    desc: Power Supply\n'
+        '    file: s1.sch\n'
+    )
+    schfolder.join('test.gsch2pcb').write('schematics s0.sch s1.sch\n')
+    schfolder.join('attribs').write('device\nvalue\nfootprint\n')
+    columns = 'refdes device value footprint fillstatus group motif\n'
+    schfolder.join('s0.sch').write(
+        '0\n' + columns +
+        'R1 RES 10K 0603 unknown unknown unknown\n'
+        'U1 IC LM358 SOIC-8 DNP unknown unknown\n'
+        'R2 RES 1K 0603 unknown unknown NOSUCH1:R1\n'
+    )
+    schfolder.join('s1.sch').write(
+        '0\n' + columns +
+        'C1 CAP 10UF 0805 unknown unknown unknown\n'
+    )
+    return schfolder
+
+
+def test_bomline_pickle():
+    line = BomLine('R1\tRES\n', ['refdes', 'device'])
+    line = pickle.loads(pickle.dumps(line, pickle.HIGHEST_PROTOCOL))
+    assert line.refdes == 'R1'
+    with pytest.raises(AttributeError):
+        line.footprint
+
+
+def test_import_cache(project):
+    cardfolder = project.dirname
+    bom = electronics.import_pcb(cardfolder)
+    assert _Bom.built == 1
+
+    # Each call gets a BOM of its own, from memory and then from disk.
+    again = electronics.import_pcb(cardfolder)
+    assert again is not bom
+    assert again.lines[0].device == 'RES'
+    electronics.clear_import_cache()
+    assert electronics.import_pcb(cardfolder).lines[0].refdes == 'R1'
+    assert _Bom.built == 1
+
+    # Changes to the project or the symbols it uses invalidate it.
+    project.join('s0.sch').write('C 100 100 1 0 0 res.sym\nT 1\n')
+    electronics.import_pcb(cardfolder)
+    assert _Bom.built == 2
+    project.dirpath().dirpath('symlib', 'res.sym').write('device=RES\n')
+    electronics.import_pcb(cardfolder)
+    assert _Bom.built == 3
+    electronics.import_pcb(cardfolder)
+    electronics.import_pcb(cardfolder, use_cached=False)
+    assert _Bom.built == 4
+
+
+def test_elnbom_pickle(gnetlist, geda_project):
+    bom = electronics.EntityElnBom(ConfigsFile(geda_project.dirname))
+    again = pickle.loads(pickle.dumps(bom, pickle.HIGHEST_PROTOCOL))
+
+    def _groups(b):
+        return [(g.groupname, [(c.refdes, c.device, c.value, c.footprint)
+                               for c in g.complist])
+                for g in b.grouplist]
+    assert _groups(again) == _groups(bom) == [
+        ('default', [('PCB', 'PCB', 'TEST', ''),
+                     ('R1', 'RES', '10K', '0603')]),
+        ('power', [('C1', 'CAP', '10UF', '0805')]),
+    ]
+
+    configurations = again.configurations
+    assert configurations.projectfolder == geda_project.dirname
+    assert configurations.pcbname == 'TEST'
+    assert configurations.file_groups == {'s1.sch': 'power'}
+
+    errors = again.validation_errors.errors
+    assert [type(x) for x in errors] == [BomMotifUnrecognizedError]
+    assert errors[0].render() == bom.validation_errors.errors[0].render()
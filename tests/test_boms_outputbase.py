@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the ident and refdes indexes of output BOMs, with local
+stand-ins for the ident conventions.
+"""
+
+import pytest
+from tendril.boms import outputbase
+from tendril.boms.outputbase import CompositeOutputBom
+from tendril.boms.outputbase import DeltaOutputBom
+from tendril.boms.outputbase import OutputBom
+from tendril.boms.outputbase import OutputElnBomDescriptor
+from tendril.entities.base import GenericEntityBase
+
+
+@pytest.fixture(autouse=True)
+def conventions(monkeypatch):
+    # Idents are 'device value footprint', and none are wires until
+    # wires are to be collapsed.
+    monkeypatch.setattr(outputbase, 'parse_ident',
+                        lambda ident, generic=False: tuple(ident.split()))
+    monkeypatch.setattr(outputbase, 'fpiswire', lambda device: False)
+
+
+def _obom(name, components):
+    obom = OutputBom(OutputElnBomDescriptor(name, None, name, None))
+    for ident, refdes in components:
+        obom.insert_component(GenericEntityBase(ident, refdes))
+    return obom
+
+
+def test_obom_index():
+    obom = _obom('a', [('RES 1k 0603', 'R1'), ('CAP 1u 0603', 'C1'),
+                       ('RES 1k 0603', 'R2'), ('RES 1k 0603', 'Undef'),
+                       ('CAP 1u 0603', 'Undef')])
+    assert [(x.ident, x.refdeslist) for x in obom.lines] == [
+        ('RES 1k 0603', ['R1', 'R2', 'Undef']),
+        ('CAP 1u 0603', ['C1', 'Undef']),
+    ]
+    assert obom.find_by_ident('CAP 1u 0603') is obom.lines[1]
+    assert obom.find_by_ident('CAP 1u 0805') is None
+    assert obom.get_item_for_refdes('R2').ident == 'RES 1k 0603'
+    assert obom.get_item_for_refdes('Undef').ident == 'RES 1k 0603'
+    assert obom.get_item_for_refdes('R3') is None
+
+    obom.sort_by_ident()
+    assert obom.find_by_ident('CAP 1u 0603') is obom.lines[0]
+    assert obom.get_item_for_refdes('C1').ident == 'CAP 1u 0603'
+
+
+def test_obom_delta():
+    start = _obom('a', [('RES 1k 0603', 'R1'), ('RES 1k 0603', 'R2'),
+                        ('CAP 1u 0603', 'C1')])
+    end = _obom('b', [('RES 1k 0603', 'R1'), ('RES 2k 0603', 'R2'),
+                      ('CAP 1u 0603', 'C2')])
+    delta = DeltaOutputBom(start, end)
+    assert [(x.ident, x.refdeslist) for x in delta.additions_bom.lines] == [
+        ('RES 2k 0603', ['R2']), ('CAP 1u 0603', ['C2']),
+    ]
+    assert [(x.ident, x.refdeslist)
+            for x in delta.subtractions_bom.lines] == [
+        ('RES 1k 0603', ['R2']), ('CAP 1u 0603', ['C1']),
+    ]
+
+
+def test_collapse_wires(monkeypatch):
+    boms = [_obom('a', [('WIRE RED 10', 'W1'), ('WIRE RED 20', 'W2'),
+                        ('WIRE RED 20', 'W3'), ('RES 1k 0603', 'R1')]),
+            _obom('b', [('WIRE RED 20', 'W1'), ('WIRE BLK 10', 'W2'),
+                        ('WIRE BLK 20', 'W3')])]
+    cobom = CompositeOutputBom(boms)
+    monkeypatch.setattr(outputbase, 'fpiswire',
+                        lambda device: device == 'WIRE')
+    cobom.collapse_wires()
+    assert [(x.ident, x.columns) for x in cobom.lines] == [
+        ('RES 1k 0603', [1, 0]), ('WIRE BLK', [0, 2]), ('WIRE RED', [3, 1]),
+    ]
+    assert cobom.find_by_ident('WIRE RED') is cobom.lines[2]
+    assert cobom.find_by_ident('WIRE RED 10') is None
+    assert cobom.find_by_ident('WIRE BLK 20') is None
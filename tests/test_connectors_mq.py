@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the long lived MQ publisher, against a local stand-in for the
+broker's blocking connection.
+"""
+
+import threading
+import pytest
+import pika
+from tendril.connectors.mq import MQPublisher
+from tendril.connectors.mq import MQServerUnavailable
+
+
+class _Broker(object):
+    # Records what the publisher does with its connections. Connections
+    # fail while ``down`` is set, as they would with an unreachable server,
+    # and commits fail on connections broken by ``drop``.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = []
+        self.declares = []
+        self.commits = []
+        self.messages = []
+        self.down = False
+
+    def connect(self):
+        if self.down:
+            raise pika.exceptions.AMQPConnectionError()
+        connection = _Connection(self)
+        with self.lock:
+            self.connections.append(connection)
+        return connection
+
+    def drop(self):
+        for connection in self.connections:
+            connection.broken = True
+
+
+class _Connection(object):
+    def __init__(self, broker):
+        self.broker = broker
+        self.broken = False
+        self.closed = False
+
+    def channel(self):
+        return _Channel(self)
+
+    def process_data_events(self, time_limit=0):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class _Channel(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.transaction = None
+
+    def tx_select(self):
+        self.transaction = []
+
+    def queue_declare(self, queue, durable=False):
+        self.broker.declares.append(queue)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        assert properties.delivery_mode == 2
+        self.transaction.append((routing_key, body))
+
+    def tx_commit(self):
+        if self.connection.broken:
+            raise pika.exceptions.ConnectionClosed()
+        with self.broker.lock:
+            self.broker.commits.append(len(self.transaction))
+            self.broker.messages.extend(self.transaction)
+        self.transaction = []
+
+
+@pytest.fixture
+def broker():
+    return _Broker()
+
+
+def _publisher(broker, **kwargs):
+    kwargs.setdefault('linger', 0.05)
+    return MQPublisher(connect=broker.connect, **kwargs)
+
+
+def test_publish_one_connection(broker):
+    publisher = _publisher(broker)
+    for x in range(50):
+        publisher.publish('test_queue', 'm{0}'.format(x))
+    assert publisher.flush(5)
+    assert len(broker.connections) == 1
+    assert broker.declares == ['test_queue']
+    assert broker.messages == [('test_queue', 'm{0}'.format(x))
+                               for x in range(50)]
+    publisher.close()
+
+
+def test_publish_batched(broker):
+    publisher = _publisher(broker, batch_size=20)
+    for x in range(50):
+        publisher.publish('test_queue', 'm{0}'.format(x))
+    publisher.close(5)
+    assert len(broker.messages) == 50
+    assert len(broker.commits) < 50
+    assert max(broker.commits) <= 20
+    stats = publisher.stats
+    assert stats['published'] == 50
+    assert stats['batches'] == len(broker.commits)
+    assert 0 < stats['latency_mean'] <= stats['latency_max']
+
+
+def test_publish_threads(broker):
+    publisher = _publisher(broker)
+
+    def _worker(idx):
+        for x in range(25):
+            publisher.publish('test_queue', '{0}-{1}'.format(idx, x))
+    threads = [threading.Thread(target=_worker, args=(x,))
+               for x in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert publisher.flush(5)
+    assert len(broker.connections) == 1
+    assert len(set(broker.messages)) == 100
+
+
+def test_publish_coalesce(broker):
+    publisher = _publisher(broker)
+    assert publisher.publish('test_queue', 'a', coalesce=('v', 'p1'))
+    assert not publisher.publish('test_queue', 'b', coalesce=('v', 'p1'))
+    assert publisher.publish('test_queue', 'c', coalesce=('v', 'p2'))
+    assert publisher.publish('other_queue', 'd', coalesce=('v', 'p1'))
+    assert publisher.flush(5)
+    assert [x[1] for x in broker.messages] == ['a', 'c', 'd']
+    assert publisher.stats['coalesced'] == 1
+
+
+def test_publish_coalesce_window(broker):
+    publisher = _publisher(broker, coalesce_window=0)
+    assert publisher.publish('test_queue', 'a', coalesce='p1')
+    assert publisher.publish('test_queue', 'b', coalesce='p1')
+    assert publisher.flush(5)
+    assert len(broker.messages) == 2
+
+
+def test_publish_coalesce_failed(broker):
+    # A dropped message doesn't hold back the next one about the same
+    # thing.
+    broker.down = True
+    publisher = _publisher(broker, retry_interval=0)
+    assert publisher.publish('test_queue', 'a', coalesce='p1')
+    assert publisher.flush(5)
+    broker.down = False
+    assert publisher.publish('test_queue', 'b', coalesce='p1')
+    assert not publisher.publish('test_queue', 'c', coalesce='p1')
+    assert publisher.flush(5)
+    assert [x[1] for x in broker.messages] == ['b']
+
+
+def test_publish_reconnect(broker):
+    publisher = _publisher(broker)
+    publisher.publish('test_queue', 'a')
+    assert publisher.flush(5)
+    # The first commit on the stale connection fails, and the batch goes
+    # through on a new one.
+    broker.drop()
+    publisher.publish('test_queue', 'b')
+    assert publisher.flush(5)
+    assert len(broker.connections) == 2
+    assert broker.connections[0].closed
+    assert [x[1] for x in broker.messages] == ['a', 'b']
+
+
+def test_publish_unavailable(broker):
+    broker.down = True
+    publisher = _publisher(broker, retry_interval=60)
+    publisher.publish('test_queue', 'a')
+    assert publisher.flush(5)
+    broker.down = False
+    publisher.publish('test_queue', 'b')
+    assert publisher.flush(5)
+    assert broker.messages == []
+    assert broker.connections == []
+    assert publisher.stats['failed'] == 2
+
+
+def test_publish_closed(broker):
+    publisher = _publisher(broker)
+    publisher.publish('test_queue', 'a')
+    publisher.close(5)
+    assert broker.messages == [('test_queue', 'a')]
+    with pytest.raises(MQServerUnavailable):
+        publisher.publish('test_queue', 'b')
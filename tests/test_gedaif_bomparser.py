@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for per-sheet BOM netlisting and the BOM file and sheet netlist
+caches, against the local stand-in for ``gnetlist`` (see ``conftest.py``).
+"""
+
+import os
+import time
+import shutil
+import pytest
+from tendril.gedaif import bomparser
+from tendril.gedaif.bomparser import GedaBomParser
+from tendril.gedaif.bomparser import GnetlistError
+
+
+class _Parser(GedaBomParser):
+    def __init__(self, projectfolder, schematics):
+        self.projectfolder = projectfolder
+        self._schematics = schematics
+        self._use_cached = True
+
+    def _get_temp_schematic(self):
+        self.schpaths = []
+        for name, content in self._schematics:
+            path = os.path.join(self.projectfolder, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            self.schpaths.append(path)
+
+    def _get_attribs_file(self):
+        return os.path.join(self.projectfolder, 'attribs')
+
+
+class _Project(object):
+    def __init__(self, schpaths):
+        self.schpaths = schpaths
+
+
+class _CachedParser(GedaBomParser):
+    def __init__(self, projectfolder, backend='bom', use_cached=True):
+        self.projectfolder = projectfolder
+        self._namebase = 'test'
+        self._gpf = _Project(sorted(
+            os.path.join(projectfolder, x) for x in os.listdir(projectfolder)
+        ))
+        self._use_cached = use_cached
+        self._generator_args = {'backend': backend, 'workers': 2}
+        self._temp_folder_path = None
+
+    def _get_attribs_file(self):
+        return os.path.join(self.projectfolder, 'attribs')
+
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    symlib = tmpdir.mkdir('symlib')
+    monkeypatch.setattr(bomparser, 'BOM_CACHE_FOLDER',
+                        str(tmpdir.join('cache')))
+    monkeypatch.setattr(bomparser, 'SHEET_CACHE_FOLDER',
+                        str(tmpdir.join('cache', 'sheets')))
+    monkeypatch.setattr(bomparser, 'GEDA_SYMLIB_ROOT', str(symlib))
+    monkeypatch.setattr(bomparser, '_symbol_paths', None)
+    monkeypatch.setattr(bomparser, '_missing_symbols', set())
+    monkeypatch.setattr(bomparser.fsutils, 'TEMPDIR',
+                        str(tmpdir.mkdir('temp')))
+    return symlib
+
+
+def _calls(gnetlist):
+    calls = gnetlist.dirpath('calls')
+    if not calls.exists():
+        return 0
+    return len(calls.readlines())
+
+
+def _read(path):
+    with open(path) as f:
+        return [x.split('\t') for x in f.read().splitlines()]
+
+
+def test_netlist_order(tmpdir, gnetlist, cache):
+    schematics = [('s{0}.sch'.format(x),
+                   '{0}\nR{1} RES\nC{1} CAP\nU1 IC\n'.format(3 - x, x))
+                  for x in range(4)]
+    parser = _Parser(str(tmpdir), schematics)
+    outpath = str(tmpdir.join('bom.net'))
+    start = time.time()
+    parser.generate_bom_file(outpath, backend='bom', workers=4)
+    # The sheets are netlisted together.
+    assert time.time() - start < 1.2
+
+    rows = _read(outpath)
+    assert rows[0] == ['refdes', 'device', 'schfile']
+    assert rows[1:] == [
+        ['R0', 'RES', 's0.sch'], ['C0', 'CAP', 's0.sch'],
+        ['U1', 'IC', 's0.sch;s1.sch;s2.sch;s3.sch'],
+        ['R1', 'RES', 's1.sch'], ['C1', 'CAP', 's1.sch'],
+        ['R2', 'RES', 's2.sch'], ['C2', 'CAP', 's2.sch'],
+        ['R3', 'RES', 's3.sch'], ['C3', 'CAP', 's3.sch'],
+    ]
+
+    serial = str(tmpdir.join('serial.net'))
+    parser._use_cached = False
+    parser.generate_bom_file(serial, backend='bom', workers=1)
+    assert _read(serial) == rows
+    assert _calls(gnetlist) == 8
+
+
+def test_netlist_failures(tmpdir, gnetlist, cache):
+    schematics = [('s0.sch', '0\nR1 RES\n'), ('s1.sch', 'FAIL\n'),
+                  ('s2.sch', '0\nR2 RES\n'), ('s3.sch', 'FAIL\n')]
+    parser = _Parser(str(tmpdir), schematics)
+    with pytest.raises(GnetlistError) as excinfo:
+        parser.generate_bom_file(str(tmpdir.join('bom.net')),
+                                 backend='bom', workers=4)
+    failures = excinfo.value.failures
+    assert [(x[0], x[1]) for x in failures] == [('s1.sch', 2),
+                                                ('s3.sch', 2)]
+    assert 'error in' in failures[0][2]
+
+    # Only the failed sheets are netlisted again.
+    with pytest.raises(GnetlistError):
+        parser.generate_bom_file(str(tmpdir.join('bom.net')),
+                                 backend='bom', workers=4)
+    assert _calls(gnetlist) == 6
+
+
+def test_bom_cache(tmpdir, gnetlist, cache):
+    cache.mkdir('passives').join('res.sym').write('device=RESISTOR\n')
+    project = tmpdir.mkdir('project')
+    project.join('s0.sch').write('0\nC 100 100 1 0 0 res.sym\nR1 RES\n')
+    project.join('s1.sch').write('0\nC 100 100 1 0 0 gnd.sym\nR2 RES\n')
+
+    def _get_bom(folder=str(project), **kwargs):
+        with _CachedParser(folder, **kwargs).get_bom_file() as f:
+            return f.read()
+
+    bom = _get_bom()
+    assert 'R2\tRES\ts1.sch' in bom
+    assert _calls(gnetlist) == 2
+
+    # Neither touching the sheets nor moving the project invalidates the
+    # cached BOM file.
+    future = time.time() + 100
+    os.utime(str(project.join('s0.sch')), (future, future))
+    clone = str(tmpdir.join('clone'))
+    shutil.copytree(str(project), clone)
+    assert _get_bom() == bom
+    assert _get_bom(clone) == bom
+    assert _calls(gnetlist) == 2
+
+    # Changes to the sheets and the symbols they use do, but only the
+    # sheets affected are netlisted again.
+    project.join('s1.sch').write('0\nC 100 100 1 0 0 gnd.sym\nR3 RES\n')
+    assert 'R3\tRES\ts1.sch' in _get_bom()
+    assert _calls(gnetlist) == 3
+    cache.join('passives', 'res.sym').write('device=RESISTOR\nvalue=1\n')
+    _get_bom()
+    assert _calls(gnetlist) == 4
+    assert gnetlist.dirpath('calls').readlines()[-1].endswith('s0.sch\n')
+
+    # As do changes to the backend, and not using the cache.
+    _get_bom(backend='other')
+    assert _calls(gnetlist) == 6
+    _get_bom(use_cached=False)
+    assert _calls(gnetlist) == 8
+    _get_bom()
+    assert _calls(gnetlist) == 8
+
+    entries = os.listdir(bomparser.BOM_CACHE_FOLDER)
+    assert sorted(x for x in entries if not x.endswith('.net')) == ['sheets']
+    assert len(entries) == 5
+    assert len(os.listdir(bomparser.SHEET_CACHE_FOLDER)) == 6
+
+
+def test_bom_temp_folder(tmpdir, gnetlist, cache):
+    project = tmpdir.mkdir('project')
+    project.join('s0.sch').write('0\nR1 RES\n')
+    temp = os.path.join(bomparser.fsutils.TEMPDIR, 'test')
+
+    # The parser's temporary folder is removed once the BOM file is
+    # cached.
+    parser = _CachedParser(str(project))
+    parser.get_bom_file().close()
+    assert os.listdir(temp) == []
+
+    # Nor is it left behind when the BOM file can't be generated.
+    project.join('s1.sch').write('FAIL\n')
+    parser = _CachedParser(str(project))
+    with pytest.raises(GnetlistError):
+        parser.get_bom_file()
+    assert os.listdir(temp) == []
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the order consolidation solver.
+"""
+
+import random
+import itertools
+import pytest
+from tendril.sourcing.consolidation import solve_consolidation
+from tendril.sourcing.consolidation import ConsolidationError
+
+
+def _brute_force(fixed_costs, options):
+    best = None
+    facilities = sorted(fixed_costs.keys())
+    for n in range(1, len(facilities) + 1):
+        for used in itertools.combinations(facilities, n):
+            costs = [[o[f] for f in used if f in o] for o in options]
+            if not all(costs):
+                continue
+            cost = sum(fixed_costs[f] for f in used) + \
+                sum(min(x) for x in costs)
+            if best is None or cost < best:
+                best = cost
+    return best
+
+
+def _random_problem(rng, nfacilities, nlines):
+    fixed_costs = dict(('v{0}'.format(j), rng.choice([0, rng.uniform(0, 200)]))
+                       for j in range(nfacilities))
+    options = []
+    for _ in range(nlines):
+        facilities = rng.sample(sorted(fixed_costs.keys()),
+                                rng.randint(1, nfacilities))
+        options.append(dict((f, rng.uniform(1, 100)) for f in facilities))
+    return fixed_costs, options
+
+
+def test_consolidation_simple():
+    fixed_costs = {'a': 100, 'b': 0, 'c': 50}
+    options = [{'a': 10, 'c': 15},
+               {'a': 10, 'b': 30},
+               {'c': 20}]
+    result = solve_consolidation(fixed_costs, options, method='exact')
+    assert result.assignment == ['c', 'b', 'c']
+    assert result.facilities == {'b', 'c'}
+    assert result.cost == 115
+    assert result.optimal is True
+
+
+def test_consolidation_exact():
+    rng = random.Random(1)
+    for _ in range(100):
+        fixed_costs, options = _random_problem(rng, rng.randint(1, 6),
+                                               rng.randint(1, 20))
+        result = solve_consolidation(fixed_costs, options, method='exact')
+        assert result.cost == pytest.approx(
+            _brute_force(fixed_costs, options)
+        )
+        assert result.cost == pytest.approx(
+            sum(fixed_costs[f] for f in result.facilities) +
+            sum(o[f] for o, f in zip(options, result.assignment))
+        )
+
+
+def test_consolidation_fast():
+    rng = random.Random(2)
+    fixed_costs, options = _random_problem(rng, 30, 3000)
+    result = solve_consolidation(fixed_costs, options, method='fast')
+    assert len(result.assignment) == 3000
+    assert all(f in o for o, f in zip(options, result.assignment))
+    assert result.optimal is False
+
+
+def test_consolidation_errors():
+    assert solve_consolidation({}, []).assignment == []
+    with pytest.raises(ConsolidationError):
+        solve_consolidation({'a': 1}, [{'a': 1}, {}])
+    with pytest.raises(ValueError):
+        solve_consolidation({'a': 1}, [{'a': 1}], method='milp')
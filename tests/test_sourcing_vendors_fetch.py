@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the vendor fetch engine, against a local HTTP server.
+"""
+
+import time
+import threading
+import pytest
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib.error import HTTPError
+from tendril.sourcing.vendors.fetch import FetchEngine
+from tendril.sourcing.vendors.ratelimit import TokenBucket
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Paths of the form /<status>/<name>. Requests for /503/<name> fail
+    # the first time they're made and succeed thereafter.
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(0.05)
+            status, name = self.path.strip('/').split('/', 1)
+            status = int(status)
+            if status == 503:
+                with server.lock:
+                    if self.path not in server.failed:
+                        server.failed.add(self.path)
+                    else:
+                        status = 200
+            body = '<html><body><p id="name">{0}</p></body></html>' \
+                   ''.format(name).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+    httpd = _Server(('127.0.0.1', 0), _Handler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.failed = set()
+    httpd.active = 0
+    httpd.peak = 0
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    httpd.url = 'http://127.0.0.1:{0}'.format(httpd.server_address[1])
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _engine(tmpdir, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return FetchEngine(cache_dir=str(tmpdir), **kwargs)
+
+
+def test_fetch_soup(server, tmpdir):
+    engine = _engine(tmpdir)
+    soup = engine.get_soup(server.url + '/200/part')
+    assert soup.find('p', id='name').text == 'part'
+
+
+def test_fetch_cached(server, tmpdir):
+    engine = _engine(tmpdir)
+    engine.get_soup(server.url + '/200/part')
+    engine.get_soup(server.url + '/200/part')
+    assert server.requests == ['/200/part']
+
+
+def test_fetch_soups_order(server, tmpdir):
+    engine = _engine(tmpdir, max_connections=3)
+    names = ['p{0}'.format(x) for x in range(9)]
+    soups = engine.get_soups([server.url + '/200/' + x for x in names])
+    assert [s.find('p', id='name').text for s in soups] == names
+    assert 1 < server.peak <= 3
+
+
+def test_fetch_retry(server, tmpdir):
+    engine = _engine(tmpdir)
+    soup = engine.get_soup(server.url + '/503/flaky')
+    assert soup.find('p', id='name').text == 'flaky'
+    assert server.requests == ['/503/flaky', '/503/flaky']
+
+
+def test_fetch_http_error(server, tmpdir):
+    engine = _engine(tmpdir)
+    with pytest.raises(HTTPError) as e:
+        engine.get_soup(server.url + '/404/missing')
+    assert e.value.code == 404
+    assert server.requests == ['/404/missing']
+
+
+def test_fetch_rate_limit(server, tmpdir):
+    engine = _engine(tmpdir, rate_limiter=TokenBucket(20))
+    start = time.time()
+    engine.get_soups([server.url + '/200/r{0}'.format(x) for x in range(5)])
+    assert time.time() - start >= 0.2
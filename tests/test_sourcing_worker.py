@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2019 Chintalagiri Shashank
+#
+# This file is part of tendril.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the sourcing refresh worker, against a local stand-in for the
+broker's blocking connection and for the vendors.
+"""
+
+import json
+import time
+from tendril.sourcing.maintenance import VPINFO_QUEUE
+from tendril.sourcing.maintenance import VPMAP_QUEUE
+from tendril.sourcing.worker import RefreshQueue
+from tendril.sourcing.worker import RefreshWorker
+
+
+class _Method(object):
+    def __init__(self, routing_key, delivery_tag):
+        self.routing_key = routing_key
+        self.delivery_tag = delivery_tag
+
+
+class _Connection(object):
+    # Delivers the given (queue, body) messages one at a time, and records
+    # the delivery tags acknowledged.
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.delivered = 0
+        self.callbacks = {}
+        self.acks = []
+        self.closed = False
+
+    def channel(self):
+        return self
+
+    def basic_qos(self, prefetch_count):
+        pass
+
+    def queue_declare(self, queue, durable=False):
+        pass
+
+    def basic_consume(self, callback, queue):
+        self.callbacks[queue] = callback
+
+    def basic_ack(self, delivery_tag):
+        self.acks.append(delivery_tag)
+
+    def process_data_events(self, time_limit=0):
+        if not self.messages:
+            time.sleep(time_limit)
+            return
+        key, body = self.messages.pop(0)
+        self.delivered += 1
+        self.callbacks[key](self, _Method(key, self.delivered), None, body)
+
+    def close(self):
+        self.closed = True
+
+
+class _Vendor(object):
+    def __init__(self, cname):
+        self.cname = cname
+        self.batches = []
+
+    def refresh_vparts(self, vpnos):
+        self.batches.append(('vpinfo', list(vpnos)))
+
+    def refresh_vpmaps(self, idents):
+        self.batches.append(('vpmap', list(idents)))
+
+
+def _vpinfo(vendor, ident, vpno):
+    return VPINFO_QUEUE, json.dumps({'vendor': vendor, 'ident': ident,
+                                     'vpno': vpno})
+
+
+def _vpmap(vendor, ident):
+    return VPMAP_QUEUE, json.dumps({'vendor': vendor, 'ident': ident})
+
+
+def test_queue_order():
+    rqueue = RefreshQueue()
+    assert rqueue.put(('vpinfo', 'a', '1'), 2, 1)
+    assert rqueue.put(('vpmap', 'b'), 0, 2)
+    assert not rqueue.put(('vpinfo', 'a', '1'), 2, 3)
+    assert rqueue.put(('vpinfo', 'c', '2'), 1, 4)
+    assert len(rqueue) == 3
+    assert rqueue.get_batch(10) == [(('vpmap', 'b'), [2])]
+    assert rqueue.get_batch(10) == [(('vpinfo', 'c', '2'), [4]),
+                                    (('vpinfo', 'a', '1'), [1, 3])]
+    assert rqueue.get_batch(10, timeout=0.01) == []
+
+
+def test_worker():
+    messages = [_vpinfo('dk', 'I{0}'.format(x % 5), 'P{0}'.format(x % 5))
+                for x in range(10)]
+    messages += [_vpmap('dk', 'X'), _vpinfo('mouser', 'I1', 'M1'),
+                 _vpmap('unknown', 'X'), (VPMAP_QUEUE, 'garbage')]
+    connection = _Connection(messages)
+    vendors = [_Vendor('dk'), _Vendor('mouser')]
+    worker = RefreshWorker(vendors, connect=lambda: connection,
+                           priorities=lambda: {'I3': 0}, batch_size=5)
+    worker.run(idle_exit=0.2)
+
+    assert sorted(connection.acks) == list(range(1, 15))
+    assert connection.closed
+    dk_parts = [x for kind, batch in vendors[0].batches
+                for x in batch if kind == 'vpinfo']
+    assert sorted(dk_parts) == [('I{0}'.format(x), 'P{0}'.format(x))
+                                for x in range(5)]
+    assert ('vpmap', ['X']) in vendors[0].batches
+    assert vendors[1].batches == [('vpinfo', [('I1', 'M1')])]
+
+    stats = worker.stats
+    assert stats['received'] == 14
+    assert stats['vpinfo'] + stats['merged'] == 11
+    assert stats['vpmap'] == 1
+    assert stats['discarded'] == 2
+    assert stats['vendors']['mouser'] == 1